@@ -0,0 +1,49 @@
+"""
+Recommend indexes for jira_data from the SQL workload logged by the postgres connector.
+Candidates come from the predicates, GROUP BY and ORDER BY keys of the logged queries (including DATE_TRUNC
+expressions) and are checked with EXPLAIN against hypothetical (hypopg) indexes.
+
+    python advise_indexes.py                    # print the ranked recommendations
+    python advise_indexes.py --apply --top 2    # build the two best ones with CREATE INDEX CONCURRENTLY
+"""
+
+import argparse
+import json
+from dotenv import load_dotenv
+_ = load_dotenv(override=True)
+
+from config import Config
+from utils.index_advisor import IndexAdvisor
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Workload-driven index advisor.")
+    parser.add_argument("--workload", default=None, help=f"Workload log, defaults to {Config.index_advisor_params['workload_path']}.")
+    parser.add_argument("--top", type=int, default=10, help="Number of recommendations to show (and apply).")
+    parser.add_argument("--apply", action="store_true", help="Build the recommended indexes.")
+    parser.add_argument("--json", action="store_true", help="Print the recommendations as JSON.")
+    args = parser.parse_args()
+
+    advisor = IndexAdvisor()
+    recommendations = advisor.recommend(args.workload)[:args.top]
+    if args.json:
+        print(json.dumps(recommendations, indent=2, default=str))
+    elif not recommendations:
+        print("No index recommendations for the logged workload.")
+    for rank, r in enumerate(recommendations if not args.json else [], 1):
+        gain = f"{r['gain_pct']}% of planner cost ({r['cost_before']} -> {r['cost_after']})" \
+            if r["gain"] is not None else "gain unknown (hypopg is not installed)"
+        print(f"{rank}. {r['statement']};\n   {gain}, {len(r['queries'])} queries / {r['executions']} executions "
+              f"({r['query_seconds']}s)")
+
+    if args.apply and recommendations:
+        if recommendations[0]["gain"] is None:
+            print("Not applying unverified recommendations; install hypopg or enable trial_builds first.")
+            return
+        for result in advisor.apply(recommendations):
+            detail = f"in {result['seconds']}s" if result["status"] == "ok" else result["error"]
+            print(f"{result['status']}: {result['statement']} {detail}")
+
+
+if __name__ == "__main__":
+    main()
@@ -15,6 +15,7 @@ from langchain_core.messages import SystemMessage, HumanMessage
 # ----- Shared State Schema -----
 class AgentState(TypedDict):
     user_input: str
+    request_id: Optional[str] = None
     supervisor_decision: Optional[str] = None
     tool_calls: Optional[str] = None
     agent_tool_retries: Optional[int] = None
@@ -25,6 +26,8 @@ class AgentState(TypedDict):
     report_generation_requested: Optional[str] = None
     report_generation_response: Optional[str] = None
     final_response: Optional[str] = None
+    answer_cache_hit: Optional[bool] = None
+    time_to_first_token: Optional[float] = None
     memory_chain: List[Dict[str, Any]] = []
 
 
@@ -53,3 +56,10 @@ class BaseAgent:
 
     def handle_input(self, state: Dict[str, Any]) -> Dict[str, Any]:
         return state
+
+    # async counterparts, used when the graph is built with async_mode=True. Override with native async versions.
+    async def arun(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        return await self.ahandle_input(state)
+
+    async def ahandle_input(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        return self.handle_input(state)
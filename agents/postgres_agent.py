@@ -3,10 +3,17 @@ from tools.postgres_agent_tools import PostGresAgentTools
 
 from agents.base_agent import BaseAgent, AgentState
 from utils.handle_configs import get_llm
+from utils.state_projection import project_state
+from utils.sql_cache import get_sql_cache
+from utils.schema_catalog import get_schema_catalog
+from utils.schema_linking import get_schema_linker
+from utils.result_summary import summarize_result
+from utils.sql_validator import get_sql_validator
 
 from langchain_core.messages import HumanMessage, SystemMessage
 from config import Config
 from connectors.db_connector import PostgresConnector  # Add this import or adjust the path as needed
+import re
 
 
 class PostGresAgent(BaseAgent):
@@ -29,10 +36,25 @@ class PostGresAgent(BaseAgent):
         self.tools_dict = {t.name: t for t in self.tools}
         self.llm_with_tools = self.llm.bind_tools(self.tools)
 
+        # async counterparts of the tools, used by the async node methods (not bound to the llm).
+        self.async_tools_dict = {t.name: t for t in [
+            PostGresAgentTools.agenerate_query,
+            PostGresAgentTools.arun_query
+            ]}
+
         # define the system message for the sql query generation agent.
         self.sql_generator_params = Config.sql_generator_params
         self.sql_generator = get_llm(self.sql_generator_params)       
 
+        # known-good sql for previously asked questions, shared with the report generator path.
+        self.sql_cache = get_sql_cache()
+        # live schema for the sql prompt, introspected once and refreshed when the catalog changes.
+        self.schema_catalog = get_schema_catalog()
+        # picks the tables relevant to the question, so the prompt does not grow with the database.
+        self.schema_linker = get_schema_linker()
+        # resolves generated sql against the catalog locally, before it costs a round trip to postgres.
+        self.sql_validator = get_sql_validator()
+
 
     def handle_input(self, state: AgentState):
         """
@@ -42,7 +64,7 @@ class PostGresAgent(BaseAgent):
         """
 
         # use the tools to get the results and responses before getting back to the supervisor.
-        system_msg = postgres_prompt.format(state=state)
+        system_msg = postgres_prompt.format(state=project_state(state, "postgres_agent"))
         message = [
             SystemMessage(content=system_msg),
             HumanMessage(content=f"{state['user_input']}")
@@ -58,14 +80,62 @@ class PostGresAgent(BaseAgent):
                 pass
 
         return state
+
+    async def ahandle_input(self, state: AgentState):
+        """
+        Async counterpart of handle_input.
+        :param state: The state of the agent containing the user input and states to be updated.
+        :return: updated state for the agent.
+        """
+        system_msg = postgres_prompt.format(state=project_state(state, "postgres_agent"))
+        message = [
+            SystemMessage(content=system_msg),
+            HumanMessage(content=f"{state['user_input']}")
+        ]
+        agent_response = await self.llm_with_tools.ainvoke(message)
+
+        if hasattr(agent_response, 'tool_calls'):
+            try:
+                state['tool_calls'] = agent_response.tool_calls[0]['name']
+            except IndexError:
+                pass
+
+        return state
     
 
+    def _cached_sql_query(self, state: AgentState):
+        """
+        Serve the sql for the user input from the sql cache, returning True on a hit.
+        """
+        entry = self.sql_cache.get(state['user_input'])
+        if entry is None:
+            return False
+
+        state['postgres_query'] = entry['sql']
+        state['memory_chain'].append({
+            'postgres_query': state['postgres_query'],
+            'sql_cache': {'match': entry['match'], 'similarity': entry['similarity']}
+        })
+        return True
+
+    def _schema_context(self, state: AgentState):
+        tables = self.schema_linker.link(state['user_input'])
+        if tables is not None:
+            state['memory_chain'].append({'schema_tables': tables})
+        return self.schema_catalog.render(tables=tables)
+
     def generate_sql_query(self, state: AgentState):
+        if self._cached_sql_query(state):
+            return state
+
         # check the tool to use.
         selected_tool = "generate_query"
         print(f"Calling: {selected_tool}")
 
-        system_prompt = sql_query_prompt.format(user_input=state['user_input'])
+        system_prompt = sql_query_prompt.format(
+            user_input=state['user_input'],
+            schema_context=self._schema_context(state)
+        )
 
         system_prompt = SystemMessage(
             content=system_prompt
@@ -80,6 +150,7 @@ class PostGresAgent(BaseAgent):
         # invoke the tool and get the result.
         try:
             sql_query = self.tools_dict[selected_tool].invoke(tool_input)
+            self.sql_cache.record_generated(state['user_input'], sql_query)
 
             # update the state with the tool result.
             state['postgres_query'] = sql_query
@@ -91,9 +162,72 @@ class PostGresAgent(BaseAgent):
             pass
 
         return state
+
+    async def agenerate_sql_query(self, state: AgentState):
+        """
+        Async counterpart of generate_sql_query.
+        """
+        if self._cached_sql_query(state):
+            return state
+
+        selected_tool = "agenerate_query"
+        print(f"Calling: {selected_tool}")
+
+        system_prompt = SystemMessage(
+            content=sql_query_prompt.format(
+                user_input=state['user_input'],
+                schema_context=self._schema_context(state)
+            )
+        )
+        tool_input = {
+            "user_input": state['user_input'],
+            "system_prompt": system_prompt,
+            "llm": self.sql_generator
+        }
+
+        try:
+            sql_query = await self.async_tools_dict[selected_tool].ainvoke(tool_input)
+            self.sql_cache.record_generated(state['user_input'], sql_query)
+
+            state['postgres_query'] = sql_query
+            state['memory_chain'].append({
+                'postgres_query': state['postgres_query']
+            })
+        except:
+            state['agent_tool_retries'] += 1
+            pass
+
+        return state
     
 
+    def _check_sql_query(self, state: AgentState):
+        """
+        Validate the generated sql offline, applying the mechanical fixes to the state.
+        :return: False (with the validation error as the agent response) when the query cannot run.
+        """
+        validation = self.sql_validator.validate(state['postgres_query'])
+        if validation['fixes']:
+            state['postgres_query'] = validation['sql']
+            state['memory_chain'].append({'sql_fixes': validation['fixes']})
+            # the fixed query is the one whose execution decides whether the cache may serve it.
+            self.sql_cache.record_generated(state['user_input'], state['postgres_query'])
+        if validation['valid']:
+            return True
+
+        self.sql_cache.record_execution(state['user_input'], state['postgres_query'], False)
+        state['postgres_agent_response'] = {
+            "status": "error",
+            "error_type": "validation",
+            "error": validation['error'],
+            "errors": validation['errors'],
+        }
+        state['memory_chain'].append({'validation_error': validation['error']})
+        return False
+
     def run_sql_query(self, state: AgentState):
+        if not self._check_sql_query(state):
+            return state
+
         # check the tool to use.
         print(f"Running SQL Query: {state['postgres_query']}")
         selected_tool = 'run_query'
@@ -107,6 +241,11 @@ class PostGresAgent(BaseAgent):
         try:
             # invoke the tool and get the result.
             postgres_agent_response = self.tools_dict[selected_tool].invoke(tool_input)
+            self.sql_cache.record_execution(
+                state['user_input'], state['postgres_query'], postgres_agent_response.get("status") == "ok"
+            )
+            # large results are summarized, the full rows stay in the result store.
+            postgres_agent_response = summarize_result(postgres_agent_response, query=state['postgres_query'])
 
             # update the state with the tool result.
             state['postgres_agent_response'] = postgres_agent_response
@@ -118,39 +257,73 @@ class PostGresAgent(BaseAgent):
             state['agent_tool_retries'] += 1
             pass
 
+        return state
+
+    async def arun_sql_query(self, state: AgentState):
+        """
+        Async counterpart of run_sql_query.
+        """
+        if not self._check_sql_query(state):
+            return state
+
+        print(f"Running SQL Query: {state['postgres_query']}")
+        selected_tool = 'arun_query'
+
+        tool_input = {
+            "query": state['postgres_query'],
+            "params": None
+        }
+
+        try:
+            postgres_agent_response = await self.async_tools_dict[selected_tool].ainvoke(tool_input)
+            self.sql_cache.record_execution(
+                state['user_input'], state['postgres_query'], postgres_agent_response.get("status") == "ok"
+            )
+            # large results are summarized, the full rows stay in the result store.
+            postgres_agent_response = summarize_result(postgres_agent_response, query=state['postgres_query'])
+
+            state['postgres_agent_response'] = postgres_agent_response
+            state['memory_chain'].append({
+                'postgres_agent_response': state['postgres_agent_response']
+            })
+
+        except Exception as e:
+            state['agent_tool_retries'] += 1
+            pass
+
+        return state
+
 
     def validate_sql_query(self, state: AgentState):
-        """ Validate the SQL query using pglast.
+        """ Validate the SQL query offline: pglast syntax plus tables and columns resolved against the schema catalog.
         :param state: The state of the agent containing the SQL query to validate.
         :return: updated state with validation result.
         """
         # Extract the SQL query from the state
         sql_query = state['postgres_query']
         # fetching propery query using regular expression
-        query = re.search(r"SELECT.*;|UPDATE.*;|INSERT.*;", sql_query)
+        query = re.search(r"(SELECT|WITH|UPDATE|INSERT).*?;", sql_query, flags=re.IGNORECASE | re.DOTALL)
+
+        # Validate the SQL query, fixing identifier quoting where it can
+        response = self.sql_validator.validate(query.group(0) if query else sql_query)
+        if response['fixes']:
+            state['postgres_query'] = response['sql']
 
-        # Validate the SQL query using pglast
-        response = PostgresConnector.validate_with_pglast_Latest(sql=query.group(0) if query else sql_query)
         # Check if the response indicates an error
         if response.get("status") == "error":
             # If there's an error, update the state with the error message
-            state['postgres_agent_response'] = response
+            state['postgres_agent_response'] = {"status": "error", "error": response.get("error", "Unknown error")}
             state['memory_chain'].append({
                 'validation_error': response.get("error", "Unknown error")
             })
             return state
+
         # If validation is successful, update the state with the validation result
-        if response.get("status") == "ok":
-            response = {
-                "status": "ok",
-                "message": "SQL query is valid."
-            }
-        else:
-            response = {
-                "status": "error",
-                "error": "SQL query validation failed."
-            }
-        
+        response = {
+            "status": "ok",
+            "message": "SQL query is valid.",
+            "fixes": response['fixes']
+        }
         # Update the state with the validation result
         state['postgres_agent_response'] = response
         # Append the validation result to the memory chain
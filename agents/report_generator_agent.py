@@ -4,13 +4,19 @@ from tools.postgres_agent_tools import PostGresAgentTools
 from tools.r_generate_report import generate_reports_tools
 from agents.base_agent import BaseAgent, AgentState
 from utils.handle_configs import get_llm
+from utils.sql_cache import get_sql_cache
 
 from langchain_core.messages import HumanMessage, SystemMessage
 from config import Config
 from tools.postgres_agent_tools import PostGresAgentTools
+import asyncio
+import threading
 
 
 class ReportGeneratorAgent(BaseAgent):
+    # pyplot and the report files are process-global, so only one report renders at a time.
+    _report_lock = threading.Lock()
+
     def __init__(self, name="report_generator_agent"):
 
         super().__init__(name)
@@ -79,6 +85,29 @@ class ReportGeneratorAgent(BaseAgent):
 
         return state
 
+    async def ahandle_input(self, state: AgentState):
+        """
+        Async counterpart of handle_input.
+        """
+        system_msg = reportgenerate_prompt.format(user_input=state['user_input'])
+        message = [
+            SystemMessage(content=system_msg),
+            HumanMessage(content=f"{state['user_input']}")
+        ]
+        agent_response = await self.llm_with_tools.ainvoke(message)
+
+        if hasattr(agent_response, 'tool_calls'):
+            try:
+                state['tool_calls'] = agent_response.tool_calls[0]['name']
+                state['memory_chain'].append({
+                'selected_tool': state['tool_calls']
+                })
+            except IndexError as e:
+                print(f"IndexError: {e}")
+                pass
+
+        return state
+
     def handle_output(self, state: AgentState):
         """
         Takes action based on the state of the agent.
@@ -102,6 +131,30 @@ class ReportGeneratorAgent(BaseAgent):
         })
         return state
 
+    async def ahandle_output(self, state: AgentState):
+        """
+        Async counterpart of handle_output.
+        """
+        system_msg = reportgenerate_prompt.format(state=state)
+        message = [
+            SystemMessage(content=system_msg),
+            HumanMessage(content=f"{state['user_input']}")
+        ]
+        agent_response = await self.response_agent.ainvoke(message)
+
+        state['final_response'] = agent_response.content
+        state['memory_chain'].append({
+            'final_response': state['final_response']
+        })
+        return state
+
+    @staticmethod
+    def _report_succeeded(response) -> bool:
+        # only a report that was actually generated marks its (rg_generate_sql_query) sql as known-good.
+        if isinstance(response, dict):
+            return response.get("status") == "ok"
+        return isinstance(response, str) and response.lower().startswith("report generated")
+
     def generate_report(self, state: AgentState):
         # check the tool to use.
         selected_tool = "generate_reports_tools"
@@ -115,6 +168,9 @@ class ReportGeneratorAgent(BaseAgent):
 
             # invoke the tool and get the result.
             report_generation_response = self.tools_dict[selected_tool].invoke(tool_input)
+            get_sql_cache().record_execution(
+                state['user_input'], state['postgres_query'], self._report_succeeded(report_generation_response)
+            )
 
             # update the state with the tool result.
             state['report_generation_response'] = report_generation_response
@@ -123,4 +179,14 @@ class ReportGeneratorAgent(BaseAgent):
             })
 
         return state
-    
\ No newline at end of file
+
+    async def agenerate_report(self, state: AgentState):
+        """
+        Async counterpart of generate_report. Chart rendering is CPU bound (matplotlib), so it runs in a worker
+        thread to keep the event loop free.
+        """
+        def _generate():
+            with self._report_lock:
+                return self.generate_report(state)
+
+        return await asyncio.to_thread(_generate)
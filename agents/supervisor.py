@@ -7,9 +7,12 @@ from config import Config
 from agents.base_agent import BaseAgent, AgentState
 from prompt_reference.supervisor_prompt import SupervisorPrompts
 from utils.handle_configs import get_llm
+from utils.intent_router import get_intent_router
+from utils.state_projection import project_state
 # third party libraries
 from langchain_core.messages import HumanMessage, SystemMessage
 from langgraph.graph import END
+import time
 
 
 
@@ -24,29 +27,69 @@ class SupervisorAgent(BaseAgent):
         # instantiate the parameters for supervisor agent. 
         self.supervisor_params = Config.supervisor_params
         self.llm = get_llm(self.supervisor_params)
-    
 
-    def handle_input(self, state: AgentState):
+        # local classifier that routes confident queries without calling the supervisor llm.
+        self.intent_router = get_intent_router()
+    
 
+    def _fast_path(self, state: AgentState):
+        """
+        Try the local intent router, returning the route when it is confident enough to skip the llm.
+        """
+        prediction = self.intent_router.predict(state['user_input'])
+        self.intent_router.record(prediction)
+
+        if prediction['fast_path']:
+            state['memory_chain'].append({
+                'supervisor_response': prediction['route'],
+                'routed_by': 'fast_path',
+                'confidence': prediction['confidence']
+            })
+            return prediction['route']
+        return None
+
+    def _routing_messages(self, state: AgentState):
         # instantiate the prompt with the state.
         system_message = SupervisorPrompts.supervisor_prompt.format(
-            state=state
+            state=project_state(state, "supervisor")
         )
 
-        message = [
+        return [
             SystemMessage(content=system_message),
             HumanMessage(content=state['user_input'])
         ]
 
-        # call the llm with the message.
-        supervisor_response = self.llm.invoke(message).content
+    def _record_llm_decision(self, state: AgentState, supervisor_response: str):
+        self.intent_router.add_example(state['user_input'], supervisor_response)
+        state['memory_chain'].append({'supervisor_response': supervisor_response, 'routed_by': 'llm'})
+
+    def handle_input(self, state: AgentState):
+
+        # try the local fast path first, only asking the llm when the classifier is not confident.
+        supervisor_response = self._fast_path(state)
+
+        if supervisor_response is None:
+            # call the llm with the message.
+            supervisor_response = self.llm.invoke(self._routing_messages(state)).content
+            self._record_llm_decision(state, supervisor_response)
 
         # update the state with the supervisor response on which agent to call next.
         state['supervisor_decision'] = supervisor_response
         print(state['supervisor_decision'])
 
-        state['memory_chain'].append({'supervisor_response': supervisor_response})
 
+        return state
+
+    async def ahandle_input(self, state: AgentState):
+
+        supervisor_response = self._fast_path(state)
+
+        if supervisor_response is None:
+            supervisor_response = (await self.llm.ainvoke(self._routing_messages(state))).content
+            self._record_llm_decision(state, supervisor_response)
+
+        state['supervisor_decision'] = supervisor_response
+        print(state['supervisor_decision'])
 
         return state
 
@@ -56,8 +99,11 @@ class SupervisorAgent(BaseAgent):
         """Routing based on supervisor's response"""
 
         decision = state['supervisor_decision']
- 
-        if "vector_db" in decision:
+
+        # hybrid questions fan out to the postgres and vector db branches, which run in parallel.
+        if "hybrid" in decision or ("vector_db" in decision and "postgres" in decision):
+            return ["hybrid_postgres", "hybrid_vector_db"]
+        elif "vector_db" in decision:
             return "vector_db_agent"
         elif "postgres" in decision:
             return "postgres_agent"
@@ -67,25 +113,63 @@ class SupervisorAgent(BaseAgent):
             # if no decision is made, return END to stop the graph.
             return "handle_response"
     
-    def handle_output(self, state: AgentState):
+    def join_branches(self, state: AgentState):
         """
-        Takes action based on the state of the agent.
-        :param state: The state of the agent containing the user input and states to be updated.
+        Join the parallel postgres and vector db branches of a hybrid question.
+        The branches only return their own fields (concurrent writes to the same key are rejected by the graph),
+        so their results are added to the memory chain here.
+        :param state: The state of the agent with both branch results merged in.
         :return: updated state for the agent.
         """
+        for key in ('postgres_query', 'postgres_agent_response', 'vector_db_agent_response'):
+            if state.get(key):
+                state['memory_chain'].append({key: state[key]})
+        return state
 
+    def _response_messages(self, state: AgentState):
         # use the tools to get the results and responses before getting back to the supervisor.
-        system_msg = SupervisorPrompts.supervisor_response_prompt.format(state=state)
-        message = [
+        system_msg = SupervisorPrompts.supervisor_response_prompt.format(state=project_state(state, "supervisor_response"))
+        return [
             SystemMessage(content=system_msg),
             HumanMessage(content=f"{state['user_input']}")
         ]
-        # call the llm with the message
-        agent_response = self.llm.invoke(message)
 
+    def _record_final_response(self, state: AgentState, chunks):
         # update the state with the agent response
-        state['final_response'] = agent_response.content
+        state['final_response'] = "".join(chunks)
         state['memory_chain'].append({
             'final_response': state['final_response']
         })
-        return state
\ No newline at end of file
+        return state
+
+    def handle_output(self, state: AgentState):
+        """
+        Takes action based on the state of the agent.
+        :param state: The state of the agent containing the user input and states to be updated.
+        :return: updated state for the agent.
+        """
+
+        # stream the llm response so the graph can forward tokens (stream_mode="messages") as they arrive.
+        start = time.perf_counter()
+        chunks = []
+        for chunk in self.llm.stream(self._response_messages(state)):
+            if not chunks:
+                state['time_to_first_token'] = round(time.perf_counter() - start, 4)
+            chunks.append(chunk.content)
+
+        return self._record_final_response(state, chunks)
+
+    async def ahandle_output(self, state: AgentState):
+        """
+        Async counterpart of handle_output.
+        :param state: The state of the agent containing the user input and states to be updated.
+        :return: updated state for the agent.
+        """
+        start = time.perf_counter()
+        chunks = []
+        async for chunk in self.llm.astream(self._response_messages(state)):
+            if not chunks:
+                state['time_to_first_token'] = round(time.perf_counter() - start, 4)
+            chunks.append(chunk.content)
+
+        return self._record_final_response(state, chunks)
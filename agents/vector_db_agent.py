@@ -3,6 +3,7 @@ from tools.vector_db_tools import vectorDbAgentTools
 
 from agents.base_agent import BaseAgent, AgentState
 from utils.handle_configs import get_llm
+from utils.state_projection import project_state
 
 from langchain_core.messages import HumanMessage, SystemMessage
 from config import Config
@@ -30,6 +31,11 @@ class VectorDbAgent(BaseAgent):
         self.response_agent = Config.vector_db_agent_params
         self.response_agent = get_llm(self.response_agent)
 
+        # async counterparts of the tools, used by the async node methods (not bound to the llm).
+        self.async_tools_dict = {t.name: t for t in [
+            vectorDbAgentTools.asimilarity_search
+            ]}
+
     def handle_input(self, state: AgentState):
         """
         Takes action based on the state of the agent.
@@ -38,7 +44,7 @@ class VectorDbAgent(BaseAgent):
         """
 
         # use the tools to get the results and responses before getting back to the supervisor.
-        system_msg = vector_db_prompt.format(state=state)
+        system_msg = vector_db_prompt.format(state=project_state(state, "vector_db_agent"))
         message = [
             SystemMessage(content=system_msg),
             HumanMessage(content=f"{state['user_input']}")
@@ -55,6 +61,25 @@ class VectorDbAgent(BaseAgent):
                 pass
 
         return state
+
+    async def ahandle_input(self, state: AgentState):
+        """
+        Async counterpart of handle_input.
+        """
+        system_msg = vector_db_prompt.format(state=project_state(state, "vector_db_agent"))
+        message = [
+            SystemMessage(content=system_msg),
+            HumanMessage(content=f"{state['user_input']}")
+        ]
+        agent_response = await self.llm_with_tools.ainvoke(message)
+
+        if hasattr(agent_response, 'tool_calls'):
+            try:
+                state['tool_calls'] = agent_response.tool_calls[0]['name']
+            except IndexError:
+                pass
+
+        return state
     
     def handle_output(self, state: AgentState):
         """
@@ -64,7 +89,7 @@ class VectorDbAgent(BaseAgent):
         """
 
         # use the tools to get the results and responses before getting back to the supervisor.
-        system_msg = vector_db_prompt.format(state=state)
+        system_msg = vector_db_prompt.format(state=project_state(state, "vector_db_agent"))
         message = [
             SystemMessage(content=system_msg),
             HumanMessage(content=f"{state['user_input']}")
@@ -79,6 +104,23 @@ class VectorDbAgent(BaseAgent):
         })
         return state
 
+    async def ahandle_output(self, state: AgentState):
+        """
+        Async counterpart of handle_output.
+        """
+        system_msg = vector_db_prompt.format(state=project_state(state, "vector_db_agent"))
+        message = [
+            SystemMessage(content=system_msg),
+            HumanMessage(content=f"{state['user_input']}")
+        ]
+        agent_response = await self.response_agent.ainvoke(message)
+
+        state['final_response'] = agent_response.content
+        state['memory_chain'].append({
+            'final_response': state['final_response']
+        })
+        return state
+
     def vector_search(self, state: AgentState):
         # check the tool to use.
         selected_tool = "similarity_search"
@@ -101,6 +143,27 @@ class VectorDbAgent(BaseAgent):
             })
 
         return state
+
+    async def avector_search(self, state: AgentState):
+        """
+        Async counterpart of vector_search.
+        """
+        selected_tool = "asimilarity_search"
+        print(f"Calling: {selected_tool}")
+
+        tool_input = {
+            "query": state['user_input'],
+            "k": 3
+        }
+
+        vector_db_agent_response = await self.async_tools_dict[selected_tool].ainvoke(tool_input)
+
+        state['vector_db_agent_response'] = vector_db_agent_response
+        state['memory_chain'].append({
+            'vector_db_agent_response': state['vector_db_agent_response']
+        })
+
+        return state
     
 
     def router(self, state: AgentState):
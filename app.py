@@ -5,7 +5,9 @@ _ = load_dotenv(override=True)
 import streamlit as st
 import streamlit.components.v1 as components
 from graphs.build_graph import build_supervisor_graph
+from utils.instrumentation import INSTRUMENTATION
 from tools.r_generate_report import generate_reports_tools
+from utils.jira_rollups import AGGREGATE_BY_GRAINS, build_report_query
 import psycopg2
 from streamlit_option_menu import option_menu
 import smtplib
@@ -64,6 +66,7 @@ def send_report_via_gmail(
 @st.cache_resource
 def get_graph():
     print("Building the graph...")
+    INSTRUMENTATION.start_http_server()
     graph = build_supervisor_graph()
     print("Graph has been built.")
     return graph
@@ -133,8 +136,17 @@ if submitted and query and query.strip():
     with st.chat_message("user"):
         st.markdown(query)
 
+    col3, _ = st.columns([5, 1])
+    with col3:
+        answer_placeholder = st.empty()
+
+    streamed_answer = ""
+    time_to_first_token = None
+    start_time = time.perf_counter()
+
     with st.spinner("Processing..."):
-        for output in graph.stream({
+        # "updates" gives the node-level progress, "messages" forwards the answer tokens as they are generated.
+        for mode, output in graph.stream({
             'user_input': query,
             'supervisor_decision': '',
             'tool_calls': '',
@@ -147,23 +159,36 @@ if submitted and query and query.strip():
             'report_generation_response': '',
             'final_response': '',
             'memory_chain': []
-        }, {"configurable": {"thread_id": "1"}}):
+        }, {"configurable": {"thread_id": "1"}}, stream_mode=["updates", "messages"]):
+            if mode == "messages":
+                message_chunk, metadata = output
+                if metadata.get("langgraph_node") == "handle_response" and message_chunk.content:
+                    if time_to_first_token is None:
+                        time_to_first_token = time.perf_counter() - start_time
+                        placeholder.empty()
+                    streamed_answer += message_chunk.content
+                    answer_placeholder.markdown(streamed_answer + "▌")
+                continue
+
             current_step = output.keys()
-            placeholder.markdown(f"Running step: `{list(current_step)[0]}`")
+            if time_to_first_token is None:
+                placeholder.markdown(f"Running step: `{list(current_step)[0]}`")
             results.append(output)
 
     placeholder.empty()
 
-    response = results[-1]['handle_response']['final_response']
+    # the last step is either the answer cache (on a hit) or the end of the agent pipeline.
+    final_state = list(results[-1].values())[0]
+    response = final_state['final_response']
 
-    col3, _ = st.columns([5, 1])
-    with col3:
-        st.markdown(f"<div style='text-align: left; font-style: italic;'>{response}</div>", unsafe_allow_html=True)
+    answer_placeholder.markdown(f"<div style='text-align: left; font-style: italic;'>{response}</div>", unsafe_allow_html=True)
+    if time_to_first_token is not None:
+        st.caption(f"Time to first token: {time_to_first_token:.2f}s (total {time.perf_counter() - start_time:.2f}s)")
 
     with st.expander("Show Full Model Process", expanded=False):
-        st.write(results[-1]['handle_response']['memory_chain'])
+        st.write(final_state['memory_chain'])
 
-    if results[-1]['handle_response']['report_generation_response'] == "Report Generated":
+    if final_state.get('report_generation_response') == "Report Generated":
         with open("reports/combined_report.html", "r") as file:
             report_content = file.read()
             components.html(report_content, height=800, scrolling=True)
@@ -203,28 +228,11 @@ if submitted and query and query.strip():
 
 # --- Report Display (After Manual Report Generation) ---
 if generate_report_clicked:
-    time_group = {
-        "Week": "DATE_TRUNC('week', \"Created\")",
-        "Month": "DATE_TRUNC('month', \"Created\")",
-        "3 Months": "DATE_TRUNC('quarter', \"Created\")"
-    }.get(selected_aggregate_by, "\"Created\"")
-
-    group_by_list = []
-    select_list = []
-
-    for col in selected_columns:
-        db_col = f'"{column_map[col]}"'
-        group_by_list.append(db_col)
-        select_list.append(db_col)
-
-    group_by_list.append(time_group)
-    select_list.append(f"{time_group} as period")
-
-    agg_col = column_map[selected_columns[0]] if selected_columns else "Created"
-    agg_expr = "COUNT(*)" if selected_agg == "COUNT" else f"{selected_agg}(\"{agg_col}\")"
-    group_by = ", ".join(group_by_list)
-    select_clause = ", ".join(select_list)
-    sql_query = f"SELECT {select_clause}, {agg_expr} as agg_value FROM jira_data GROUP BY {group_by}"
+    sql_query = build_report_query(
+        [column_map[col] for col in selected_columns],
+        AGGREGATE_BY_GRAINS.get(selected_aggregate_by),
+        selected_agg,
+    )
 
     tool_input = {
         "query": sql_query,
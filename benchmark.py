@@ -0,0 +1,297 @@
+"""
+Load-test the compiled supervisor graph by replaying a query corpus at a given concurrency.
+Reports p50/p95/p99 latency per route and per node, throughput, llm calls per request and cache hit rates, and writes
+the results as JSON so runs can be compared over time.
+
+    python benchmark.py --corpus requests.jsonl --concurrency 8 --warmup 3 --repeat 2
+    python benchmark.py --offline --async            # fake llm/embeddings, async graph
+"""
+
+import argparse
+import os
+import sys
+import json
+import time
+import uuid
+import asyncio
+import platform
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+_ = load_dotenv(override=True)
+
+
+QUERY_KEYS = ("query", "user_input", "title")
+
+
+def load_corpus(path: str, limit: int = None):
+    """
+    Read queries from a JSONL file (the first of the "query", "user_input" or "title" keys) or a plain text file
+    with one query per line.
+    """
+    queries = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                queries.append(line)
+                continue
+            if isinstance(record, str):
+                queries.append(record)
+                continue
+            query = next((record[key] for key in QUERY_KEYS if record.get(key)), None)
+            if query:
+                queries.append(query)
+    return queries[:limit] if limit else queries
+
+
+def initial_state(query: str):
+    return {
+        'user_input': query,
+        'request_id': uuid.uuid4().hex,
+        'supervisor_decision': '',
+        'tool_calls': '',
+        'agent_tool_retries': 0,
+        'agent_max_tool_retries': 3,
+        'postgres_query': '',
+        'postgres_agent_response': '',
+        'vector_db_agent_response': '',
+        'report_generation_requested': '',
+        'report_generation_response': '',
+        'final_response': '',
+        'memory_chain': []
+    }
+
+
+def percentiles(values):
+    """
+    p50/p95/p99 (linear interpolation), mean and max of a list of latencies.
+    """
+    if not values:
+        return {"count": 0}
+    ordered = sorted(values)
+
+    def pct(p):
+        rank = (len(ordered) - 1) * p / 100
+        low = int(rank)
+        high = min(low + 1, len(ordered) - 1)
+        return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+    return {
+        "count": len(ordered),
+        "p50": round(pct(50), 4),
+        "p95": round(pct(95), 4),
+        "p99": round(pct(99), 4),
+        "mean": round(sum(ordered) / len(ordered), 4),
+        "max": round(ordered[-1], 4),
+    }
+
+
+def record_result(query: str, state, final_state, seconds: float, error: Exception = None):
+    from utils.instrumentation import INSTRUMENTATION
+
+    events = INSTRUMENTATION.events_for(state['request_id'])
+    final_state = final_state or {}
+    if final_state.get('answer_cache_hit'):
+        route = "answer_cache"
+    else:
+        route = final_state.get('supervisor_decision') or "error"
+    return {
+        "query": query,
+        "request_id": state['request_id'],
+        "route": route,
+        "seconds": round(seconds, 4),
+        "error": repr(error) if error else None,
+        "llm_calls": sum(len(event["llm"]) for event in events),
+        "nodes": [(event["node"], event["wall_seconds"]) for event in events],
+    }
+
+
+def run_sync(graph, queries, concurrency: int):
+    def run_one(query):
+        state = initial_state(query)
+        start = time.perf_counter()
+        try:
+            final_state = graph.invoke(state, {"configurable": {"thread_id": state['request_id']}})
+            return record_result(query, state, final_state, time.perf_counter() - start)
+        except Exception as e:
+            return record_result(query, state, None, time.perf_counter() - start, e)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        return list(executor.map(run_one, queries))
+
+
+def run_async(graph, queries, concurrency: int):
+    async def run_all():
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def run_one(query):
+            async with semaphore:
+                state = initial_state(query)
+                start = time.perf_counter()
+                try:
+                    final_state = await graph.ainvoke(state, {"configurable": {"thread_id": state['request_id']}})
+                    return record_result(query, state, final_state, time.perf_counter() - start)
+                except Exception as e:
+                    return record_result(query, state, None, time.perf_counter() - start, e)
+
+        return await asyncio.gather(*(run_one(query) for query in queries))
+
+    return asyncio.run(run_all())
+
+
+def cache_stats():
+    from utils.handle_configs import LLM_REGISTRY
+    from utils.intent_router import get_intent_router
+    from utils.answer_cache import get_answer_cache
+    from utils.sql_cache import get_sql_cache
+    from utils.result_summary import get_result_store
+    from utils.query_guard import get_query_guard
+    from utils.result_cache import get_result_cache
+    from utils.sql_validator import get_sql_validator
+    from connectors.db_connector import pool_stats
+    from connectors.vector_db_connector import milvus_stats
+    from utils.embedding_cache import get_embedding_cache
+    from config import Config
+
+    stats = {
+        "llm_registry": LLM_REGISTRY.stats(),
+        "intent_router": get_intent_router().stats(),
+        "sql_cache": get_sql_cache().stats(),
+        "result_store": get_result_store().stats(),
+        "query_guard": get_query_guard().stats(),
+        "result_cache": get_result_cache().stats(),
+        "sql_validator": get_sql_validator().stats(),
+        "postgres_pool": pool_stats(),
+        "milvus": milvus_stats(),
+        "embedding_cache": get_embedding_cache().stats(),
+    }
+    if Config.answer_cache_params["enabled"]:
+        stats["answer_cache"] = get_answer_cache().stats()
+    return stats
+
+
+def delta(after, before):
+    """
+    Subtract the numeric counters of two stats snapshots, so warmup does not count towards the measured hit rates.
+    """
+    if isinstance(after, dict):
+        return {key: delta(value, (before or {}).get(key)) for key, value in after.items()}
+    if isinstance(after, (int, float)) and not isinstance(after, bool) and isinstance(before, (int, float)):
+        return after - before
+    return after
+
+
+def summarize(results, wall_seconds: float):
+    by_route, by_node = defaultdict(list), defaultdict(list)
+    for result in results:
+        by_route[result["route"]].append(result["seconds"])
+        for node, seconds in result["nodes"]:
+            by_node[node].append(seconds)
+
+    llm_calls = [result["llm_calls"] for result in results]
+    return {
+        "requests": len(results),
+        "errors": sum(1 for result in results if result["error"]),
+        "wall_seconds": round(wall_seconds, 4),
+        "throughput_rps": round(len(results) / wall_seconds, 4) if wall_seconds else 0.0,
+        "latency": percentiles([result["seconds"] for result in results]),
+        "latency_by_route": {route: percentiles(values) for route, values in sorted(by_route.items())},
+        "latency_by_node": {node: percentiles(values) for node, values in sorted(by_node.items())},
+        "llm_calls_per_request": round(sum(llm_calls) / len(llm_calls), 4) if llm_calls else 0.0,
+    }
+
+
+def print_summary(summary):
+    print(f"\n{summary['requests']} requests, {summary['errors']} errors in {summary['wall_seconds']}s "
+          f"({summary['throughput_rps']} req/s), {summary['llm_calls_per_request']} llm calls/request")
+    for title, rows in (("route", summary["latency_by_route"]), ("node", summary["latency_by_node"])):
+        print(f"\n{title:<28}{'n':>6}{'p50':>10}{'p95':>10}{'p99':>10}")
+        for name, stats in rows.items():
+            print(f"{name:<28}{stats['count']:>6}{stats['p50']:>10}{stats['p95']:>10}{stats['p99']:>10}")
+    for name, stats in summary["caches"].items():
+        if "hit_rate" in stats or "fast_path_rate" in stats:
+            print(f"{name}: {json.dumps({k: v for k, v in stats.items() if not isinstance(v, (dict, list))})}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the supervisor graph against a query corpus.")
+    parser.add_argument("--corpus", default="requests.jsonl", help="JSONL (query/user_input/title keys) or text file.")
+    parser.add_argument("--concurrency", type=int, default=4, help="Requests in flight at once.")
+    parser.add_argument("--warmup", type=int, default=2, help="Queries run (and discarded) before measuring.")
+    parser.add_argument("--repeat", type=int, default=1, help="Times to replay the corpus.")
+    parser.add_argument("--limit", type=int, default=None, help="Only use the first N queries of the corpus.")
+    parser.add_argument("--async", dest="async_mode", action="store_true", help="Use the async graph and ainvoke.")
+    parser.add_argument("--no-answer-cache", action="store_true", help="Build the graph without the answer cache.")
+    parser.add_argument("--offline", action="store_true", help="Use the fake llm and hashing embedding backends.")
+    parser.add_argument("--output", default=None, help="Results JSON path, defaults to .cache/benchmarks/<timestamp>.json.")
+    args = parser.parse_args()
+
+    if args.offline:
+        os.environ["LLM_BACKEND"] = "fake"
+        os.environ["EMBEDDING_BACKEND"] = "fake"
+
+    from config import Config
+    from graphs.build_graph import build_supervisor_graph
+
+    queries = load_corpus(args.corpus, args.limit)
+    if not queries:
+        sys.exit(f"No queries found in {args.corpus}")
+
+    answer_cache = Config.answer_cache_params["enabled"] and not args.no_answer_cache
+    graph = build_supervisor_graph(answer_cache=answer_cache, async_mode=args.async_mode)
+    run = run_async if args.async_mode else run_sync
+
+    if args.warmup:
+        print(f"Warming up with {min(args.warmup, len(queries))} queries...")
+        run(graph, queries[:args.warmup], args.concurrency)
+
+    measured = queries * args.repeat
+    print(f"Running {len(measured)} requests at concurrency {args.concurrency}...")
+    before = cache_stats()
+    start = time.perf_counter()
+    results = run(graph, measured, args.concurrency)
+    wall_seconds = time.perf_counter() - start
+
+    summary = summarize(results, wall_seconds)
+    after = cache_stats()
+    summary["caches"] = delta(after, before)
+    # pool sizes are gauges, not counters.
+    summary["caches"]["postgres_pool"] = after["postgres_pool"]
+    # and the milvus averages and maxima are not deltas either.
+    summary["caches"]["milvus"] = after["milvus"]
+    for stats in summary["caches"].values():
+        # hit rates over the measured phase only.
+        if "hits" in stats and "misses" in stats:
+            lookups = stats["hits"] + stats["misses"]
+            stats["hit_rate"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+        if "fast_path" in stats and "llm_fallback" in stats:
+            routed = stats["fast_path"] + stats["llm_fallback"]
+            stats["fast_path_rate"] = round(stats["fast_path"] / routed, 4) if routed else 0.0
+    print_summary(summary)
+
+    output = args.output or os.path.join(".cache", "benchmarks", f"benchmark_{time.strftime('%Y%m%d_%H%M%S')}.json")
+    directory = os.path.dirname(output)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump({
+            "timestamp": time.time(),
+            "settings": vars(args) | {"answer_cache": answer_cache, "queries": len(queries)},
+            "environment": {
+                "python": platform.python_version(),
+                "llm_backend": os.environ.get("LLM_BACKEND", Config.offline_backend_params["llm_backend"]),
+                "embedding_backend": os.environ.get("EMBEDDING_BACKEND", Config.offline_backend_params["embedding_backend"]),
+            },
+            "summary": summary,
+            "requests": results,
+        }, f, indent=2, default=str)
+    print(f"\nResults written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -113,4 +113,238 @@ class Config:
             "top_p": 1,
         },
         "model_id": "mistralai/mistral-large"
-    }
\ No newline at end of file
+    }
+    answer_cache_params = {
+        "enabled": True,
+        "max_entries": 500,
+        "ttl_seconds": 24 * 60 * 60,
+        "use_embeddings": True,
+        "similarity_threshold": 0.92,
+        "sqlite_path": ".cache/answer_cache.sqlite3",
+        "max_persisted_entries": 5000,
+        "milvus_version_path": ".cache/milvus_ingestion_version",
+        "watermark_poll_seconds": 60,
+    }
+
+    embedding_cache_params = {
+        "enabled": True,
+        "memory_max_entries": 2048,
+        # per model: a <directory>/<model>.f32 memmap of disk_max_entries rows and a SQLite key index.
+        "directory": ".cache/embeddings",
+        "disk_max_entries": 50000,
+    }
+
+    milvus_connection_params = {
+        "alias": "default",
+        "secure": True,
+        # gRPC keepalive pings keep the long-lived connection from being dropped while idle.
+        "keep_alive": True,
+        "connect_timeout_seconds": 10,
+        "search_timeout_seconds": 10,
+    }
+
+    postgres_pool_params = {
+        "min_size": 1,
+        "max_size": 10,
+        "checkout_timeout_seconds": 30,
+        "max_lifetime_seconds": 60 * 60,
+        "max_idle_seconds": 10 * 60,
+        "statement_timeout_ms": 30000,
+        # ping connections before handing them out, replacing ones dropped by the server or the network.
+        "check_on_checkout": True,
+    }
+
+    postgres_fetch_params = {
+        # read queries are streamed through a server-side cursor, fetch_size rows per round trip.
+        "fetch_size": 500,
+        # rows returned by run_query (None for no cap); the rest is skipped server side.
+        "max_rows": 1000,
+        # count the skipped rows (MOVE FORWARD ALL) to report the total row count of truncated results.
+        "count_total": True,
+    }
+
+    query_guard_params = {
+        # llm-generated sql is planned with EXPLAIN first and only runs if the estimates are within these limits.
+        "enabled": True,
+        "max_total_cost": 1_000_000,
+        "max_plan_rows": 100_000,
+        # over the limits, retry the plan with a LIMIT added before rejecting the query.
+        "rewrite_with_limit": True,
+        "limit_rows": 1000,
+        # the guarded transaction is read-only, with its own timeout and sort/hash memory.
+        "read_only": True,
+        "statement_timeout_ms": 15000,
+        "work_mem": "16MB",
+    }
+
+    result_cache_params = {
+        "enabled": True,
+        "max_entries": 256,
+        "ttl_seconds": 5 * 60,
+        # results with more rows than this are not cached.
+        "max_cached_rows": 1000,
+        # pg_stat_user_tables is polled at most this often to catch writes made outside this process.
+        "counter_poll_seconds": 5,
+    }
+
+    postgres_frame_params = {
+        # "auto" parses COPY output with pyarrow when installed and pandas otherwise; or "pyarrow" / "pandas".
+        "engine": "auto",
+        # text columns with at most this many distinct values (and at most this share of the rows) become categoricals.
+        "categorical_max_unique": 1000,
+        "categorical_max_ratio": 0.5,
+    }
+
+    result_summary_params = {
+        "enabled": True,
+        # results with up to this many rows go into the state as they are.
+        "inline_rows": 20,
+        # larger ones are summarized: the first head_rows rows, column stats and the top_k values of categorical columns.
+        "head_rows": 10,
+        "top_k": 5,
+        "max_value_length": 60,
+        # full results are kept out of the state in the result store, referenced by handle.
+        "store_max_entries": 100,
+        "store_ttl_seconds": 60 * 60,
+    }
+
+    jira_loader_params = {
+        "table": "jira_data",
+        # tickets are merged by key, and only updated when the export has a newer watermark.
+        "key_column": "Key",
+        "watermark_column": "Updated",
+        # export field names (csv headers or json field ids, case-insensitive) -> table columns.
+        "column_aliases": {
+            "issue key": "Key",
+            "key": "Key",
+            "issue type": "Issue Type",
+            "issuetype": "Issue Type",
+            "summary": "Summary",
+            "assignee": "Assignee",
+            "reporter": "Reporter",
+            "status": "Status",
+            "resolution": "Resolution",
+            "resolution details": "Resolution Details",
+            "created": "Created",
+            "updated": "Updated",
+        },
+        "timestamp_columns": ["Created", "Updated"],
+        # formats tried after ISO 8601, e.g. the "12/Mar/24 10:15 AM" dates of jira csv exports.
+        "datetime_formats": ["%d/%b/%y %I:%M %p", "%d/%b/%Y %I:%M %p", "%d/%m/%Y %H:%M", "%m/%d/%Y %H:%M"],
+        "progress_every": 50000,
+    }
+
+    jira_rollup_params = {
+        "enabled": True,
+        "source_table": "jira_data",
+        # rollup tables are named <prefix>_week/_month/_quarter, with <prefix>_tickets and <prefix>_state.
+        "table_prefix": "jira_rollup",
+        # only the ones present in the source table are maintained.
+        "dimensions": ["Issue Type", "Status", "Assignee", "Priority", "Resolution"],
+        # reports fold in tickets updated since the last refresh at most this often.
+        "refresh_seconds": 60,
+    }
+
+    index_advisor_params = {
+        # executed read queries are appended here for advise_indexes.py.
+        "enabled": True,
+        "workload_path": "data/sql_workload.jsonl",
+        "max_log_bytes": 20_000_000,
+        # tables to advise on (empty for every table of the schema catalog).
+        "tables": ["jira_data"],
+        "max_index_columns": 3,
+        # recommendations saving less of the workload's planner cost are dropped.
+        "min_gain_pct": 5.0,
+        "use_hypopg": True,
+        # without hypopg, build each candidate in a rolled-back transaction (blocks writes to the table meanwhile).
+        "trial_builds": False,
+        "statement_timeout_ms": 60000,
+        "build_timeout_ms": 3_600_000,
+    }
+
+    schema_catalog_params = {
+        "schema": "public",
+        # how often the catalog checksum is polled; the schema is only re-introspected when it changes.
+        "poll_seconds": 300,
+        "include_indexes": True,
+        "snapshot_path": ".cache/schema_catalog.json",
+    }
+
+    schema_linking_params = {
+        "enabled": True,
+        # tables included in the sql prompt, picked by their relevance to the question.
+        "top_n": 3,
+        "min_score": 0.1,
+        "relative_cutoff": 0.5,
+        "default_tables": ["jira_data"],
+        "use_embeddings": True,
+        "embedding_weight": 0.4,
+        # lexical evidence at which a table scores 1.0.
+        "lexical_saturation": 4.0,
+        "sample_rows": 200,
+        "max_values_per_column": 20,
+        "max_value_length": 40,
+    }
+
+    sql_cache_params = {
+        "enabled": True,
+        "max_entries": 1000,
+        "ttl_seconds": 7 * 24 * 60 * 60,
+        "use_embeddings": True,
+        "similarity_threshold": 0.95,
+        "sqlite_path": ".cache/sql_cache.sqlite3",
+        "max_persisted_entries": 10000,
+    }
+
+    intent_router_params = {
+        "enabled": True,
+        "confidence_threshold": 0.35,
+        "min_score": 0.25,
+        "query_log_path": "data/routing_query_log.jsonl",
+        "log_llm_decisions": True,
+        "retrain_every": 20,
+    }
+    state_projection_params = {
+        "log_token_counts": True,
+        "profiles": {
+            "supervisor": {
+                "fields": ["user_input", "postgres_agent_response", "vector_db_agent_response", "report_generation_response"],
+                "max_tokens": 400,
+            },
+            "supervisor_response": {
+                "fields": [
+                    "user_input", "supervisor_decision", "postgres_query", "postgres_agent_response",
+                    "vector_db_agent_response", "report_generation_response"
+                ],
+                "max_tokens": 3000,
+            },
+            "postgres_agent": {
+                "fields": ["user_input", "postgres_query", "postgres_agent_response"],
+                "max_tokens": 800,
+            },
+            "vector_db_agent": {
+                "fields": ["user_input", "vector_db_agent_response"],
+                "max_tokens": 2000,
+            },
+        },
+    }
+    instrumentation_params = {
+        "enabled": True,
+        "jsonl_path": ".cache/node_metrics.jsonl",
+        "prometheus_port": 9464,
+        "recent_events": 5000,
+    }
+    offline_backend_params = {
+        # "watsonx" or "fake"; overridden by the LLM_BACKEND / EMBEDDING_BACKEND environment variables.
+        "llm_backend": "watsonx",
+        "embedding_backend": "watsonx",
+        "embedding_dimension": 768,
+        "fake_llm": {
+            "latency_seconds": 0.05,
+            "seconds_per_token": 0.0,
+            "completion_tokens": None,
+            "sql_response": 'SELECT "Key", "Summary", "Status", "Updated" FROM jira_data ORDER BY "Updated" DESC LIMIT 10;',
+            # (regex on the user input, response) pairs, checked in order.
+            "scripted_responses": [],
+        },
+    }
@@ -1,57 +1,254 @@
 import psycopg
 from psycopg import sql
-from psycopg.rows import dict_row
+from psycopg.rows import dict_row, tuple_row
+from psycopg_pool import ConnectionPool, AsyncConnectionPool, PoolTimeout
 from pglast import parse_sql, Error
-from typing import Dict, Union, Any
+from typing import Dict, Union, Any, Optional
+from contextlib import contextmanager
+from utils.instrumentation import INSTRUMENTATION
+from utils.query_guard import EXPLAIN_PREFIX, get_query_guard, limit_query, plan_estimates, strip_statement
+from utils.columnar_fetch import column_kinds, copy_statement, read_frame
+from utils.result_cache import get_result_cache
+from utils.index_advisor import get_workload_log
+from config import Config
+import threading
+import asyncio
+import weakref
+import uuid
+import time
 import os
 import re
 
-class PostgresConnector:
+def connection_kwargs() -> Dict[str, Any]:
+    """
+    Connection parameters for the PostgreSQL database, read from the environment.
+    """
+    return dict(
+        dbname=os.environ['PostGresDB'],
+        user=os.environ['PostGresUser'],
+        password=os.environ['PostGresPass'],
+        host=os.environ['PostGresHost'],
+        port=os.environ['PostGresPort'],
+        connect_timeout=10
+    )
+
+
+# statements a server-side cursor can be declared for (DECLARE ... CURSOR FOR <select>).
+READ_QUERY_PATTERN = re.compile(r"^\s*\(*\s*(SELECT|VALUES|TABLE|WITH)\b", re.IGNORECASE)
+WRITE_KEYWORD_PATTERN = re.compile(r"\b(INSERT|UPDATE|DELETE|MERGE)\b", re.IGNORECASE)
+
+
+def is_read_query(query) -> bool:
+    """
+    Whether a query is a plain read that can be streamed through a named (server-side) cursor.
+    """
+    if not isinstance(query, str) or not READ_QUERY_PATTERN.match(query):
+        return False
+    # data-modifying CTEs (WITH ... INSERT/UPDATE/DELETE) cannot be declared as a cursor.
+    return not (query.lstrip(" (\n\t").upper().startswith("WITH") and WRITE_KEYWORD_PATTERN.search(query))
+
+
+def _cursor_name() -> str:
+    return f"agent_cursor_{uuid.uuid4().hex[:12]}"
+
+
+def _fetch_limits(max_rows: Optional[int], fetch_size: Optional[int]):
+    params = Config.postgres_fetch_params
+    return (params["max_rows"] if max_rows is None else max_rows), (fetch_size or params["fetch_size"])
+
+
+def guarded_response(query: str, executed: str, rows, total, truncated: bool, estimates: Dict[str, Any]):
+    """
+    The run_query style result of a guarded query, noting when the guard had to add a LIMIT.
+    """
+    limit = get_query_guard().params["limit_rows"] if executed != query else None
+    # when the injected LIMIT was reached the real row count is unknown, only the planner's estimate.
+    limit_reached = limit is not None and len(rows) >= limit
+    return {
+        "status": "ok",
+        "type": "select",
+        "data": rows,
+        "row_count": None if limit_reached else total,
+        "truncated": truncated or limit_reached,
+        "guard": dict(estimates, limit_injected=limit),
+    }
+
+
+class PoolMetrics:
     def __init__(self):
         """
-        Initialize the PostgresConnector class.
-        Establishes a connection to the PostgreSQL database.
+        Checkout wait times and timeouts of a connection pool, on top of psycopg_pool's own get_stats().
         """
-        try:
-            self.conn = psycopg.connect(
-                dbname=os.environ['PostGresDB'],
-                user=os.environ['PostGresUser'],
-                password=os.environ['PostGresPass'],
-                host=os.environ['PostGresHost'],
-                port=os.environ['PostGresPort'],
-                connect_timeout=10
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self.statement_timeout_sets = 0
+
+    def record_checkout(self, wait_seconds: float):
+        with self._lock:
+            self.checkouts += 1
+            self.wait_seconds_total += wait_seconds
+            self.wait_seconds_max = max(self.wait_seconds_max, wait_seconds)
+
+    def record_timeout(self):
+        with self._lock:
+            self.timeouts += 1
+
+    def stats(self, pool) -> Dict[str, Any]:
+        pool_stats = pool.get_stats() if pool is not None else {}
+        with self._lock:
+            return {
+                "pool_size": pool_stats.get("pool_size", 0),
+                "pool_available": pool_stats.get("pool_available", 0),
+                "in_use": pool_stats.get("pool_size", 0) - pool_stats.get("pool_available", 0),
+                "requests_waiting": pool_stats.get("requests_waiting", 0),
+                "connections_opened": pool_stats.get("connections_num", 0),
+                "connections_lost": pool_stats.get("connections_lost", 0),
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "wait_seconds_avg": round(self.wait_seconds_total / self.checkouts, 6) if self.checkouts else 0.0,
+                "wait_seconds_max": round(self.wait_seconds_max, 6),
+                "statement_timeout_sets": self.statement_timeout_sets,
+            }
+
+
+# statement_timeout currently set on each pooled connection, so a checkout only pays a round trip to change it.
+_statement_timeouts = weakref.WeakKeyDictionary()
+
+
+def _pool_kwargs() -> Dict[str, Any]:
+    params = Config.postgres_pool_params
+    return dict(
+        min_size=params["min_size"],
+        max_size=params["max_size"],
+        timeout=params["checkout_timeout_seconds"],
+        max_lifetime=params["max_lifetime_seconds"],
+        max_idle=params["max_idle_seconds"],
+        kwargs=dict(autocommit=True, **connection_kwargs()),
+    )
+
+
+def _configure(conn: psycopg.Connection):
+    timeout_ms = Config.postgres_pool_params["statement_timeout_ms"]
+    conn.execute("SELECT set_config('statement_timeout', %s, false)", (str(timeout_ms),))
+    _statement_timeouts[conn] = timeout_ms
+
+
+async def _aconfigure(conn: psycopg.AsyncConnection):
+    timeout_ms = Config.postgres_pool_params["statement_timeout_ms"]
+    await conn.execute("SELECT set_config('statement_timeout', %s, false)", (str(timeout_ms),))
+    _statement_timeouts[conn] = timeout_ms
+
+
+_POOL: Optional[ConnectionPool] = None
+_POOL_LOCK = threading.Lock()
+POOL_METRICS = PoolMetrics()
+
+
+def get_pool() -> ConnectionPool:
+    """
+    Return the process-wide PostgreSQL connection pool, opening it on first use.
+    """
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is None:
+            params = Config.postgres_pool_params
+            _POOL = ConnectionPool(
+                check=ConnectionPool.check_connection if params["check_on_checkout"] else None,
+                configure=_configure,
+                name="postgres",
+                open=True,
+                **_pool_kwargs()
             )
-            self.conn.autocommit = True  # Optional: Set autocommit mode
-            print("Connection to PostgreSQL database established successfully.")
-        except psycopg.Error as e:
-            print(f"Error connecting to PostgreSQL database: {e}")
-            raise
-        
-    def get_table_schemas(self) -> Dict[str, Any]:
-        """
-        Get the schemas of all tables in the PostgreSQL database.
-        """  
-        with self.conn.cursor() as cur:
-                cur.execute("""
-                    SELECT table_name, column_name, data_type
-                    FROM information_schema.columns
-                    WHERE table_schema = 'public'
-                    ORDER BY table_name, ordinal_position;
-                """)
-                results = cur.fetchall()
+            print("PostgreSQL connection pool opened.")
+        return _POOL
+
+
+def close_pool():
+    """
+    Close the process-wide connection pool, e.g. on shutdown or after rotating credentials.
+    """
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is not None:
+            _POOL.close()
+            _POOL = None
+
+
+def pool_stats() -> Dict[str, Any]:
+    """
+    Pool size, connections in use, waiting requests, checkout wait times and timeouts of the shared pool.
+    """
+    return POOL_METRICS.stats(_POOL)
+
+
+@contextmanager
+def pooled_connection(statement_timeout_ms: Optional[int] = None):
+    """
+    Check a connection out of the shared pool for the duration of the block.
+    :param statement_timeout_ms: the statement_timeout for this checkout, defaults to the pool's configured value.
+    """
+    pool = get_pool()
+    start = time.perf_counter()
+    try:
+        with pool.connection() as conn:
+            POOL_METRICS.record_checkout(time.perf_counter() - start)
+            timeout_ms = statement_timeout_ms or Config.postgres_pool_params["statement_timeout_ms"]
+            if _statement_timeouts.get(conn) != timeout_ms:
+                conn.execute("SELECT set_config('statement_timeout', %s, false)", (str(timeout_ms),))
+                _statement_timeouts[conn] = timeout_ms
+                POOL_METRICS.statement_timeout_sets += 1
+            yield conn
+    except PoolTimeout:
+        POOL_METRICS.record_timeout()
+        raise
+
+
+class PostgresConnector:
+    def __init__(self, statement_timeout_ms: Optional[int] = None):
+        """
+        Initialize the PostgresConnector class.
+        Connections come from the process-wide pool (see get_pool) and are checked out per call, so creating a
+        connector is cheap and does not open a connection.
+        :param statement_timeout_ms: the statement_timeout for this connector's queries, defaults to
+            Config.postgres_pool_params["statement_timeout_ms"].
+        """
+        self.statement_timeout_ms = statement_timeout_ms
+        get_pool()
+
+    def connection(self):
+        """
+        Context manager checking a connection out of the pool with this connector's statement_timeout:
+
+            with PostgresConnector().connection() as conn:
+                conn.execute(...)
+        """
+        return pooled_connection(self.statement_timeout_ms)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close_connection()
+
+    def get_table_schemas(self, table_name: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Get the schemas of all tables (or one table) in the PostgreSQL database, served from the cached schema catalog.
+        :param table_name: only describe this table.
+        """
+        from utils.schema_catalog import get_schema_catalog
         schemas_text = ""
-        current_table = None
-        for row in results:
-            table, column, data_type = row
-            if current_table != table:
-                if current_table is not None:
-                    schemas_text += "\n"
-                schemas_text += f"Table: {table}\n"
-                current_table = table
-            schemas_text += f"  Column: {column}, Type: {data_type}\n"
+        for table, meta in get_schema_catalog().get_tables().items():
+            if table_name is not None and table != table_name:
+                continue
+            if schemas_text:
+                schemas_text += "\n"
+            schemas_text += f"Table: {table}\n"
+            for column, data_type in meta["columns"]:
+                schemas_text += f"  Column: {column}, Type: {data_type}\n"
         return schemas_text
-    
-        #return results
 
     def create_table(self, table_name, schema):
         """
@@ -59,9 +256,10 @@ class PostgresConnector:
         """
         create_table_query = sql.SQL("""CREATE TABLE IF NOT EXISTS {}""").format(sql.Identifier(table_name)) + sql.SQL(schema)
 
-        with self.conn.cursor() as cur:
+        with self.connection() as conn, conn.cursor() as cur:
             cur.execute(create_table_query)
             print(f"Table '{table_name}' created or already exists.")
+        get_result_cache().invalidate_tables([table_name])
 
     def insert_data(self, table_name, data: dict):
         """
@@ -77,88 +275,256 @@ class PostgresConnector:
             sql.SQL(', ').join(sql.Placeholder() * len(columns))
         )
 
-        with self.conn.cursor() as cur:
+        with self.connection() as conn, conn.cursor() as cur:
             cur.execute(insert_query, list(values))
             print(f"Inserted data into '{table_name}': {data}")
+        get_result_cache().invalidate_tables([table_name])
+
+
+    def iter_query(self, query, params=None, fetch_size: Optional[int] = None, row_factory=dict_row):
+        """
+        Stream the rows of a read query in chunks through a named (server-side) cursor, so memory stays bounded
+        whatever the size of the result. The pooled connection is held until the iterator is exhausted or closed.
+        :param query: the SELECT query to run.
+        :param params: optional parameters for the query.
+        :param fetch_size: rows per chunk, defaults to Config.postgres_fetch_params["fetch_size"].
+        :param row_factory: the psycopg row factory, dict rows by default.
+        :return: an iterator of row lists.
+        """
+        _, fetch_size = _fetch_limits(None, fetch_size)
+        start = time.perf_counter()
+        total = 0
+        with self.connection() as conn, conn.transaction():
+            with conn.cursor(name=_cursor_name(), row_factory=row_factory) as cur:
+                cur.execute(query, params or None)
+                while True:
+                    rows = cur.fetchmany(fetch_size)
+                    if not rows:
+                        break
+                    total += len(rows)
+                    yield rows
+        INSTRUMENTATION.record_io("postgres", time.perf_counter() - start, rows=total)
+
+    @staticmethod
+    def _fetch_bounded(conn, query, params, max_rows: Optional[int], fetch_size: int, row_factory=dict_row):
+        """
+        Run a read query through a named cursor, fetching at most max_rows rows in fetch_size chunks.
+        Whatever is left is skipped server side (MOVE FORWARD ALL), which also yields the total row count.
+        :return: (column names, rows, total row count or None, truncated flag).
+        """
+        with conn.transaction():
+            name = _cursor_name()
+            with conn.cursor(name=name, row_factory=row_factory) as cur:
+                cur.execute(query, params or None)
+                columns = [desc[0] for desc in cur.description or []]
+                rows = []
+                while max_rows is None or len(rows) < max_rows:
+                    size = fetch_size if max_rows is None else min(fetch_size, max_rows - len(rows))
+                    chunk = cur.fetchmany(size)
+                    if not chunk:
+                        return columns, rows, len(rows), False
+                    rows.extend(chunk)
 
+                if Config.postgres_fetch_params["count_total"]:
+                    skipped = conn.execute(sql.SQL("MOVE FORWARD ALL FROM {}").format(sql.Identifier(name))).rowcount
+                    return columns, rows, len(rows) + skipped, skipped > 0
+                more = cur.fetchmany(1)
+                return columns, rows, (len(rows) if not more else None), bool(more)
 
-    def query_data(self, query, params=None):
+    def query_data(self, query, params=None, max_rows: Optional[int] = None, fetch_size: Optional[int] = None):
         """
         Execute a custom SQL query and return the results.
         `query` should be a string or a psycopg.sql.SQL object.
         `params` is an optional tuple or list of parameters to bind to the query.
+        Read queries are fetched in chunks through a server-side cursor, capped at `max_rows` rows when given.
         """
-        with self.conn.cursor() as cur:
-            cur.execute(query, params)
-            cols = [desc[0] for desc in cur.description]
-            rows = cur.fetchall()
+        start = time.perf_counter()
+        _, fetch_size = _fetch_limits(None, fetch_size)
+        cache = get_result_cache()
+        cache_key = cache.key(query, params, ("query_data", max_rows)) if is_read_query(query) else None
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return list(cached)
+
+        with self.connection() as conn:
+            if is_read_query(query):
+                cols, rows, _, _ = self._fetch_bounded(conn, query, params, max_rows, fetch_size, row_factory=tuple_row)
+            else:
+                with conn.cursor() as cur:
+                    cur.execute(query, params)
+                    cols = [desc[0] for desc in cur.description]
+                    rows = cur.fetchall()
             output = [cols] + rows
-            return output
+            INSTRUMENTATION.record_io("postgres", time.perf_counter() - start, rows=len(rows))
+        cache.set(cache_key, output, rows=len(rows))
+        return list(output)
+
+    def query_frame(self, query, params=None, max_rows: Optional[int] = None):
+        """
+        Execute a read query and return the result as a pandas DataFrame.
+        The rows are streamed with COPY ... TO STDOUT and parsed column-wise (see utils.columnar_fetch), so no per-row
+        Python tuples are built, and low-cardinality text columns come back as categoricals.
+        :param query: The SQL query to execute.
+        :param params: Optional parameters for the query.
+        :param max_rows: an optional row cap.
+        :return: the DataFrame.
+        """
+        import pandas as pd
+
+        if not is_read_query(query):
+            data = self.query_data(query, params=params)
+            return pd.DataFrame(data[1:], columns=data[0])
+
+        start = time.perf_counter()
+        query = limit_query(query, max_rows) if max_rows is not None else strip_statement(query)
+        cache = get_result_cache()
+        cache_key = cache.key(query, params, "query_frame")
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return cached.copy()
+
+        with self.connection() as conn, conn.cursor() as cur:
+            # the result columns and their types, without fetching anything.
+            cur.execute(limit_query(query, 0), params or None)
+            columns = [desc.name for desc in cur.description]
+            kinds = column_kinds(cur.description)
+            duplicate_columns = len(set(columns)) != len(columns)
+            if not duplicate_columns:
+                buffer = bytearray()
+                with cur.copy(copy_statement(query), params or None) as copy:
+                    for chunk in copy:
+                        buffer += chunk
+        if duplicate_columns:
+            # duplicate names cannot be typed by name; take the row path (after the connection is back in the pool).
+            data = self.query_data(query, params=params)
+            return pd.DataFrame(data[1:], columns=data[0])
+        df = read_frame(bytes(buffer), columns, kinds)
+        INSTRUMENTATION.record_io("postgres", time.perf_counter() - start, rows=len(df))
+        get_workload_log().record(query, params, time.perf_counter() - start, rows=len(df))
+        cache.set(cache_key, df.copy(), rows=len(df))
+        return df
 
 
     def close_connection(self):
         """
-        Close the database connection.
+        Kept for compatibility: connections are returned to the pool after every call, so there is nothing to close.
+        Use close_pool() to close the shared pool itself.
         """
-        if self.conn:
-            self.conn.close()
-            print("PostgreSQL database connection closed.")
+        pass
 
 
-    def run_query(self, query, params=None):
+    def run_query(self, query, params=None, max_rows: Optional[int] = None, fetch_size: Optional[int] = None):
         """
         Run a SQL query on the PostgreSQL database.
+        Read queries go through a server-side cursor and return at most `max_rows` rows, with the total 'row_count'
+        and a 'truncated' flag, so a `SELECT *` on a large table never materializes the whole table.
         :param query: The SQL query to execute.
         :param params: Optional parameters for the query.
+        :param max_rows: the row cap, defaults to Config.postgres_fetch_params["max_rows"] (None for no cap).
+        :param fetch_size: rows fetched per round trip, defaults to Config.postgres_fetch_params["fetch_size"].
         :return: A dictionary containing the status and result of the query.
         """
+        max_rows, fetch_size = _fetch_limits(max_rows, fetch_size)
+        start = time.perf_counter()
+        cache = get_result_cache()
         try:
-            with self.conn.cursor(row_factory=dict_row) as cur:
+            if is_read_query(query):
+                cache_key = cache.key(query, params, ("run_query", max_rows))
+                cached = cache.get(cache_key)
+                if cached is not None:
+                    return dict(cached, cache_hit=True)
+
+                with self.connection() as conn:
+                    _, rows, total, truncated = self._fetch_bounded(conn, query, params, max_rows, fetch_size)
+                INSTRUMENTATION.record_io("postgres", time.perf_counter() - start, rows=len(rows))
+                get_workload_log().record(query, params, time.perf_counter() - start, rows=len(rows))
+                result = {"status": "ok", "type": "select", "data": rows, "row_count": total, "truncated": truncated}
+                cache.set(cache_key, result, rows=len(rows))
+                return result
+
+            with self.connection() as conn, conn.cursor(row_factory=dict_row) as cur:
                     cur.execute(query, params or ())
                     
                     if cur.description:  # SELECT or RETURNING queries
                         rows = cur.fetchall()
+                        cache.note_write(query)
+                        INSTRUMENTATION.record_io("postgres", time.perf_counter() - start, rows=len(rows))
                         return {"status": "ok", "type": "select", "data": rows}
                     else:  # INSERT, UPDATE, DELETE
-                        self.conn.commit()
+                        conn.commit()
+                        cache.note_write(query)
+                        INSTRUMENTATION.record_io("postgres", time.perf_counter() - start, rows=cur.rowcount)
                         return {"status": "ok", "type": "write", "rowcount": cur.rowcount}
                         
         except Exception as e:
+            INSTRUMENTATION.record_io("postgres", time.perf_counter() - start, errors=1)
             return {"status": "error", "error": str(e)}
         
     
-    def list_table_schemas(self):
+    def run_guarded_query(self, query, params=None, max_rows: Optional[int] = None, fetch_size: Optional[int] = None):
         """
-        List all tables and their schemas in the database.
+        Run llm-generated SQL behind the query guard (see utils.query_guard): the query is planned first and
+        rejected, or rewritten with a LIMIT, when the planner estimates exceed Config.query_guard_params; it then runs
+        in a read-only transaction with its own statement_timeout and work_mem.
+        :param query: The SQL query to execute.
+        :param params: Optional parameters for the query.
+        :param max_rows: the row cap, defaults to Config.postgres_fetch_params["max_rows"].
+        :param fetch_size: rows fetched per round trip, defaults to Config.postgres_fetch_params["fetch_size"].
+        :return: the run_query result with the plan 'guard' estimates, or a structured 'query_guard' error.
         """
-        with self.conn.cursor(row_factory=dict_row) as cur:
-            cur.execute("""
-                SELECT table_name, column_name, data_type
-                FROM information_schema.columns
-                WHERE table_schema = 'public'
-                ORDER BY table_name, ordinal_position;
-                """)
+        guard = get_query_guard()
+        if not guard.params["enabled"]:
+            return self.run_query(query, params=params, max_rows=max_rows, fetch_size=fetch_size)
+        query = strip_statement(query)
+        if not is_read_query(query):
+            if guard.params["read_only"]:
+                return guard.write_rejection(query)
+            return self.run_query(query, params=params, max_rows=max_rows, fetch_size=fetch_size)
 
-            # Fetch all results
-            results = cur.fetchall()
+        max_rows, fetch_size = _fetch_limits(max_rows, fetch_size)
+        cache = get_result_cache()
+        cache_key = cache.key(query, params, ("guarded", max_rows))
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return dict(cached, cache_hit=True)
 
-            # Format the results
-            formatted_results = {}
-            for row in results:
-                table_name = row['table_name']
-                column_name = row['column_name']
-                data_type = row['data_type']
+        start = time.perf_counter()
+        try:
+            with self.connection() as conn, conn.transaction():
+                for statement, args in guard.transaction_setup():
+                    conn.execute(statement, args)
 
-                if table_name not in formatted_results:
-                    formatted_results[table_name] = []
+                estimates = plan_estimates(conn.execute(EXPLAIN_PREFIX + query, params or None).fetchone()[0])
+                action, payload = guard.decide(query, estimates)
+                if action == "rewrite":
+                    estimates = plan_estimates(conn.execute(EXPLAIN_PREFIX + payload, params or None).fetchone()[0])
+                    action, payload = guard.decide(payload, estimates, rewritten=True)
+                if action == "reject":
+                    INSTRUMENTATION.record_io("postgres", time.perf_counter() - start)
+                    return payload
 
-                formatted_results[table_name].append({
-                    'column_name': column_name,
-                    'data_type': data_type
-                })
+                _, rows, total, truncated = self._fetch_bounded(conn, payload, params, max_rows, fetch_size)
+            INSTRUMENTATION.record_io("postgres", time.perf_counter() - start, rows=len(rows))
+            get_workload_log().record(payload, params, time.perf_counter() - start, rows=len(rows))
+            result = guarded_response(query, payload, rows, total, truncated, estimates)
+            cache.set(cache_key, result, rows=len(rows))
+            return result
+
+        except Exception as e:
+            INSTRUMENTATION.record_io("postgres", time.perf_counter() - start, errors=1)
+            return {"status": "error", "error": str(e)}
+
+    def list_table_schemas(self):
+        """
+        List all tables and their schemas in the database, served from the cached schema catalog.
+        """
+        from utils.schema_catalog import get_schema_catalog
+        return [
+            {'table_name': table, 'column_name': column, 'data_type': data_type}
+            for table, meta in get_schema_catalog().get_tables().items()
+            for column, data_type in meta["columns"]
+        ]
 
-            return results
-    
 
     def validate_with_pglast(self, sql: str) -> bool:
         """
@@ -184,4 +550,224 @@ class PostgresConnector:
             parse_sql(sql)
             return {"valid": True, "error": None}
         except Error as e:
-            return {"valid": False, "error": str(e)}
\ No newline at end of file
+            return {"valid": False, "error": str(e)}
+
+
+_ASYNC_POOLS = weakref.WeakKeyDictionary()
+ASYNC_POOL_METRICS = PoolMetrics()
+
+
+async def _open_async_pool() -> AsyncConnectionPool:
+    params = Config.postgres_pool_params
+    pool = AsyncConnectionPool(
+        check=AsyncConnectionPool.check_connection if params["check_on_checkout"] else None,
+        configure=_aconfigure,
+        name="postgres_async",
+        open=False,
+        **_pool_kwargs()
+    )
+    await pool.open()
+    return pool
+
+
+async def get_async_pool() -> AsyncConnectionPool:
+    """
+    Return the async connection pool of the running event loop (async connections are bound to their loop).
+    """
+    loop = asyncio.get_running_loop()
+    opening = _ASYNC_POOLS.get(loop)
+    if opening is None:
+        # store the opening task itself, so concurrent callers wait for the same pool.
+        opening = loop.create_task(_open_async_pool())
+        _ASYNC_POOLS[loop] = opening
+    return await asyncio.shield(opening)
+
+
+def async_pool_stats() -> Dict[str, Any]:
+    """
+    Pool metrics of the async pool of the running event loop.
+    """
+    opening = _ASYNC_POOLS.get(asyncio.get_running_loop())
+    pool = opening.result() if opening is not None and opening.done() and not opening.exception() else None
+    return ASYNC_POOL_METRICS.stats(pool)
+
+
+class AsyncPostgresConnector:
+    def __init__(self, conn: psycopg.AsyncConnection, pool: Optional[AsyncConnectionPool] = None):
+        """
+        Async counterpart of PostgresConnector built on psycopg's AsyncConnection.
+        Use `await AsyncPostgresConnector.connect()` to check a connection out of the loop's pool and
+        `await close_connection()` to return it.
+        """
+        self.conn = conn
+        self.pool = pool
+
+    @classmethod
+    async def connect(cls, statement_timeout_ms: Optional[int] = None) -> "AsyncPostgresConnector":
+        """
+        Check a connection out of the async pool of the running event loop.
+        :param statement_timeout_ms: the statement_timeout for this checkout, defaults to the pool's configured value.
+        """
+        try:
+            pool = await get_async_pool()
+            start = time.perf_counter()
+            conn = await pool.getconn()
+            ASYNC_POOL_METRICS.record_checkout(time.perf_counter() - start)
+
+            timeout_ms = statement_timeout_ms or Config.postgres_pool_params["statement_timeout_ms"]
+            try:
+                if _statement_timeouts.get(conn) != timeout_ms:
+                    await conn.execute("SELECT set_config('statement_timeout', %s, false)", (str(timeout_ms),))
+                    _statement_timeouts[conn] = timeout_ms
+                    ASYNC_POOL_METRICS.statement_timeout_sets += 1
+            except BaseException:
+                # hand the connection back, or every failed configure leaks a pool slot.
+                await pool.putconn(conn)
+                raise
+            return cls(conn, pool)
+        except PoolTimeout:
+            ASYNC_POOL_METRICS.record_timeout()
+            raise
+        except psycopg.Error as e:
+            print(f"Error connecting to PostgreSQL database: {e}")
+            raise
+
+    async def _fetch_bounded(self, query, params, max_rows: Optional[int], fetch_size: int):
+        """
+        Async counterpart of PostgresConnector._fetch_bounded.
+        """
+        async with self.conn.transaction():
+            name = _cursor_name()
+            async with self.conn.cursor(name=name, row_factory=dict_row) as cur:
+                await cur.execute(query, params or None)
+                rows = []
+                while max_rows is None or len(rows) < max_rows:
+                    size = fetch_size if max_rows is None else min(fetch_size, max_rows - len(rows))
+                    chunk = await cur.fetchmany(size)
+                    if not chunk:
+                        return rows, len(rows), False
+                    rows.extend(chunk)
+
+                if Config.postgres_fetch_params["count_total"]:
+                    moved = await self.conn.execute(sql.SQL("MOVE FORWARD ALL FROM {}").format(sql.Identifier(name)))
+                    return rows, len(rows) + moved.rowcount, moved.rowcount > 0
+                more = await cur.fetchmany(1)
+                return rows, (len(rows) if not more else None), bool(more)
+
+    async def iter_query(self, query, params=None, fetch_size: Optional[int] = None):
+        """
+        Async counterpart of PostgresConnector.iter_query, yielding row chunks from a server-side cursor.
+        """
+        _, fetch_size = _fetch_limits(None, fetch_size)
+        async with self.conn.transaction():
+            async with self.conn.cursor(name=_cursor_name(), row_factory=dict_row) as cur:
+                await cur.execute(query, params or None)
+                while True:
+                    rows = await cur.fetchmany(fetch_size)
+                    if not rows:
+                        break
+                    yield rows
+
+    async def run_query(self, query, params=None, max_rows: Optional[int] = None, fetch_size: Optional[int] = None):
+        """
+        Run a SQL query on the PostgreSQL database without blocking the event loop.
+        Read queries are bounded like PostgresConnector.run_query.
+        :param query: The SQL query to execute.
+        :param params: Optional parameters for the query.
+        :param max_rows: the row cap, defaults to Config.postgres_fetch_params["max_rows"] (None for no cap).
+        :param fetch_size: rows fetched per round trip, defaults to Config.postgres_fetch_params["fetch_size"].
+        :return: A dictionary containing the status and result of the query.
+        """
+        max_rows, fetch_size = _fetch_limits(max_rows, fetch_size)
+        start = time.perf_counter()
+        cache = get_result_cache()
+        try:
+            if is_read_query(query):
+                cache_key = cache.key(query, params, ("run_query", max_rows))
+                # the counter poll is a blocking round trip, at most once per poll interval.
+                cached = await asyncio.to_thread(cache.get, cache_key)
+                if cached is not None:
+                    return dict(cached, cache_hit=True)
+
+                rows, total, truncated = await self._fetch_bounded(query, params, max_rows, fetch_size)
+                INSTRUMENTATION.record_io("postgres", time.perf_counter() - start, rows=len(rows))
+                get_workload_log().record(query, params, time.perf_counter() - start, rows=len(rows))
+                result = {"status": "ok", "type": "select", "data": rows, "row_count": total, "truncated": truncated}
+                cache.set(cache_key, result, rows=len(rows))
+                return result
+
+            async with self.conn.cursor(row_factory=dict_row) as cur:
+                await cur.execute(query, params or ())
+                cache.note_write(query)
+
+                if cur.description:  # SELECT or RETURNING queries
+                    rows = await cur.fetchall()
+                    INSTRUMENTATION.record_io("postgres", time.perf_counter() - start, rows=len(rows))
+                    return {"status": "ok", "type": "select", "data": rows}
+                else:  # INSERT, UPDATE, DELETE
+                    INSTRUMENTATION.record_io("postgres", time.perf_counter() - start, rows=cur.rowcount)
+                    return {"status": "ok", "type": "write", "rowcount": cur.rowcount}
+
+        except Exception as e:
+            INSTRUMENTATION.record_io("postgres", time.perf_counter() - start, errors=1)
+            return {"status": "error", "error": str(e)}
+
+    async def run_guarded_query(self, query, params=None, max_rows: Optional[int] = None,
+                                fetch_size: Optional[int] = None):
+        """
+        Async counterpart of PostgresConnector.run_guarded_query.
+        """
+        guard = get_query_guard()
+        if not guard.params["enabled"]:
+            return await self.run_query(query, params=params, max_rows=max_rows, fetch_size=fetch_size)
+        query = strip_statement(query)
+        if not is_read_query(query):
+            if guard.params["read_only"]:
+                return guard.write_rejection(query)
+            return await self.run_query(query, params=params, max_rows=max_rows, fetch_size=fetch_size)
+
+        max_rows, fetch_size = _fetch_limits(max_rows, fetch_size)
+        cache = get_result_cache()
+        cache_key = cache.key(query, params, ("guarded", max_rows))
+        cached = await asyncio.to_thread(cache.get, cache_key)
+        if cached is not None:
+            return dict(cached, cache_hit=True)
+
+        start = time.perf_counter()
+        try:
+            async with self.conn.transaction():
+                for statement, args in guard.transaction_setup():
+                    await self.conn.execute(statement, args)
+
+                explained = await self.conn.execute(EXPLAIN_PREFIX + query, params or None)
+                estimates = plan_estimates((await explained.fetchone())[0])
+                action, payload = guard.decide(query, estimates)
+                if action == "rewrite":
+                    explained = await self.conn.execute(EXPLAIN_PREFIX + payload, params or None)
+                    estimates = plan_estimates((await explained.fetchone())[0])
+                    action, payload = guard.decide(payload, estimates, rewritten=True)
+                if action == "reject":
+                    INSTRUMENTATION.record_io("postgres", time.perf_counter() - start)
+                    return payload
+
+                rows, total, truncated = await self._fetch_bounded(payload, params, max_rows, fetch_size)
+            INSTRUMENTATION.record_io("postgres", time.perf_counter() - start, rows=len(rows))
+            get_workload_log().record(payload, params, time.perf_counter() - start, rows=len(rows))
+            result = guarded_response(query, payload, rows, total, truncated, estimates)
+            cache.set(cache_key, result, rows=len(rows))
+            return result
+
+        except Exception as e:
+            INSTRUMENTATION.record_io("postgres", time.perf_counter() - start, errors=1)
+            return {"status": "error", "error": str(e)}
+
+    async def close_connection(self):
+        """
+        Return the connection to the pool (or close it when it did not come from one).
+        """
+        if self.conn:
+            if self.pool is not None:
+                await self.pool.putconn(self.conn)
+            else:
+                await self.conn.close()
+            self.conn = None
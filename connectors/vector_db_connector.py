@@ -1,57 +1,148 @@
-from langchain_ibm.embeddings import WatsonxEmbeddings
 import os
-from pymilvus import connections
+import asyncio
+import threading
+import weakref
+import time
+from typing import Any, Dict
+from pymilvus import connections, utility
 from pymilvus import Collection
+from pymilvus import AsyncMilvusClient
+from pymilvus import MilvusException
+from pymilvus.client.types import LoadState
+from config import Config
+from utils.instrumentation import INSTRUMENTATION
+from utils.embedding_cache import EMBEDDING_MODEL_ID, get_embedding_model as get_cached_embedding_model
 
 
-class MilvusConnector:
+def get_embedding_model(model_id: str = EMBEDDING_MODEL_ID):
+    """
+    Return the embedding model (see utils.embedding_cache.get_embedding_model), behind the shared embedding cache.
+    """
+    return get_cached_embedding_model(model_id)
+
+
+class MilvusMetrics:
     def __init__(self):
+        """
+        Connect, load, embedding and search timings of the Milvus connectors.
+        """
+        self._lock = threading.Lock()
+        self.counts = {kind: 0 for kind in ("connect", "load", "embed", "search")}
+        self.seconds_total = {kind: 0.0 for kind in self.counts}
+        self.seconds_max = {kind: 0.0 for kind in self.counts}
+        self.reconnects = 0
+        self.failures = 0
+
+    def record(self, kind: str, seconds: float):
+        with self._lock:
+            self.counts[kind] += 1
+            self.seconds_total[kind] += seconds
+            self.seconds_max[kind] = max(self.seconds_max[kind], seconds)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = {"reconnects": self.reconnects, "failures": self.failures}
+            for kind, count in self.counts.items():
+                stats[f"{kind}s"] = count
+                stats[f"{kind}_seconds_avg"] = round(self.seconds_total[kind] / count, 6) if count else 0.0
+                stats[f"{kind}_seconds_max"] = round(self.seconds_max[kind], 6)
+            return stats
+
+
+MILVUS_METRICS = MilvusMetrics()
+
+
+class MilvusConnector:
+    def __init__(self, params: Dict[str, Any] = None):
         """
         Initialize the Milvus Connector class.
-        Establishes a connection to the PostgreSQL database.
+        Connects to Milvus once; collections are loaded on first use and their handles kept, and a failed search
+        reconnects and retries once. Use get_milvus_connector() to share one connector per process.
+        :param params: the connection config, defaults to Config.milvus_connection_params.
         """
+        self.params = params or Config.milvus_connection_params
+        self.alias = self.params["alias"]
         self.milvus_uri = f"grpc://{os.environ['grpcHost']}:{os.environ['grpcPort']}"
         self.milvus_user = os.environ['milvusUser']
         self.milvus_password = os.environ['milvusPass']
         self.milvus_index_params={"index_type": "FLAT", "metric_type": "L2"}
-        self.em_model = "ibm/slate-125m-english-rtrvr"
+        self.em_model = EMBEDDING_MODEL_ID
 
         self.milvus = None
+        self.embedding_model = None
+        self._collections: Dict[str, Collection] = {}
+        self._lock = threading.RLock()
 
         try:
-            conn = connections.connect(
-                alias="default",
-                uri=f"grpc://{os.environ['grpcHost']}:{os.environ['grpcPort']}",
-                user=os.environ['milvusUser'],
-                password=os.environ['milvusPass'],
-                secure=True
-            )
-            print("Connected to Milvus successfully.")
-            return conn
-        
+            self.connect()
         except Exception as e:
             import traceback
             print("Milvus connection failed.")
             print(traceback.format_exc())
 
+    def connect(self):
+        """
+        Open the gRPC connection (with keepalive pings, so idle connections are not dropped by proxies).
+        """
+        with self._lock:
+            start = time.perf_counter()
+            connections.connect(
+                alias=self.alias,
+                uri=self.milvus_uri,
+                user=self.milvus_user,
+                password=self.milvus_password,
+                secure=self.params["secure"],
+                keep_alive=self.params["keep_alive"],
+                timeout=self.params["connect_timeout_seconds"],
+            )
+            MILVUS_METRICS.record("connect", time.perf_counter() - start)
+            print("Connected to Milvus successfully.")
+
+    def reconnect(self):
+        """
+        Drop the connection and the collection handles, and connect again.
+        """
+        with self._lock:
+            MILVUS_METRICS.reconnects += 1
+            try:
+                connections.disconnect(self.alias)
+            except Exception:
+                pass
+            self._collections.clear()
+            self.connect()
 
     def get_embedding_model(self):
-        return WatsonxEmbeddings(
-            model_id=self.em_model,
-            url=os.environ['WATSONX_URL'],
-            project_id=os.environ["WATSONX_PROJECT_ID"],
-            apikey=os.environ['WATSONX_APIKEY']
-        )
-    
+        if self.embedding_model is None:
+            self.embedding_model = get_embedding_model(self.em_model)
+        return self.embedding_model
+
+    def collection(self, collection_name: str) -> Collection:
+        """
+        The handle of a collection, loaded into memory on first use (unless the server already has it loaded).
+        """
+        with self._lock:
+            collection = self._collections.get(collection_name)
+            if collection is not None:
+                return collection
+            if not connections.has_connection(self.alias):
+                self.connect()
+
+            start = time.perf_counter()
+            collection = Collection(name=collection_name, using=self.alias)
+            if utility.load_state(collection_name, using=self.alias) != LoadState.Loaded:
+                collection.load()
+            MILVUS_METRICS.record("load", time.perf_counter() - start)
+            self._collections[collection_name] = collection
+            return collection
+
+    def loaded_collections(self):
+        return sorted(self._collections)
 
     def search_milvus(self, query_text: str, top_k: int = 3, collection_name: str="IT_Productivity_Agent"):
         # Embed the query text
-        embedding_model = self.get_embedding_model()
-        query_vector = embedding_model.embed_query(query_text)
-
-        # Load the collection
-        collection = Collection(name=collection_name)
-        collection.load()
+        start = time.perf_counter()
+        query_vector = self.get_embedding_model().embed_query(query_text)
+        MILVUS_METRICS.record("embed", time.perf_counter() - start)
 
         # Perform search
         search_params = {
@@ -59,13 +150,121 @@ class MilvusConnector:
             "params": {"nprobe": 10}  # tune for accuracy/speed
         }
 
-        results = collection.search(
-            data=[query_vector],              # query vectors
-            anns_field="vector",           # name of the vector field
-            param=search_params,
+        for attempt in range(2):
+            try:
+                collection = self.collection(collection_name)
+                start = time.perf_counter()
+                results = collection.search(
+                    data=[query_vector],              # query vectors
+                    anns_field="vector",           # name of the vector field
+                    param=search_params,
+                    limit=top_k,
+                    output_fields=["text"],           # optional: fields to return
+                    timeout=self.params["search_timeout_seconds"],
+                )
+                break
+            except MilvusException as e:
+                # a dropped connection or a released collection: reconnect and reload once.
+                MILVUS_METRICS.failures += 1
+                if attempt:
+                    raise
+                print(f"Milvus search failed, reconnecting: {e}")
+                self.reconnect()
+
+        MILVUS_METRICS.record("search", time.perf_counter() - start)
+        INSTRUMENTATION.record_io("milvus", time.perf_counter() - start, hits=sum(len(hits) for hits in results))
+
+        return results
+
+
+_MILVUS_CONNECTOR = None
+_MILVUS_CONNECTOR_LOCK = threading.Lock()
+
+
+def get_milvus_connector() -> MilvusConnector:
+    """
+    Return the process-wide Milvus connector, connecting on first use.
+    """
+    global _MILVUS_CONNECTOR
+    with _MILVUS_CONNECTOR_LOCK:
+        if _MILVUS_CONNECTOR is None:
+            _MILVUS_CONNECTOR = MilvusConnector()
+        return _MILVUS_CONNECTOR
+
+
+def milvus_stats() -> Dict[str, Any]:
+    """
+    The Milvus timings, with the collections the process-wide connector has loaded.
+    """
+    stats = MILVUS_METRICS.stats()
+    stats["loaded_collections"] = _MILVUS_CONNECTOR.loaded_collections() if _MILVUS_CONNECTOR is not None else []
+    return stats
+
+
+class AsyncMilvusConnector:
+    _connectors = weakref.WeakKeyDictionary()
+
+    def __init__(self):
+        """
+        Async counterpart of MilvusConnector built on pymilvus' AsyncMilvusClient.
+        The gRPC channel is bound to the event loop it was created on, so use AsyncMilvusConnector.for_running_loop()
+        to share one connector per loop.
+        """
+        self.milvus_uri = f"grpc://{os.environ['grpcHost']}:{os.environ['grpcPort']}"
+        self.em_model = EMBEDDING_MODEL_ID
+        self.client = AsyncMilvusClient(
+            uri=self.milvus_uri,
+            user=os.environ['milvusUser'],
+            password=os.environ['milvusPass'],
+            secure=True
+        )
+        self.embedding_model = get_embedding_model(self.em_model)
+        self._loaded_collections = set()
+
+    @classmethod
+    def for_running_loop(cls) -> "AsyncMilvusConnector":
+        """
+        Return the connector for the current event loop, creating it on first use.
+        """
+        loop = asyncio.get_running_loop()
+        connector = cls._connectors.get(loop)
+        if connector is None:
+            connector = cls()
+            cls._connectors[loop] = connector
+        return connector
+
+    async def search_milvus(self, query_text: str, top_k: int = 3, collection_name: str="IT_Productivity_Agent"):
+        # Embed the query text
+        start = time.perf_counter()
+        query_vector = await self.embedding_model.aembed_query(query_text)
+        MILVUS_METRICS.record("embed", time.perf_counter() - start)
+
+        # Load the collection once per connector
+        if collection_name not in self._loaded_collections:
+            start = time.perf_counter()
+            await self.client.load_collection(collection_name)
+            self._loaded_collections.add(collection_name)
+            MILVUS_METRICS.record("load", time.perf_counter() - start)
+
+        # Perform search
+        search_params = {
+            "metric_type": "L2",
+            "params": {"nprobe": 10}
+        }
+
+        start = time.perf_counter()
+        results = await self.client.search(
+            collection_name=collection_name,
+            data=[query_vector],
+            anns_field="vector",
+            search_params=search_params,
             limit=top_k,
-            output_fields=["text"]            # optional: fields to return
+            output_fields=["text"]
         )
+        MILVUS_METRICS.record("search", time.perf_counter() - start)
+        INSTRUMENTATION.record_io("milvus", time.perf_counter() - start, hits=sum(len(hits) for hits in results))
 
         return results
 
+    async def close(self):
+        await self.client.close()
@@ -6,10 +6,20 @@ from agents.supervisor import  SupervisorAgent
 from agents.vector_db_agent import VectorDbAgent
 from agents.r_general_agent import GeneralAgent
 from agents.report_generator_agent import ReportGeneratorAgent
+from utils.answer_cache import get_answer_cache
+from utils.instrumentation import INSTRUMENTATION
+from config import Config
 
 
 # ----- Build LangGraph -----
-def build_supervisor_graph():
+def build_supervisor_graph(answer_cache: bool = Config.answer_cache_params["enabled"], async_mode: bool = False):
+    """
+    Build the supervisor graph.
+    :param answer_cache: put the answer cache ahead of the supervisor.
+    :param async_mode: register the async node methods (ainvoke, AsyncConnection, AsyncMilvusClient), so the compiled
+        graph can serve many concurrent requests on one event loop through `ainvoke`/`astream`.
+    :return: the compiled graph.
+    """
     graph = StateGraph(AgentState)
 
     supervisor = SupervisorAgent()
@@ -17,23 +27,55 @@ def build_supervisor_graph():
     vector_db_agent = VectorDbAgent()
     report_generator_agent = ReportGeneratorAgent()
 
+    def node(agent, method_name: str):
+        # pick the async counterpart ("a" + method name) of a node method in async mode.
+        return getattr(agent, f"a{method_name}" if async_mode else method_name)
+
+    def add_node(name: str, fn):
+        # every node is instrumented for wall time, llm tokens and postgres/milvus i/o.
+        graph.add_node(name, INSTRUMENTATION.wrap_node(name, fn))
+
+    def branch_node(agent, method_name: str, keys):
+        # parallel branches may not write the same state keys, so a branch runs the node method on its own copy of the
+        # state and only returns the keys it owns.
+        fn = node(agent, method_name)
+
+        def branch_state(state):
+            return dict(state, memory_chain=list(state['memory_chain']))
+
+        if async_mode:
+            async def run_branch(state: AgentState):
+                result = await fn(branch_state(state)) or state
+                return {key: result[key] for key in keys}
+        else:
+            def run_branch(state: AgentState):
+                result = fn(branch_state(state)) or state
+                return {key: result[key] for key in keys}
+        return run_branch
+
     # Add agent and tools to the graph as nodes.
     # Add the supervisor agent to the graph
-    graph.add_node(supervisor.name, supervisor.handle_input)
+    add_node(supervisor.name, node(supervisor, "handle_input"))
 
     # postgres agent tools
-    graph.add_node("pg_generate_sql_query", post_gres_agent.generate_sql_query)
-    graph.add_node("rg_generate_sql_query", post_gres_agent.generate_sql_query)
-    graph.add_node("run_sql_query", post_gres_agent.run_sql_query)
+    add_node("pg_generate_sql_query", node(post_gres_agent, "generate_sql_query"))
+    add_node("rg_generate_sql_query", node(post_gres_agent, "generate_sql_query"))
+    add_node("run_sql_query", node(post_gres_agent, "run_sql_query"))
 
     # vector db agent tools
-    graph.add_node("vector_search", vector_db_agent.vector_search)
+    add_node("vector_search", node(vector_db_agent, "vector_search"))
 
     # report generator agent tools
-    graph.add_node("generate_report", report_generator_agent.generate_report)
+    add_node("generate_report", node(report_generator_agent, "generate_report"))
+
+    # hybrid questions: the postgres and vector db branches run concurrently and are joined before the response.
+    add_node("hybrid_pg_generate_sql_query", branch_node(post_gres_agent, "generate_sql_query", ["postgres_query", "agent_tool_retries"]))
+    add_node("hybrid_run_sql_query", branch_node(post_gres_agent, "run_sql_query", ["postgres_agent_response", "agent_tool_retries"]))
+    add_node("hybrid_vector_search", branch_node(vector_db_agent, "vector_search", ["vector_db_agent_response"]))
+    add_node("join_hybrid", supervisor.join_branches)
 
     # handle response node
-    graph.add_node("handle_response", supervisor.handle_output)
+    add_node("handle_response", node(supervisor, "handle_output"))
 
     # add edges and conditional edges (requires a router function that does not return the state)
     graph.add_conditional_edges(
@@ -43,6 +85,8 @@ def build_supervisor_graph():
             post_gres_agent.name: "pg_generate_sql_query", 
             vector_db_agent.name: "vector_search",
             report_generator_agent.name: "rg_generate_sql_query",
+            "hybrid_postgres": "hybrid_pg_generate_sql_query",
+            "hybrid_vector_db": "hybrid_vector_search",
             "handle_response": "handle_response"
         }
     )
@@ -55,9 +99,33 @@ def build_supervisor_graph():
     graph.add_edge("vector_search", "handle_response")
     graph.add_edge("generate_report", "handle_response")
 
-    # set entry and finish points
-    graph.set_entry_point(supervisor.name)
-    graph.set_finish_point("handle_response")
+    # the join waits for both branches, so the hybrid latency is that of the slower branch.
+    graph.add_edge("hybrid_pg_generate_sql_query", "hybrid_run_sql_query")
+    graph.add_edge(["hybrid_run_sql_query", "hybrid_vector_search"], "join_hybrid")
+    graph.add_edge("join_hybrid", "handle_response")
+
+    if answer_cache:
+        # the answer cache sits ahead of the supervisor and stores the final response once it is produced.
+        cache = get_answer_cache()
+        add_node("answer_cache", node(cache, "lookup"))
+        add_node("store_answer", node(cache, "save"))
+        graph.add_conditional_edges(
+            "answer_cache",
+            cache.router,
+            {
+                "cache_hit": END,
+                "cache_miss": supervisor.name
+            }
+        )
+        graph.add_edge("handle_response", "store_answer")
+
+        # set entry and finish points
+        graph.set_entry_point("answer_cache")
+        graph.set_finish_point("store_answer")
+    else:
+        # set entry and finish points
+        graph.set_entry_point(supervisor.name)
+        graph.set_finish_point("handle_response")
 
     return graph.compile()
 
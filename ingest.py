@@ -2,7 +2,8 @@ import argparse
 from langchain_community.document_loaders import ConfluenceLoader, TextLoader
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from uuid import uuid4
-from connectors.vector_db_connector import MilvusConnector
+from milvus_utils import get_vector_store
+from utils.answer_cache import DataVersions
 import os
 
 
@@ -41,13 +42,15 @@ elif args.source == 'confluence':
     )
     documents = loader.load()
 
-connector = MilvusConnector()
-
 text_splitter = RecursiveCharacterTextSplitter(chunk_size=512, chunk_overlap=100)
 texts = text_splitter.split_documents(documents)
 uuids = [str(uuid4()) for _ in texts]
 
 
-vector_store = connector.get_vector_store(drop_old=True)
+# chunks embedded before (unchanged pages) come from the embedding cache.
+vector_store = get_vector_store(drop_old=True)
 vector_store.add_documents(documents=texts, ids=uuids)
-print("✅ Documents successfully added")
\ No newline at end of file
+print("✅ Documents successfully added")
+
+# cached answers built from the previous collection contents are no longer valid.
+DataVersions.bump_milvus_ingestion_version()
\ No newline at end of file
@@ -0,0 +1,253 @@
+"""
+Bulk load Jira exports (CSV, JSON or JSONL) into jira_data.
+Rows are streamed through COPY ... FROM STDIN into a temporary staging table and merged into jira_data by "Key",
+using "Updated" as a watermark: tickets are only inserted when new and only updated when the export has a newer
+"Updated" than the table, so re-running a load over an overlapping export only moves changed tickets. The report
+rollups (utils/jira_rollups.py) are refreshed afterwards with the merged keys.
+
+    python load_jira.py exports/jira_2024.csv
+    python load_jira.py exports/search_results.json --full      # update every matching ticket
+"""
+
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+from dotenv import load_dotenv
+_ = load_dotenv(override=True)
+
+from config import Config
+
+
+STAGING_TABLE = "jira_staging"
+
+
+def _flatten(value: Any) -> Any:
+    # jira REST fields are objects ({"name": ...}, {"displayName": ...}, {"value": ...}) or lists of them.
+    if isinstance(value, dict):
+        for key in ("name", "displayName", "value", "key"):
+            if value.get(key) is not None:
+                return value[key]
+        return json.dumps(value)
+    if isinstance(value, list):
+        return ", ".join(str(_flatten(v)) for v in value)
+    return value
+
+
+def read_export(path: str, export_format: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Stream the records of a Jira export.
+    :param path: a CSV export, a JSON file (a list of issues or a REST search response with "issues") or JSONL.
+    :param export_format: "csv", "json" or "jsonl", defaults to the file extension.
+    """
+    export_format = export_format or os.path.splitext(path)[1].lstrip(".").lower()
+    if export_format == "csv":
+        with open(path, "r", encoding="utf-8-sig", newline="") as f:
+            yield from csv.DictReader(f)
+        return
+
+    with open(path, "r", encoding="utf-8") as f:
+        if export_format == "jsonl":
+            records = (json.loads(line) for line in f if line.strip())
+        else:
+            data = json.load(f)
+            records = data.get("issues", []) if isinstance(data, dict) else data
+        for record in records:
+            # REST issues keep everything but the key under "fields".
+            if isinstance(record.get("fields"), dict):
+                record = dict(record["fields"], key=record.get("key"))
+            yield {name: _flatten(value) for name, value in record.items()}
+
+
+def parse_timestamp(value: Any, formats: List[str]) -> Optional[str]:
+    """
+    Parse an exported date into an ISO timestamp (wall-clock time, as exported), leaving unknown formats to postgres.
+    """
+    if value in (None, ""):
+        return None
+    text = str(value).strip()
+    try:
+        return datetime.fromisoformat(text.replace("Z", "+00:00")).replace(tzinfo=None).isoformat(sep=" ")
+    except ValueError:
+        pass
+    for fmt in formats:
+        try:
+            return datetime.strptime(text, fmt).replace(tzinfo=None).isoformat(sep=" ")
+        except ValueError:
+            continue
+    return text
+
+
+class JiraLoader:
+    def __init__(self, params: Dict[str, Any] = None):
+        """
+        COPY-based loader merging Jira exports into jira_data.
+        :param params: the loader config, defaults to Config.jira_loader_params.
+        """
+        self.params = params or Config.jira_loader_params
+        self.table = self.params["table"]
+        self.key_column = self.params["key_column"]
+        self.watermark_column = self.params["watermark_column"]
+        self.aliases = {name.lower(): column for name, column in self.params["column_aliases"].items()}
+
+    def table_columns(self) -> List[str]:
+        """
+        The columns of the target table, from the schema catalog, or the configured ones when it is unavailable.
+        """
+        from utils.schema_catalog import get_schema_catalog
+        meta = get_schema_catalog().get_tables().get(self.table)
+        if meta:
+            return [name for name, _ in meta["columns"]]
+        return list(dict.fromkeys(self.aliases.values()))
+
+    def map_records(self, records: Iterable[Dict[str, Any]], columns: List[str]) -> Iterator[List[Any]]:
+        """
+        Turn export records into rows of the given columns; records without a key are skipped.
+        """
+        by_name = {column.lower(): column for column in columns}
+        timestamps = set(self.params["timestamp_columns"])
+        formats = self.params["datetime_formats"]
+        for record in records:
+            row = {}
+            for name, value in record.items():
+                column = self.aliases.get(str(name).strip().lower()) or by_name.get(str(name).strip().lower())
+                if column in by_name.values() and column not in row:
+                    row[column] = None if value == "" else value
+            if not row.get(self.key_column):
+                continue
+            for column in timestamps & row.keys():
+                row[column] = parse_timestamp(row[column], formats)
+            yield [row.get(column) for column in columns]
+
+    def merge_sql(self, columns: List[str], full: bool = False):
+        """
+        The statements merging the staging table into the target: latest record per key, update when newer
+        (or always with full), insert when missing. The update and insert return the merged keys.
+        """
+        from psycopg import sql
+
+        key, watermark = sql.Identifier(self.key_column), sql.Identifier(self.watermark_column)
+        target, staging = sql.Identifier(self.table), sql.Identifier(STAGING_TABLE)
+        column_list = sql.SQL(", ").join(map(sql.Identifier, columns))
+
+        dedupe = sql.SQL(
+            "DELETE FROM {staging} s USING {staging} newer "
+            "WHERE s.{key} = newer.{key} AND s.ctid <> newer.ctid AND "
+            "(coalesce(s.{watermark}, '-infinity'), s.ctid) < (coalesce(newer.{watermark}, '-infinity'), newer.ctid)"
+        ).format(staging=staging, key=key, watermark=watermark)
+
+        condition = sql.SQL("") if full else sql.SQL(
+            " AND (t.{watermark} IS NULL OR s.{watermark} > t.{watermark})"
+        ).format(watermark=watermark)
+        update = sql.SQL(
+            "UPDATE {target} t SET {assignments} FROM {staging} s WHERE t.{key} = s.{key}{condition} RETURNING t.{key}"
+        ).format(
+            target=target, staging=staging, key=key, condition=condition,
+            assignments=sql.SQL(", ").join(
+                sql.SQL("{} = s.{}").format(sql.Identifier(c), sql.Identifier(c)) for c in columns if c != self.key_column
+            ),
+        )
+        insert = sql.SQL(
+            "INSERT INTO {target} ({columns}) SELECT {columns} FROM {staging} s "
+            "WHERE NOT EXISTS (SELECT 1 FROM {target} t WHERE t.{key} = s.{key}) RETURNING {key}"
+        ).format(target=target, staging=staging, key=key, columns=column_list)
+        return dedupe, update, insert
+
+    def load(self, records: Iterable[Dict[str, Any]], full: bool = False) -> Dict[str, Any]:
+        """
+        Stream records into the staging table with COPY and merge them into the target table in one transaction.
+        :param records: export records, e.g. from read_export.
+        :param full: update every ticket present in the export, ignoring the watermark.
+        :return: staged/inserted/updated/unchanged counts, the merged keys, seconds and rows per second.
+        """
+        from psycopg import sql
+        from connectors.db_connector import pooled_connection
+        from utils.result_cache import get_result_cache
+
+        columns = self.table_columns()
+        if self.key_column not in columns or self.watermark_column not in columns:
+            raise ValueError(f"{self.table} needs the {self.key_column!r} and {self.watermark_column!r} columns.")
+
+        start = time.perf_counter()
+        staged = 0
+        with pooled_connection() as conn, conn.transaction():
+            # a bulk load can legitimately outlast the interactive statement_timeout.
+            conn.execute("SELECT set_config('statement_timeout', '0', true)")
+            # one loader at a time, so concurrent loads cannot both insert the same new key.
+            conn.execute(sql.SQL("LOCK TABLE {} IN SHARE ROW EXCLUSIVE MODE").format(sql.Identifier(self.table)))
+            conn.execute(sql.SQL("CREATE TEMP TABLE {} (LIKE {}) ON COMMIT DROP").format(
+                sql.Identifier(STAGING_TABLE), sql.Identifier(self.table)
+            ))
+
+            copy_sql = sql.SQL("COPY {} ({}) FROM STDIN").format(
+                sql.Identifier(STAGING_TABLE), sql.SQL(", ").join(map(sql.Identifier, columns))
+            )
+            with conn.cursor() as cur, cur.copy(copy_sql) as copy:
+                for row in self.map_records(records, columns):
+                    copy.write_row(row)
+                    staged += 1
+                    if staged % self.params["progress_every"] == 0:
+                        print(f"  {staged} rows staged ({staged / (time.perf_counter() - start):.0f} rows/s)")
+            copy_seconds = time.perf_counter() - start
+
+            dedupe, update, insert = self.merge_sql(columns, full=full)
+            duplicates = conn.execute(dedupe).rowcount
+            updated_keys = [row[0] for row in conn.execute(update).fetchall()]
+            inserted_keys = [row[0] for row in conn.execute(insert).fetchall()]
+            updated, inserted = len(updated_keys), len(inserted_keys)
+
+        seconds = time.perf_counter() - start
+        if inserted or updated:
+            get_result_cache().invalidate_tables([self.table])
+        return {
+            "staged": staged,
+            "duplicates": duplicates,
+            "inserted": inserted,
+            "updated": updated,
+            "unchanged": staged - duplicates - inserted - updated,
+            "keys": updated_keys + inserted_keys,
+            "copy_seconds": round(copy_seconds, 3),
+            "seconds": round(seconds, 3),
+            "rows_per_second": round(staged / seconds, 1) if seconds else 0.0,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk load Jira exports into jira_data with COPY and upserts.")
+    parser.add_argument("paths", nargs="+", help="CSV, JSON or JSONL Jira exports.")
+    parser.add_argument("--format", choices=["csv", "json", "jsonl"], default=None, help="Defaults to the file extension.")
+    parser.add_argument("--table", default=None, help="Target table, defaults to Config.jira_loader_params['table'].")
+    parser.add_argument("--full", action="store_true", help="Update every ticket in the export, ignoring the Updated watermark.")
+    args = parser.parse_args()
+
+    params = dict(Config.jira_loader_params, table=args.table or Config.jira_loader_params["table"])
+    loader = JiraLoader(params)
+    merged_keys = []
+    for path in args.paths:
+        if not os.path.exists(path):
+            sys.exit(f"No such export: {path}")
+        print(f"Loading {path} into {params['table']}...")
+        result = loader.load(read_export(path, args.format), full=args.full)
+        print(f"{result['staged']} rows staged in {result['copy_seconds']}s, {result['inserted']} inserted, "
+              f"{result['updated']} updated, {result['unchanged']} unchanged, {result['duplicates']} duplicates "
+              f"in {result['seconds']}s ({result['rows_per_second']} rows/s)")
+        merged_keys.extend(result["keys"])
+
+    if Config.jira_rollup_params["enabled"] and params["table"] == Config.jira_rollup_params["source_table"]:
+        from utils.jira_rollups import get_jira_rollups
+        rollups = get_jira_rollups()
+        # index setup on the source table happens here, not on the report path.
+        rollups.prepare_source()
+        # the merged tickets can have an "Updated" older than the rollup watermark, so they are folded in by key.
+        result = rollups.refresh(detect_deletes=True, keys=list(dict.fromkeys(merged_keys)))
+        print(f"Rollups refreshed: {result['changed']} tickets changed, {result['removed']} removed in {result['seconds']}s")
+        if not result["unique_key"]:
+            print(f"\"Key\" is not unique in {params['table']}, so reports keep reading it instead of the rollups.")
+
+
+if __name__ == "__main__":
+    main()
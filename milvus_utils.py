@@ -1,17 +1,13 @@
 from langchain_milvus import Milvus
-from langchain_ibm.embeddings import WatsonxEmbeddings
 from dotenv import load_dotenv
+from utils.embedding_cache import get_embedding_model as get_cached_embedding_model
 import os
 
 load_dotenv()
 
 def get_embedding_model():
-    return WatsonxEmbeddings(
-        model_id="ibm/slate-125m-english-rtrvr",
-        url=os.environ['WATSONX_URL'],
-        project_id=os.environ["WATSONX_PROJECT_ID"],
-        apikey=os.environ['WATSONX_APIKEY']
-    )
+    # shared with vector search and the semantic caches through the embedding cache.
+    return get_cached_embedding_model()
 
 def get_vector_store(drop_old=False):
     embeddings = get_embedding_model()
@@ -18,9 +18,9 @@ Guidelines:
 - Do not invent or assume the presence of any table or column not included.
 - Join tables if needed using relevant foreign keys shown in the schema.
 - Return only the SQL query. Make sure it is a valid SQL query, with no syntax errors or characters that could cause issues when executing the query.
-- Surround all column names in double quotes if they contain uppercase letters, spaces, or special characters (e.g., “Created”, “Updated Date”).
+- Surround all column names in double quotes if they contain uppercase letters, spaces, or special characters (e.g., "Created", "Updated Date").
 Schema Context:
-(‘TEST’: [(‘column_name’: ‘id’, ‘data_type’: ‘integer’), (‘column_name’: ‘query’, ‘data_type’: ‘text’), (‘column_name’: ‘issue’, ‘data_type’: ‘text’), (‘column_name’: ‘severity’, ‘data_type’: ‘integer’), (‘column_name’: ‘createdate’, ‘data_type’: ‘date’), (‘column_name’: ‘status’, ‘data_type’: ‘text’), (‘column_name’: ‘resolutiondate’, ‘data_type’: ‘date’)], ‘agent_queries_data’: [(‘column_name’: ‘id’, ‘data_type’: ‘integer’), (‘column_name’: ‘query’, ‘data_type’: ‘text’), (‘column_name’: ‘issue’, ‘data_type’: ‘text’), (‘column_name’: ‘severity’, ‘data_type’: ‘integer’), (‘column_name’: ‘status’, ‘data_type’: ‘text’), (‘column_name’: ‘createdate’, ‘data_type’: ‘date’), (‘column_name’: ‘resolutiondate’, ‘data_type’: ‘date’)], ‘jira_data’: [(‘column_name’: ‘Issue Type’, ‘data_type’: ‘text’), (‘column_name’: ‘Key’, ‘data_type’: ‘text’), (‘column_name’: ‘Summary’, ‘data_type’: ‘text’), (‘column_name’: ‘Assignee’, ‘data_type’: ‘name’), (‘column_name’: ‘Reporter’, ‘data_type’: ‘name’), (‘column_name’: ‘Status’, ‘data_type’: ‘text’), (‘column_name’: ‘Resolution’, ‘data_type’: ‘text’), (‘column_name’: ‘Created’, ‘data_type’: ‘timestamp without time zone’), (‘column_name’: ‘Resolution Details’, ‘data_type’: ‘text’), (‘column_name’: ‘Updated’, ‘data_type’: ‘timestamp without time zone’)], ‘test2’: [(‘column_name’: ‘id’, ‘data_type’: ‘integer’), (‘column_name’: ‘query’, ‘data_type’: ‘text’), (‘column_name’: ‘issue’, ‘data_type’: ‘text’), (‘column_name’: ‘severity’, ‘data_type’: ‘integer’), (‘column_name’: ‘createdate’, ‘data_type’: ‘date’), (‘column_name’: ‘status’, ‘data_type’: ‘text’), (‘column_name’: ‘resolutiondate’, ‘data_type’: ‘date’)])
+{schema_context}
 Use these examples to help you tailor the query as is needed.
 <example1>
 user_input: How many records are there in the jira table?
@@ -28,14 +28,17 @@ SQL Query: SELECT COUNT(*) FROM jira_data
 </example1>
 <example2>
 user_input: What was the latest Jira ticket that was created?
-SQL Query: SELECT * FROM jira_data ORDER BY “Created” DESC LIMIT 1;
+SQL Query: SELECT * FROM jira_data ORDER BY "Created" DESC LIMIT 1;
 </example2>
 <example3>
 user_input: What are all the Open and resolved Jira records?
-SELECT * FROM jira_data WHERE “Status” = ‘Open’ OR “Status” = ‘Resolved’;
+SELECT * FROM jira_data WHERE "Status" = 'Open' OR "Status" = 'Resolved';
 </example3>
 <user_input>
 {user_input}
 </user_input>
 Only return the PostgreSQL query code without ```sql ```
-SQL Query:"""
\ No newline at end of file
+SQL Query:"""
+
+# static schema used when the live schema catalog (utils/schema_catalog.py) cannot be introspected.
+sql_schema_fallback = """(‘TEST’: [(‘column_name’: ‘id’, ‘data_type’: ‘integer’), (‘column_name’: ‘query’, ‘data_type’: ‘text’), (‘column_name’: ‘issue’, ‘data_type’: ‘text’), (‘column_name’: ‘severity’, ‘data_type’: ‘integer’), (‘column_name’: ‘createdate’, ‘data_type’: ‘date’), (‘column_name’: ‘status’, ‘data_type’: ‘text’), (‘column_name’: ‘resolutiondate’, ‘data_type’: ‘date’)], ‘agent_queries_data’: [(‘column_name’: ‘id’, ‘data_type’: ‘integer’), (‘column_name’: ‘query’, ‘data_type’: ‘text’), (‘column_name’: ‘issue’, ‘data_type’: ‘text’), (‘column_name’: ‘severity’, ‘data_type’: ‘integer’), (‘column_name’: ‘status’, ‘data_type’: ‘text’), (‘column_name’: ‘createdate’, ‘data_type’: ‘date’), (‘column_name’: ‘resolutiondate’, ‘data_type’: ‘date’)], ‘jira_data’: [(‘column_name’: ‘Issue Type’, ‘data_type’: ‘text’), (‘column_name’: ‘Key’, ‘data_type’: ‘text’), (‘column_name’: ‘Summary’, ‘data_type’: ‘text’), (‘column_name’: ‘Assignee’, ‘data_type’: ‘name’), (‘column_name’: ‘Reporter’, ‘data_type’: ‘name’), (‘column_name’: ‘Status’, ‘data_type’: ‘text’), (‘column_name’: ‘Resolution’, ‘data_type’: ‘text’), (‘column_name’: ‘Created’, ‘data_type’: ‘timestamp without time zone’), (‘column_name’: ‘Resolution Details’, ‘data_type’: ‘text’), (‘column_name’: ‘Updated’, ‘data_type’: ‘timestamp without time zone’)], ‘test2’: [(‘column_name’: ‘id’, ‘data_type’: ‘integer’), (‘column_name’: ‘query’, ‘data_type’: ‘text’), (‘column_name’: ‘issue’, ‘data_type’: ‘text’), (‘column_name’: ‘severity’, ‘data_type’: ‘integer’), (‘column_name’: ‘createdate’, ‘data_type’: ‘date’), (‘column_name’: ‘status’, ‘data_type’: ‘text’), (‘column_name’: ‘resolutiondate’, ‘data_type’: ‘date’)])"""
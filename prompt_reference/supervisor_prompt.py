@@ -16,13 +16,17 @@ class SupervisorPrompts:
     3. **report_generator_agent**: Use this agent when the user asks for report creation. This agent can also handle sql query generation and execution if the user query is related to generating reports or summaries based on data retrieved by the other agents. 
     Example queries: “generate a usage report”, “summarize results”, “create a dashboard/report for xxx data”. You do not need to use postgres_agent or vector_db_agent for this, as the report_generator_agent can handle the sql query generation and execution.
 
-    4. **unknown**: Use this when the user query does not match any of the above categories or is incomplete query and/or unclear.
+    4. **hybrid_agent**: Use this when answering the query needs both structured Jira data from PostgreSQL and product documentation from the vector database.
+    The postgres and vector database searches then run in parallel and their results are combined.
+    Example queries: "how many open tickets relate to the JBoss upgrade and what does the support matrix say about it?".
+
+    5. **unknown**: Use this when the user query does not match any of the above categories or is incomplete query and/or unclear.
 
     ---
 
     ### Guidelines:
 
-    - **Your Only Output**: Respond with only the name of the selected agent: `postgres_agent`, `vector_db_agent`, `report_generator_agent` or 'unknown'. Do **not** include explanations or any other text.
+    - **Your Only Output**: Respond with only the name of the selected agent: `postgres_agent`, `vector_db_agent`, `report_generator_agent`, `hybrid_agent` or 'unknown'. Do **not** include explanations or any other text.
     - **State-Aware Routing**: You will be provided with the system state within `<state></state>` tags. Use this information to inform your routing decision.
         - If `postgres_agent_response` or `vector_db_agent_response` is already present in the state and the user is asking for a summary or report based on those results, choose `report_generator_agent`.
         - If `report_generation_response` exists and says `"report generated"`, you simply inform the user that the report has been generated and do not route to any agent.
@@ -79,4 +83,36 @@ class SupervisorPrompts:
     • Are you referring to a staging or production environment?
     • Would you like to check if recent incidents are documented in Confluence?
     </example>
-    Response:"""
\ No newline at end of file
+    Response:"""
+
+    # labeled seed queries for the local intent router, extended at runtime by the routing query log.
+    routing_examples = [
+        ("how many tickets are open from last 1 year?", "postgres_agent"),
+        ("How many records are there in the jira table?", "postgres_agent"),
+        ("What was the latest Jira ticket that was created?", "postgres_agent"),
+        ("What are all the Open and resolved Jira records?", "postgres_agent"),
+        ("list the jira tickets assigned to me that are still in progress", "postgres_agent"),
+        ("count the issues by status created this month", "postgres_agent"),
+        ("which tickets were resolved last week?", "postgres_agent"),
+        ("show me the highest priority open bugs in jira", "postgres_agent"),
+        ("what is the release date of activemq 6.1.4?", "postgres_agent"),
+        ("which version of jboss supports openjdk 11?", "vector_db_agent"),
+        ("Is azure sql tested for any OS platform?", "vector_db_agent"),
+        ("What technologies are supported for containerized deployment of FCC application?", "vector_db_agent"),
+        ("Does Tomcat 10.1.34 or 10.1.x support open jdk 11?", "vector_db_agent"),
+        ("what does the FCC support matrix say about oracle database versions?", "vector_db_agent"),
+        ("which operating systems are certified for FCC 6.3?", "vector_db_agent"),
+        ("is websphere compatible with java 17 according to the documentation?", "vector_db_agent"),
+        ("find the confluence page about kubernetes deployment of FCC", "vector_db_agent"),
+        ("Generate a report of the number of issues by status in the jira database", "report_generator_agent"),
+        ("create a report of ticket inflows and outflows per month", "report_generator_agent"),
+        ("generate a usage report", "report_generator_agent"),
+        ("build a bar chart of issues by assignee", "report_generator_agent"),
+        ("create a dashboard of jira tickets by priority", "report_generator_agent"),
+        ("summarize the open issues by issue type in a pie chart report", "report_generator_agent"),
+        ("give me a weekly trend report of created tickets", "report_generator_agent"),
+        ("how many open tickets relate to the JBoss upgrade and what does the support matrix say about it?", "hybrid_agent"),
+        ("list the jira issues about openjdk 11 and check which tomcat versions support it", "hybrid_agent"),
+        ("how many tickets mention kubernetes and what does the documentation say about containerized deployment?", "hybrid_agent"),
+        ("show the open oracle database tickets and the oracle versions certified for FCC", "hybrid_agent"),
+    ]
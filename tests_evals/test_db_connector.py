@@ -0,0 +1,146 @@
+import pandas as pd
+import pytest
+from dotenv import load_dotenv
+_ = load_dotenv(override=True)
+
+from config import Config
+from connectors.db_connector import PostgresConnector
+from utils.result_cache import get_result_cache
+from utils.schema_catalog import SchemaCatalog
+from utils.sql_validator import SQLValidator
+
+
+TABLE = "test_db_connector_tickets"
+STATUSES = ["Open", "In Progress", "Closed"]
+
+
+@pytest.fixture(scope="module")
+def pg_connector():
+    """
+    A connector over a small ticket table, dropped afterwards.
+    """
+    pg_connector = PostgresConnector()
+    with pg_connector.connection() as conn:
+        conn.execute(f"DROP TABLE IF EXISTS {TABLE}")
+        conn.execute(
+            f'CREATE TABLE {TABLE} ("Key" text, "Status" text, "Created" timestamp, points integer, '
+            f'done boolean, summary text)'
+        )
+        with conn.cursor() as cur:
+            cur.executemany(
+                f'INSERT INTO {TABLE} VALUES (%s, %s, %s, %s, %s, %s)',
+                [
+                    (f"PRJ-{i}", STATUSES[i % 3], f"2024-01-{1 + i % 28:02d} 10:00:00",
+                     None if i % 10 == 0 else i, i % 2 == 0, "" if i == 1 else None if i == 2 else f"line 1\nline, {i}")
+                    for i in range(60)
+                ],
+            )
+    yield pg_connector
+    with pg_connector.connection() as conn:
+        conn.execute(f"DROP TABLE IF EXISTS {TABLE}")
+
+
+@pytest.mark.parametrize("engine", ["pyarrow", "pandas"])
+def test_postgres_query_frame(pg_connector, monkeypatch, engine):
+    """
+    Test that query_frame returns the same values as query_data, typed from the postgres columns
+    """
+    monkeypatch.setitem(Config.postgres_frame_params, "engine", engine)
+    # the engine is not part of the cache key.
+    get_result_cache().invalidate_all()
+    query = f'SELECT "Key", "Status", "Created", points, done, summary FROM {TABLE} ORDER BY "Created", "Key"'
+    df = pg_connector.query_frame(query)
+    rows = pg_connector.query_data(query)
+
+    assert list(df.columns) == rows[0]
+    assert len(df) == len(rows) - 1 == 60
+    assert str(df["Status"].dtype) == "category"
+    assert str(df["points"].dtype) == "Int64"
+    assert str(df["done"].dtype) == "boolean"
+    assert str(df["Created"].dtype).startswith("datetime64")
+    for (key, status, created, points, done, summary), record in zip(rows[1:], df.to_dict("records")):
+        assert record["Key"] == key
+        assert record["Status"] == status
+        assert record["Created"].to_pydatetime() == created
+        assert pd.isna(record["points"]) if points is None else record["points"] == points
+        assert record["done"] == done
+        # NULLs and empty strings stay apart, and multi-line values survive.
+        assert pd.isna(record["summary"]) if summary is None else record["summary"] == summary
+
+
+def test_postgres_query_frame_params_and_limit(pg_connector):
+    """
+    Test query_frame with bound parameters and a row cap
+    """
+    df = pg_connector.query_frame(f'SELECT "Key", points FROM {TABLE} WHERE "Status" = %s ORDER BY "Key"',
+                                  params=("Open",), max_rows=5)
+    assert len(df) == 5
+    assert list(df.columns) == ["Key", "points"]
+
+
+def test_postgres_query_frame_duplicate_columns(pg_connector):
+    """
+    Test that a result with duplicate column names falls back to the row path
+    """
+    df = pg_connector.query_frame(f'SELECT "Key", "Key" FROM {TABLE} ORDER BY "Key" LIMIT 3')
+    assert df.shape == (3, 2)
+    assert list(df.columns) == ["Key", "Key"]
+
+
+def test_postgres_query_frame_empty(pg_connector):
+    """
+    Test that an empty result keeps its columns
+    """
+    df = pg_connector.query_frame(f'SELECT "Key", points FROM {TABLE} WHERE false')
+    assert df.empty
+    assert list(df.columns) == ["Key", "points"]
+
+
+def test_postgres_run_query_cache(pg_connector):
+    """
+    Test that run_query answers a repeated read from the result cache, but not a differently aliased one or a read
+    after a write
+    """
+    get_result_cache().invalidate_all()
+    query = f'SELECT count(*) AS n FROM {TABLE} WHERE "Status" = %s'
+    first = pg_connector.run_query(query, ("Open",))
+    assert first["status"] == "ok" and not first.get("cache_hit")
+    assert first["data"] == [{"n": 20}]
+
+    again = pg_connector.run_query(f'select COUNT(*) as n from {TABLE} where "Status" = %s', ("Open",))
+    assert again.get("cache_hit") and again["data"] == [{"n": 20}]
+
+    aliased = pg_connector.run_query(f'SELECT count(*) AS total FROM {TABLE} WHERE "Status" = %s', ("Open",))
+    assert not aliased.get("cache_hit")
+    assert aliased["data"] == [{"total": 20}]
+
+    assert pg_connector.query_data("SELECT 1 AS a") == [["a"], (1,)]
+    assert pg_connector.query_data("SELECT 1 AS b") == [["b"], (1,)]
+
+    write = pg_connector.run_query(f"INSERT INTO {TABLE} (\"Key\", \"Status\") VALUES ('PRJ-X', 'Open')")
+    assert write["status"] == "ok"
+    after = pg_connector.run_query(query, ("Open",))
+    assert not after.get("cache_hit")
+    assert after["data"] == [{"n": 21}]
+    pg_connector.run_query(f"DELETE FROM {TABLE} WHERE \"Key\" = 'PRJ-X'")
+
+
+def test_postgres_validated_queries_run(pg_connector):
+    """
+    Test that queries the offline validator accepts against the live catalog run, including system catalogs and
+    whole-row references, and that its fixes make a query runnable
+    """
+    catalog = SchemaCatalog(dict(Config.schema_catalog_params, snapshot_path=None))
+    validator = SQLValidator(catalog=catalog)
+    for query in [
+        f"SELECT table_name FROM information_schema.tables WHERE table_name = '{TABLE}'",
+        "SELECT count(*) AS sessions FROM pg_stat_activity",
+        f'SELECT json_agg(t) AS tickets FROM (SELECT "Key" FROM {TABLE} ORDER BY "Key" LIMIT 2) t',
+        f"SELECT row_to_json(x) AS ticket FROM {TABLE} x LIMIT 1",
+        f'SELECT Status, count(*) AS n FROM {TABLE} GROUP BY Status',
+    ]:
+        validation = validator.validate(query)
+        assert validation["valid"], (query, validation["errors"])
+        result = pg_connector.run_guarded_query(validation["sql"])
+        assert result["status"] == "ok", (validation["sql"], result)
+        assert result["data"]
@@ -0,0 +1,92 @@
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from config import Config
+from utils.embedding_cache import CachedEmbeddings, EmbeddingCache, MemmapEmbeddingTier, embedding_key
+
+
+DIMENSION = 8
+
+
+class CountingEmbeddings(Embeddings):
+    """
+    Deterministic embeddings that record the texts they were asked to embed.
+    """
+    def __init__(self):
+        self.embedded = []
+
+    def embed_documents(self, texts):
+        self.embedded.extend(texts)
+        return [np.random.default_rng(len(text)).random(DIMENSION).tolist() for text in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+def _params(tmp_path, disk_max_entries=100):
+    return dict(Config.embedding_cache_params, directory=str(tmp_path), disk_max_entries=disk_max_entries)
+
+
+def _vector(i):
+    return np.full(DIMENSION, i, dtype=np.float32)
+
+
+def test_embed_documents_batches(tmp_path):
+    """
+    Test that embed_documents embeds each new text once and a new process answers the batch from the disk tier
+    """
+    model = CountingEmbeddings()
+    texts = ["alpha", "beta", "alpha", "gamma  "]
+    vectors = CachedEmbeddings(model, "m", EmbeddingCache(_params(tmp_path))).embed_documents(texts)
+    assert model.embedded == ["alpha", "beta", "gamma  "]
+    assert vectors[0] == vectors[2]
+
+    cache = EmbeddingCache(_params(tmp_path))
+    again = CachedEmbeddings(model, "m", cache).embed_documents(texts + ["delta"])
+    assert again[:4] == vectors
+    assert model.embedded[3:] == ["delta"]
+    assert cache.stats()["disk_hits"] == 4
+
+
+def test_tier_batches_share_slots_across_processes(tmp_path):
+    """
+    Test that batches written by one tier are read by another on the same files, and that rewritten keys keep their
+    slot
+    """
+    writer = MemmapEmbeddingTier(str(tmp_path), "m", 10)
+    reader = MemmapEmbeddingTier(str(tmp_path), "m", 10)
+    keys = [embedding_key("m", str(i)) for i in range(4)]
+    assert reader.get_many(keys) == [None] * 4
+
+    writer.set_many([(key, _vector(i)) for i, key in enumerate(keys)])
+    found = reader.get_many(keys + [embedding_key("m", "missing")])
+    assert [v[0] for v in found[:4]] == [0, 1, 2, 3] and found[4] is None
+
+    writer.set_many([(keys[1], _vector(9))])
+    assert reader.get(keys[1])[0] == 9
+    assert len(writer) == 4
+
+
+def test_tier_evicts_least_recently_read(tmp_path):
+    """
+    Test that reads recorded lazily still protect their slots from eviction, and that an evicted slot reads as a miss
+    """
+    tier = MemmapEmbeddingTier(str(tmp_path), "m", 4)
+    other = MemmapEmbeddingTier(str(tmp_path), "m", 4)
+    keys = [embedding_key("m", str(i)) for i in range(6)]
+    tier.set_many([(key, _vector(i)) for i, key in enumerate(keys[:4])])
+    # the read is not written back yet, but is before the next write.
+    assert tier.get(keys[0])[0] == 0
+    assert tier._accessed
+
+    tier.set_many([(keys[4], _vector(4)), (keys[5], _vector(5))])
+    assert not tier._accessed
+    present = [v is not None for v in other.get_many(keys)]
+    # the keys written together have the same last_access, so any two of them can go.
+    assert present[0] and present[4] and present[5] and sum(present[1:4]) == 1
+
+    # a batch larger than the tier keeps its last entries.
+    tier.set_many([(embedding_key("m", f"batch {i}"), _vector(i)) for i in range(6)])
+    assert [v[0] if v is not None else None for v in other.get_many(
+        [embedding_key("m", f"batch {i}") for i in range(6)]
+    )] == [None, None, 2, 3, 4, 5]
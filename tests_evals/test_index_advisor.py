@@ -0,0 +1,87 @@
+import pytest
+from dotenv import load_dotenv
+_ = load_dotenv(override=True)
+
+from config import Config
+from connectors.db_connector import pooled_connection
+from utils.index_advisor import IndexAdvisor, WorkloadLog, candidate_indexes, extract_keys
+from utils.schema_catalog import get_schema_catalog
+
+
+TABLE = "test_index_advisor_tickets"
+COLUMNS = [("Key", "text"), ("Status", "text"), ("Created", "timestamp without time zone"), ("due", "date")]
+
+
+def test_candidates_ignore_scan_direction():
+    """
+    Test that a single-key DESC candidate is the ascending one, which a backward scan serves
+    """
+    keys = extract_keys(f'SELECT "Key" FROM {TABLE} ORDER BY "Created" DESC LIMIT 10', {TABLE: {"columns": COLUMNS}})
+    assert keys[TABLE]["sort"] == [('"Created"', True)]
+    assert candidate_indexes(keys[TABLE], 3) == [(('"Created"', False),)]
+
+    keys = {"equality": [], "range": [], "group": [], "sort": [('"Created"', True), ('"Key"', False)]}
+    assert candidate_indexes(keys, 3) == [(('"Created"', False), ('"Key"', True)), (('"Created"', False),)]
+
+
+def test_date_trunc_keys_only_on_timestamps():
+    """
+    Test that date_trunc expression keys are only proposed for timestamp without time zone columns
+    """
+    tables = {TABLE: {"columns": COLUMNS}}
+    keys = extract_keys(f"SELECT count(*) FROM {TABLE} WHERE date_trunc('month', \"Created\") = '2021-01-01'", tables)
+    assert keys[TABLE]["equality"] == [("date_trunc('month', \"Created\")", False)]
+    assert extract_keys(f"SELECT count(*) FROM {TABLE} WHERE date_trunc('month', due) = '2021-01-01'", tables) == {}
+
+
+@pytest.fixture
+def advisor(tmp_path):
+    """
+    An advisor with trial builds over a logged workload on a 50k-row ticket table, dropped afterwards.
+    """
+    with pooled_connection() as conn:
+        conn.execute(f"DROP TABLE IF EXISTS {TABLE}")
+        conn.execute(f'CREATE TABLE {TABLE} ("Key" text, "Status" text, "Created" timestamp, due date)')
+        conn.execute(
+            f"INSERT INTO {TABLE} SELECT 'PRJ-' || i, (ARRAY['Open', 'Closed', 'In Progress'])[1 + i % 3], "
+            f"timestamp '2020-01-01' + i * interval '17 minutes', date '2020-01-01' + i % 900 "
+            f"FROM generate_series(1, 50000) i"
+        )
+        conn.execute(f"ANALYZE {TABLE}")
+    get_schema_catalog().refresh(force=True)
+
+    params = dict(Config.index_advisor_params, workload_path=str(tmp_path / "workload.jsonl"), tables=[TABLE],
+                  trial_builds=True, min_gain_pct=1.0)
+    log = WorkloadLog(params)
+    log.record(f'SELECT "Key" FROM {TABLE} WHERE "Created" >= %s ORDER BY "Created" DESC LIMIT 10', ["2021-01-01"], 1.0)
+    log.record(f'SELECT "Key" FROM {TABLE} ORDER BY "Created" LIMIT 10', None, 1.0)
+    log.record(f"SELECT count(*) FROM {TABLE} WHERE date_trunc('month', due) = '2021-01-01'", None, 1.0)
+    log.record(f"SELECT count(*) FROM {TABLE} WHERE date_trunc('month', \"Created\") = '2021-01-01'", None, 1.0)
+    # a query that no longer runs must not spoil the evaluation of the others.
+    log.record(f"SELECT * FROM {TABLE} WHERE \"Created\" > %s AND \"Key\" = %s", ["not a timestamp", "PRJ-1"], 1.0)
+    yield IndexAdvisor(params, log)
+
+    with pooled_connection() as conn:
+        conn.execute(f"DROP TABLE IF EXISTS {TABLE}")
+    get_schema_catalog().refresh(force=True)
+
+
+def test_recommend_and_apply(advisor):
+    """
+    Test that the advisor recommends one index per set of queries and that every recommendation builds
+    """
+    recommendations = advisor.recommend()
+    statements = [r["statement"] for r in recommendations]
+    assert statements == [
+        f'CREATE INDEX {TABLE}_created_idx ON {TABLE} ("Created")',
+        f"CREATE INDEX {TABLE}_date_trunc_month_created_idx ON {TABLE} ((date_trunc('month', \"Created\")))",
+    ]
+    assert all(r["method"] == "trial_build" and r["gain"] > 0 for r in recommendations)
+    assert len(recommendations[0]["queries"]) == 2
+
+    results = advisor.apply(recommendations)
+    assert [r["status"] for r in results] == ["ok", "ok"]
+
+    # built indexes are no longer proposed.
+    get_schema_catalog().refresh(force=True)
+    assert advisor.recommend() == []
@@ -0,0 +1,193 @@
+import time
+
+import pytest
+
+from config import Config
+from utils import jira_rollups
+from utils.jira_rollups import JiraRollups, build_report_query, raw_report_query
+
+
+def _rollups(monkeypatch, enabled=True, dimensions=("Issue Type", "Status"), unique_key=True, refresh=None):
+    """
+    Install rollups that look freshly refreshed (or refresh with the given function) as the process-wide ones.
+    """
+    rollups = JiraRollups(dict(Config.jira_rollup_params, enabled=enabled))
+    rollups._dimensions = list(dimensions)
+    rollups._unique_key = unique_key
+    rollups._built = True
+    rollups._refreshed_at = 0.0 if refresh else time.time()
+    if refresh:
+        monkeypatch.setattr(rollups, "refresh", refresh)
+    monkeypatch.setattr(jira_rollups, "_JIRA_ROLLUPS", rollups)
+    return rollups
+
+
+def test_count_report_reads_rollups(monkeypatch):
+    """
+    Test that a COUNT report over maintained dimensions at a rollup grain is rewritten onto the rollup table
+    """
+    rollups = _rollups(monkeypatch)
+    query = build_report_query(["Issue Type"], "month", "COUNT")
+    assert query == (
+        "SELECT NULLIF(\"Issue Type\", '') AS \"Issue Type\", NULLIF(period, '-infinity') AS period, "
+        "SUM(ticket_count)::bigint as agg_value FROM jira_rollup_month GROUP BY \"Issue Type\", period"
+    )
+    assert (rollups.rewrites, rollups.fallbacks) == (1, 0)
+
+
+def test_ineligible_reports_read_source(monkeypatch):
+    """
+    Test that other aggregates, grains and columns keep the raw query
+    """
+    rollups = _rollups(monkeypatch)
+    for columns, grain, agg in [
+        (["Issue Type"], "month", "SUM"),
+        (["Issue Type"], "day", "COUNT"),
+        (["Issue Type"], None, "COUNT"),
+        (["Summary"], "week", "COUNT"),
+        (["Status", "Assignee"], "quarter", "COUNT"),
+    ]:
+        assert build_report_query(columns, grain, agg) == raw_report_query(columns, grain, agg)
+    assert (rollups.rewrites, rollups.fallbacks) == (0, 5)
+
+
+def test_raw_report_query():
+    """
+    Test the raw report query the sidebar has always run
+    """
+    assert raw_report_query(["Status"], "week") == (
+        "SELECT \"Status\", DATE_TRUNC('week', \"Created\") as period, COUNT(*) as agg_value FROM jira_data "
+        "GROUP BY \"Status\", DATE_TRUNC('week', \"Created\")"
+    )
+    assert raw_report_query(["Status"], None, "MAX") == (
+        "SELECT \"Status\", \"Created\" as period, MAX(\"Status\") as agg_value FROM jira_data "
+        "GROUP BY \"Status\", \"Created\""
+    )
+
+
+def test_non_unique_key_reads_source(monkeypatch):
+    """
+    Test that reports fall back to the source table when the refresh finds "Key" is not unique
+    """
+    def refresh(detect_deletes=False, keys=None, build=True):
+        rollups._unique_key = False
+        rollups._refreshed_at = time.time()
+        return {"changed": 0, "removed": 0}
+
+    rollups = _rollups(monkeypatch, unique_key=None, refresh=refresh)
+    assert build_report_query(["Status"], "week", "COUNT") == raw_report_query(["Status"], "week", "COUNT")
+    assert (rollups.rewrites, rollups.fallbacks) == (0, 1)
+
+
+def test_refresh_resolves_dimensions(monkeypatch):
+    """
+    Test that eligibility is checked again against the dimensions the refresh found in the source table
+    """
+    def refresh(detect_deletes=False, keys=None, build=True):
+        rollups._dimensions = ["Issue Type", "Status"]
+        rollups._refreshed_at = time.time()
+        return {"changed": 3, "removed": 0}
+
+    rollups = _rollups(monkeypatch, refresh=refresh)
+    rollups._dimensions = None
+    # Priority is a configured dimension, but the source table does not have it.
+    assert build_report_query(["Priority"], "month", "COUNT") == raw_report_query(["Priority"], "month", "COUNT")
+    assert build_report_query(["Status"], "month", "COUNT").endswith("FROM jira_rollup_month GROUP BY \"Status\", period")
+
+
+def test_failed_refresh_reads_source(monkeypatch):
+    """
+    Test that reports fall back to the source table when the rollups cannot be refreshed
+    """
+    def refresh(detect_deletes=False, keys=None, build=True):
+        raise RuntimeError("database unavailable")
+
+    rollups = _rollups(monkeypatch, refresh=refresh)
+    assert build_report_query(["Status"], "quarter", "COUNT") == raw_report_query(["Status"], "quarter", "COUNT")
+    assert (rollups.rewrites, rollups.fallbacks) == (0, 1)
+
+
+def test_disabled_rollups_read_source(monkeypatch):
+    """
+    Test that disabled rollups are never used
+    """
+    rollups = _rollups(monkeypatch, enabled=False)
+    assert build_report_query(["Status"], "month", "COUNT") == raw_report_query(["Status"], "month", "COUNT")
+    assert rollups.fallbacks == 1
+
+
+SOURCE = "test_jira_rollups_tickets"
+PREFIX = "test_jira_rollup"
+
+
+@pytest.fixture
+def live_rollups(monkeypatch):
+    """
+    Rollups over a 300-ticket source table, installed as the process-wide ones and dropped afterwards.
+    """
+    from connectors.db_connector import pooled_connection
+    from utils.schema_catalog import get_schema_catalog
+
+    def drop(conn):
+        for table in [SOURCE] + [f"{PREFIX}_{name}" for name in ("tickets", "state") + jira_rollups.GRAINS]:
+            conn.execute(f"DROP TABLE IF EXISTS {table}")
+
+    with pooled_connection() as conn:
+        drop(conn)
+        conn.execute(f'CREATE TABLE {SOURCE} ("Key" text, "Issue Type" text, "Status" text, "Created" timestamp, '
+                     f'"Updated" timestamp)')
+        conn.execute(
+            f"INSERT INTO {SOURCE} SELECT 'PRJ-' || i, (ARRAY['Bug', 'Task'])[1 + i % 2], "
+            f"(ARRAY['Open', 'Closed', NULL])[1 + i % 3], timestamp '2024-01-01' + i * interval '1 day', "
+            f"timestamp '2024-06-01' + i * interval '1 minute' FROM generate_series(1, 300) i"
+        )
+    get_schema_catalog().refresh(force=True)
+    rollups = JiraRollups(dict(Config.jira_rollup_params, source_table=SOURCE, table_prefix=PREFIX,
+                               refresh_seconds=0))
+    monkeypatch.setattr(jira_rollups, "_JIRA_ROLLUPS", rollups)
+    yield rollups
+
+    with pooled_connection() as conn:
+        drop(conn)
+    get_schema_catalog().refresh(force=True)
+
+
+def _report(conn, query):
+    return sorted(conn.execute(query).fetchall(), key=repr)
+
+
+def test_live_reports_match_source(live_rollups):
+    """
+    Test that reports read the source table until the loader built the rollups, then read rollups that match it,
+    including after tickets were deleted or the table truncated outside the loader
+    """
+    from connectors.db_connector import pooled_connection
+
+    columns, grain = ["Status"], "month"
+    raw = raw_report_query(columns, grain, source=SOURCE)
+    with pooled_connection() as conn:
+        # no tables are created on the report path.
+        assert build_report_query(columns, grain) == raw
+        assert conn.execute("SELECT to_regclass(%s)", (f"{PREFIX}_state",)).fetchone()[0] is None
+
+        live_rollups.prepare_source()
+        assert live_rollups.refresh(detect_deletes=True)["changed"] == 300
+        query = build_report_query(columns, grain)
+        assert query != raw
+        assert _report(conn, query) == _report(conn, raw)
+
+        marker = live_rollups._deletes_marker(conn)
+        with conn.transaction():
+            conn.execute(f"DELETE FROM {SOURCE} WHERE \"Key\" IN ('PRJ-1', 'PRJ-2', 'PRJ-40')")
+            conn.execute("SELECT pg_stat_force_next_flush()")
+        # the delete counter is flushed once the deleting session goes idle.
+        deadline = time.time() + 15
+        while live_rollups._deletes_marker(conn) == marker and time.time() < deadline:
+            time.sleep(0.2)
+        assert _report(conn, build_report_query(columns, grain)) == _report(conn, raw)
+        assert live_rollups.fallbacks == 1
+
+        conn.execute(f"TRUNCATE {SOURCE}")
+        query = build_report_query(columns, grain)
+        assert query != raw
+        assert _report(conn, query) == _report(conn, raw) == []
@@ -0,0 +1,96 @@
+from config import Config
+from utils.result_cache import QueryResultCache
+
+
+PARAMS = dict(Config.result_cache_params, enabled=True)
+
+
+def test_key_ignores_whitespace_case_and_comments():
+    """
+    Test that formatting, keyword case and comments do not change the cache key
+    """
+    cache = QueryResultCache(PARAMS)
+    key = cache.key('SELECT "Status", COUNT(*) FROM jira_data WHERE "Assignee" = \'alice\' GROUP BY "Status"')
+    assert key is not None
+    assert key[1] == frozenset({"jira_data"})
+    for variant in [
+        'select "Status", count(*)\n  from jira_data\n where "Assignee" = \'alice\'\n group by "Status"',
+        '/* report */ SELECT "Status", COUNT(*) FROM jira_data -- by status\nWHERE "Assignee" = \'alice\' GROUP BY "Status";',
+    ]:
+        assert cache.key(variant) == key
+
+
+def test_key_depends_on_literals_and_params():
+    """
+    Test that different literals, literal order, params and variants give different keys
+    """
+    cache = QueryResultCache(PARAMS)
+    query = 'SELECT * FROM jira_data WHERE "Status" = \'Open\' AND "Assignee" = \'alice\''
+    key = cache.key(query)
+    assert cache.key(query.replace("Open", "Closed")) != key
+    assert cache.key('SELECT * FROM jira_data WHERE "Status" = \'alice\' AND "Assignee" = \'Open\'') != key
+
+    parameterized = 'SELECT * FROM jira_data WHERE "Status" = %s'
+    assert cache.key(parameterized, ("Open",)) == cache.key(parameterized, ("Open",))
+    assert cache.key(parameterized, ("Open",)) != cache.key(parameterized, ("Closed",))
+    assert cache.key(parameterized, ("Open",), "query_frame") != cache.key(parameterized, ("Open",), "run_query")
+
+
+def test_key_depends_on_output_names():
+    """
+    Test that output column aliases, which the fingerprint ignores, give different keys
+    """
+    cache = QueryResultCache(PARAMS)
+    assert cache.key("SELECT count(*) AS n FROM jira_data") != cache.key("SELECT count(*) AS total FROM jira_data")
+    assert cache.key("SELECT count(*) AS n FROM jira_data") != cache.key("SELECT count(*) FROM jira_data")
+    assert cache.key("SELECT 1 AS a") != cache.key("SELECT 1 AS b")
+    assert cache.key("SELECT * FROM jira_data j(a, b)") != cache.key("SELECT * FROM jira_data j(c, d)")
+    assert cache.key("SELECT count(*) AS n FROM jira_data") == cache.key("select COUNT(*) as n from jira_data")
+
+
+def test_key_percent_signs_without_params():
+    """
+    Test that %% is only a placeholder escape when the query has parameters
+    """
+    cache = QueryResultCache(PARAMS)
+    assert cache.key("SELECT * FROM jira_data WHERE \"Key\" LIKE 'a%%'") != \
+        cache.key("SELECT * FROM jira_data WHERE \"Key\" LIKE 'a%'")
+    assert cache.key("SELECT * FROM jira_data WHERE \"Key\" LIKE 'a%%' AND \"Status\" = %s", ("Open",)) == \
+        cache.key("SELECT * FROM jira_data WHERE \"Key\" LIKE 'a%%' AND \"Status\" = %s", ("Open",))
+
+
+def test_key_tables_exclude_ctes():
+    """
+    Test that the key's tables are the base tables, not CTE names
+    """
+    key = QueryResultCache(PARAMS).key(
+        'WITH open AS (SELECT * FROM jira_data WHERE "Status" = \'Open\') '
+        'SELECT * FROM open JOIN products p ON p.name = open."Summary"'
+    )
+    assert key[1] == frozenset({"jira_data", "products"})
+
+
+def test_uncacheable_queries():
+    """
+    Test that writes, volatile functions, several statements and unparsable queries get no key
+    """
+    cache = QueryResultCache(PARAMS)
+    for query in [
+        "UPDATE jira_data SET \"Status\" = 'Closed'",
+        'SELECT * FROM jira_data WHERE "Created" > now() - interval \'1 day\'',
+        'SELECT * FROM jira_data WHERE "Created" > CURRENT_DATE',
+        "SELECT random() FROM jira_data",
+        "SELECT * FROM jira_data FOR UPDATE",
+        "SELECT 1; SELECT 2",
+        "SELEC * FROM jira_data",
+    ]:
+        assert cache.key(query) is None, query
+    assert cache.uncacheable == 7
+
+
+def test_disabled_cache_has_no_keys():
+    """
+    Test that a disabled cache never returns a key
+    """
+    cache = QueryResultCache(dict(Config.result_cache_params, enabled=False))
+    assert cache.key("SELECT * FROM jira_data") is None
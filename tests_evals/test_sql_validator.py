@@ -0,0 +1,179 @@
+import pytest
+
+from config import Config
+from utils.schema_catalog import SchemaCatalog
+from utils.sql_validator import SQLValidator
+
+
+TABLES = {
+    "jira_data": {
+        "columns": [("Key", "text"), ("Summary", "text"), ("Issue Type", "text"), ("Status", "text"),
+                    ("Created", "timestamp without time zone"), ("Updated", "timestamp without time zone")],
+    },
+    "products": {
+        "columns": [("id", "integer"), ("name", "text")],
+    },
+}
+
+
+@pytest.fixture
+def validator():
+    # an in-memory catalog, no database and no snapshot file.
+    catalog = SchemaCatalog(dict(Config.schema_catalog_params, snapshot_path=None))
+    catalog.tables = TABLES
+    return SQLValidator(catalog=catalog)
+
+
+def test_quotes_unquoted_column(validator):
+    """
+    Test that an unquoted mixed-case column is quoted
+    """
+    result = validator.validate("SELECT Created FROM jira_data WHERE Created > '2024-01-01'")
+    assert result["valid"]
+    assert result["sql"] == "SELECT \"Created\" FROM jira_data WHERE \"Created\" > '2024-01-01'"
+
+
+def test_quotes_aliased_column(validator):
+    """
+    Test that a column qualified by a table alias is quoted after the qualifier
+    """
+    result = validator.validate("SELECT j.created, j.Status FROM jira_data j ORDER BY j.created")
+    assert result["valid"]
+    assert result["sql"] == 'SELECT j."Created", j."Status" FROM jira_data j ORDER BY j."Created"'
+
+
+def test_quotes_multiword_column(validator):
+    """
+    Test that an unquoted multi-word column is quoted, and string literals are left alone
+    """
+    result = validator.validate("SELECT Issue Type, COUNT(*) FROM jira_data WHERE Summary = 'Issue Type' GROUP BY Issue Type")
+    assert result["valid"]
+    assert result["sql"] == "SELECT \"Issue Type\", COUNT(*) FROM jira_data WHERE \"Summary\" = 'Issue Type' GROUP BY \"Issue Type\""
+
+
+def test_fixes_table_case(validator):
+    """
+    Test that a wrong-case table name resolves to the catalog's table, also where it qualifies a column
+    """
+    # postgres folds the unquoted name, so it is left as written.
+    result = validator.validate('SELECT "Key" FROM Jira_Data')
+    assert result["valid"]
+    assert result["sql"] == 'SELECT "Key" FROM Jira_Data'
+
+    result = validator.validate('SELECT "Jira_Data"."Key" FROM "Jira_Data" WHERE "Jira_Data".status = \'Open\'')
+    assert result["valid"]
+    assert result["sql"] == 'SELECT jira_data."Key" FROM jira_data WHERE jira_data."Status" = \'Open\''
+
+    result = validator.validate('SELECT j."Key" FROM public."Jira_Data" j')
+    assert result["valid"]
+    assert result["sql"] == 'SELECT j."Key" FROM public.jira_data j'
+
+
+def test_unknown_column(validator):
+    """
+    Test that an unknown column is reported with suggestions
+    """
+    result = validator.validate('SELECT "Statuss" FROM jira_data')
+    assert not result["valid"]
+    assert result["status"] == "error"
+    assert "unknown column 'Statuss'" in result["error"]
+    assert "Status" in result["error"]
+
+
+def test_unknown_table(validator):
+    """
+    Test that an unknown table is reported
+    """
+    result = validator.validate("SELECT * FROM jira_tickets")
+    assert not result["valid"]
+    assert "unknown table 'jira_tickets'" in result["error"]
+
+
+def test_cte_and_subquery_columns(validator):
+    """
+    Test that columns of CTEs and subqueries are not reported as unknown
+    """
+    cte = (
+        'WITH per_status AS (SELECT "Status", COUNT(*) AS n FROM jira_data GROUP BY "Status") '
+        'SELECT per_status.n, total FROM per_status, (SELECT COUNT(*) AS total FROM jira_data) t WHERE n > 1'
+    )
+    result = validator.validate(cte)
+    assert result["valid"], result["errors"]
+    assert result["sql"] == cte
+
+    subquery = 'SELECT s.k FROM (SELECT "Key" AS k FROM jira_data) s ORDER BY s.k'
+    result = validator.validate(subquery)
+    assert result["valid"], result["errors"]
+    assert result["sql"] == subquery
+
+
+def test_output_alias_not_reported(validator):
+    """
+    Test that ORDER BY on a select-list alias is not reported as an unknown column
+    """
+    query = 'SELECT "Status", COUNT(*) AS ticket_count FROM jira_data GROUP BY "Status" ORDER BY ticket_count DESC'
+    result = validator.validate(query)
+    assert result["valid"], result["errors"]
+    assert result["sql"] == query
+
+
+def test_system_and_other_schema_relations(validator):
+    """
+    Test that relations outside the catalog's schema (information_schema, pg_catalog, other schemas) are not checked
+    """
+    for query in [
+        "SELECT table_name FROM information_schema.tables WHERE table_schema = 'public'",
+        "SELECT * FROM pg_stat_activity",
+        "SELECT a.pid, a.query FROM pg_catalog.pg_stat_activity a WHERE a.state = 'active'",
+        "SELECT * FROM reporting.weekly_totals",
+        'SELECT t.table_name, j."Key" FROM information_schema.tables t JOIN jira_data j ON j."Key" = t.table_name',
+    ]:
+        result = validator.validate(query)
+        assert result["valid"], (query, result["errors"])
+        assert result["sql"] == query
+
+    # the catalog's own tables are still checked, qualified or not.
+    assert not validator.validate("SELECT * FROM public.jira_tickets")["valid"]
+    result = validator.validate("SELECT j.Statuss FROM jira_data j JOIN information_schema.tables t ON true")
+    assert "unknown column 'statuss'" in result["error"]
+
+
+def test_whole_row_references(validator):
+    """
+    Test that a FROM alias or table name used as a whole-row value is not reported as a column
+    """
+    for query in [
+        "SELECT json_agg(t) FROM jira_data t",
+        "SELECT row_to_json(jira_data) FROM jira_data",
+        'SELECT j."Key", to_jsonb(p) FROM jira_data j JOIN products p ON p.name = j."Summary"',
+    ]:
+        result = validator.validate(query)
+        assert result["valid"], (query, result["errors"])
+        assert result["sql"] == query
+    assert "unknown column 'x'" in validator.validate("SELECT json_agg(x) FROM jira_data t")["error"]
+
+
+def test_quoted_query_unchanged(validator):
+    """
+    Test that an already correct query comes back byte for byte, without fixes
+    """
+    query = (
+        'SELECT j."Issue Type", DATE_TRUNC(\'month\', j."Created") AS period, COUNT(*)\n'
+        'FROM jira_data j JOIN products p ON p.name = j."Summary"\n'
+        'WHERE j."Status" = \'Open\'  -- Created\n'
+        'GROUP BY 1, 2'
+    )
+    result = validator.validate(query)
+    assert result["valid"], result["errors"]
+    assert result["fixes"] == []
+    assert result["sql"] == query
+
+
+def test_normalizes_code_fences_and_smart_quotes(validator):
+    """
+    Test that code fences and typographic quotes are removed before validation
+    """
+    result = validator.validate("```sql\nSELECT “Key” FROM jira_data WHERE \"Status\" = ‘Open’\n```")
+    assert result["valid"]
+    assert result["sql"] == "SELECT \"Key\" FROM jira_data WHERE \"Status\" = 'Open'"
+    assert "normalized quotes and code fences" in result["fixes"]
@@ -1,7 +1,8 @@
 import sys
 import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-from connectors.db_connector import PostgresConnector
+from connectors.db_connector import PostgresConnector, AsyncPostgresConnector
+from utils.sql_validator import get_sql_validator
 from pydantic import BaseModel, Field
 from typing import Dict, Union, Any
 from langchain.agents import tool
@@ -37,6 +38,29 @@ class PostGresAgentTools:
 
             return query
 
+    @tool(args_schema=GenerateSQLQuery)
+    async def agenerate_query(user_input: str, system_prompt: str, llm: Any) -> Dict[str, Any]:
+            """
+            Async counterpart of generate_query, generating the SQL query based on the user input.
+            :param user_input: The user_input.
+            :param system_prompt: The system prompt to use for generating the SQL query.
+            :param llm: The LLM to use for generating the SQL query.
+            :return: A dictionary containing the SQL query.
+            """
+
+            user_input = HumanMessage(
+                content=user_input
+            )
+            messages = [
+                system_prompt,
+                user_input,
+            ]
+
+            response = await llm.ainvoke(messages)
+            query = response.content
+
+            return query
+
 
     class QueryInput(BaseModel):
         query: str = Field(description="The SQL query for postgres to run.")
@@ -55,7 +79,7 @@ class PostGresAgentTools:
         try:
             # Generate the SQL query using the LLM
             pg_connector = PostgresConnector()
-            response = pg_connector.run_query(query=query, params=params)
+            response = pg_connector.run_guarded_query(query=query, params=params)
 
         except Exception as e:
             response = {
@@ -64,6 +88,29 @@ class PostGresAgentTools:
             }
         
         return response
+
+    @tool(args_schema=QueryInput)
+    async def arun_query(query: str, params=None):
+        """
+        Async counterpart of run_query, running the sql query on the postgres database without blocking the event loop.
+        :query: the sql query to run.
+        :params: the parameters for the query.
+        :return: The output of the SQL query.
+        """
+        try:
+            pg_connector = await AsyncPostgresConnector.connect()
+            try:
+                response = await pg_connector.run_guarded_query(query=query, params=params)
+            finally:
+                await pg_connector.close_connection()
+
+        except Exception as e:
+            response = {
+                "status": "error",
+                "error": str(e)
+            }
+
+        return response
     
     class GetTableSchemas(BaseModel):
         table_name: str = Field(description="The name of the table to get the schema for.")
@@ -87,14 +134,12 @@ class PostGresAgentTools:
     @tool(args_schema=validate_sql_query)
     def validate_sql_query(query: str, params=None) -> Dict[str, Any]:
         """
-        Validate the SQL query.
+        Validate the SQL query offline against the cached schema, fixing identifier quoting where it can.
         :param query: The SQL query to validate.
         :param params: The parameters for the query to configure it/optimise it.
         :return: A dictionary containing the validation result.
         """
-        pg_connector = PostgresConnector()
-        response = pg_connector.validate_with_pglast_Latest(query=query, params=params)
-        return response
+        return get_sql_validator().validate(query)
     
     class validate_sql_query(BaseModel):
         query: str = Field(description="The SQL query to validate.")
@@ -102,11 +147,9 @@ class PostGresAgentTools:
     @tool(args_schema=validate_sql_query)
     def validate_sql_query(query: str, params=None) -> Dict[str, Any]:
         """
-        Validate the SQL query.
+        Validate the SQL query offline against the cached schema, fixing identifier quoting where it can.
         :param query: The SQL query to validate.
         :param params: The parameters for the query to configure it/optimise it.
         :return: A dictionary containing the validation result.
         """
-        pg_connector = PostgresConnector()
-        response = pg_connector.validate_with_pglast_Latest(query=query, params=params)
-        return response
\ No newline at end of file
+        return get_sql_validator().validate(query)
\ No newline at end of file
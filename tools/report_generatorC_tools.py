@@ -52,6 +52,9 @@ class MatplotlibChartGenerator:
         # Limit to top 30 categories for readability
         if agg_col and len(df) > 30:
             df = df.sort_values(by=agg_col, ascending=False).head(30)
+        # categoricals keep every category of the full result, which would be plotted as empty bars and slices.
+        for col in df.columns[df.dtypes == "category"]:
+            df = df.assign(**{col: df[col].cat.remove_unused_categories()})
 
         plt.figure(figsize=(20, 10), constrained_layout=True)
 
@@ -262,10 +265,8 @@ class DataFetcher:
         self.connector = connector
 
     def fetch_data(self, query):
-        data = self.connector.query_data(query=query)
-        cols = data[0]
-        rows = data[1:]
-        df = pd.DataFrame(rows, columns=cols)
+        # columnar fetch: typed columns, low-cardinality text as categoricals.
+        df = self.connector.query_frame(query=query)
         self.connector.close_connection()
         return df
 
@@ -1,4 +1,4 @@
-from connectors.vector_db_connector import MilvusConnector
+from connectors.vector_db_connector import AsyncMilvusConnector, get_milvus_connector
 from pydantic import BaseModel, Field
 from langchain.agents import tool
 
@@ -17,6 +17,18 @@ class vectorDbAgentTools:
         :return: List of search results.
         """
 
-        vdb_connector = MilvusConnector()
+        vdb_connector = get_milvus_connector()
         response = vdb_connector.search_milvus(query_text=query, top_k=k)
         return response
+
+    @tool(args_schema=SearchInput)
+    async def asimilarity_search(query: str, k: int):
+        """
+        Async counterpart of similarity_search, performing the search on a vector db without blocking the event loop.
+        :query: the query to search in the vector db.
+        :return: List of search results.
+        """
+
+        vdb_connector = AsyncMilvusConnector.for_running_loop()
+        response = await vdb_connector.search_milvus(query_text=query, top_k=k)
+        return response
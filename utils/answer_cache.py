@@ -0,0 +1,306 @@
+"""
+Semantic answer cache that sits ahead of the supervisor graph.
+Answers are keyed by the normalized user query, with an optional embedding-similarity lookup for paraphrases,
+and are tagged with the data versions they were produced from so they are dropped once the data changes.
+"""
+
+from typing import Any, Callable, Dict, List, Optional
+from config import Config
+from agents.base_agent import AgentState
+from utils.caching import LRUTTLCache, SQLiteCacheTier
+import unicodedata
+import threading
+import asyncio
+import hashlib
+import time
+import math
+import re
+import os
+
+
+def normalize_query(text: str) -> str:
+    """
+    Normalize a user query so trivially different phrasings share a cache key.
+    Lowercases, strips accents and punctuation and collapses whitespace.
+    """
+    text = unicodedata.normalize("NFKD", text or "")
+    text = "".join(ch for ch in text if not unicodedata.combining(ch)).lower()
+    text = re.sub(r"[^\w\s\.\-]", " ", text)
+    text = re.sub(r"(?<!\d)\.|\.(?!\d)", " ", text)  # keep version numbers like 6.1.4
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def cosine_similarity(a: List[float], b: List[float]) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+
+class DataVersions:
+    def __init__(self, milvus_version_path: str, watermark_poll_seconds: float = 60):
+        """
+        Tracks the versions of the data sources answers are built from.
+        :param milvus_version_path: a marker file holding the Milvus ingestion version, bumped by ingest.py.
+        :param watermark_poll_seconds: how long the Postgres data watermark is reused before it is queried again.
+        """
+        self.milvus_version_path = milvus_version_path
+        self.watermark_poll_seconds = watermark_poll_seconds
+        self._watermark = None
+        self._watermark_checked_at = 0.0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def bump_milvus_ingestion_version(path: str = Config.answer_cache_params["milvus_version_path"]) -> str:
+        """
+        Record a new Milvus ingestion version. Call after (re)loading documents into the collection.
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        version = str(time.time_ns())
+        with open(path, "w") as f:
+            f.write(version)
+        return version
+
+    def milvus_version(self) -> Optional[str]:
+        try:
+            with open(self.milvus_version_path, "r") as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def postgres_watermark(self) -> Optional[str]:
+        """
+        The latest "Updated" timestamp in jira_data, re-queried at most once per poll interval.
+        """
+        with self._lock:
+            if time.time() - self._watermark_checked_at < self.watermark_poll_seconds:
+                return self._watermark
+
+            from connectors.db_connector import PostgresConnector
+            try:
+                pg_connector = PostgresConnector()
+                response = pg_connector.run_query(
+                    query='SELECT MAX("Updated")::text AS watermark, COUNT(*) AS row_count FROM jira_data'
+                )
+                pg_connector.close_connection()
+                if response.get("status") == "ok" and response.get("data"):
+                    row = response["data"][0]
+                    self._watermark = f"{row['watermark']}|{row['row_count']}"
+            except Exception as e:
+                print(f"Could not read the Postgres data watermark: {e}")
+            self._watermark_checked_at = time.time()
+            return self._watermark
+
+    def for_route(self, route: str) -> Dict[str, Optional[str]]:
+        """
+        Return only the versions that matter for the route that produced an answer.
+        """
+        versions = {}
+        route = route or ""
+        if "vector_db" in route or "hybrid" in route:
+            versions["milvus"] = self.milvus_version()
+        if "postgres" in route or "report" in route or "hybrid" in route:
+            versions["postgres"] = self.postgres_watermark()
+        return versions
+
+
+class AnswerCache:
+    def __init__(self, params: Dict[str, Any] = None, embed_fn: Optional[Callable[[str], List[float]]] = None):
+        """
+        Answer cache with an in-memory LRU/TTL tier and a SQLite persistence tier.
+        :param params: the cache config, defaults to Config.answer_cache_params.
+        :param embed_fn: a function turning text into an embedding. Defaults to the slate embedding model when
+            use_embeddings is set; without it only exact normalized matches are served.
+        """
+        self.params = params or Config.answer_cache_params
+        self.similarity_threshold = self.params["similarity_threshold"]
+        self.ttl_seconds = self.params["ttl_seconds"]
+
+        self.memory = LRUTTLCache(max_entries=self.params["max_entries"], ttl_seconds=self.ttl_seconds)
+        self.store = SQLiteCacheTier(self.params["sqlite_path"], table="answers")
+        self.store.prune(self.params["max_persisted_entries"], self.ttl_seconds)
+        for key, created_at, entry in self.store.load_recent(self.params["max_entries"]):
+            self.memory.set(key, entry, created_at=created_at)
+
+        self.versions = DataVersions(
+            milvus_version_path=self.params["milvus_version_path"],
+            watermark_poll_seconds=self.params["watermark_poll_seconds"]
+        )
+
+        self._embed_fn = embed_fn
+        self._pending_embeddings = LRUTTLCache(max_entries=256, ttl_seconds=600)
+        self.semantic_hits = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def _key(normalized_query: str) -> str:
+        return hashlib.sha256(normalized_query.encode("utf-8")).hexdigest()
+
+    def _embed(self, text: str) -> Optional[List[float]]:
+        if not self.params["use_embeddings"]:
+            return None
+        try:
+            if self._embed_fn is None:
+                from milvus_utils import get_embedding_model
+                self._embed_fn = get_embedding_model().embed_query
+            return list(self._embed_fn(text))
+        except Exception as e:
+            print(f"Answer cache embedding failed, falling back to exact matches: {e}")
+            return None
+
+    def _is_current(self, entry: Dict[str, Any]) -> bool:
+        return entry.get("data_versions") == self.versions.for_route(entry.get("route"))
+
+    def _invalidate(self, key: str):
+        self.memory.pop(key)
+        self.store.delete(key)
+        self.invalidations += 1
+
+    def get(self, query: str) -> Optional[Dict[str, Any]]:
+        """
+        Look up an answer for a query, first by exact normalized match and then by embedding similarity.
+        :return: the cache entry with a 'match' field, or None.
+        """
+        normalized = normalize_query(query)
+        key = self._key(normalized)
+
+        entry = self.memory.get(key)
+        if entry is None:
+            persisted = self.store.get(key)
+            if persisted is not None:
+                created_at, entry = persisted
+                if self.ttl_seconds is not None and time.time() - created_at > self.ttl_seconds:
+                    self.store.delete(key)
+                    entry = None
+                else:
+                    self.memory.set(key, entry, created_at=created_at)
+
+        if entry is not None:
+            if self._is_current(entry):
+                return dict(entry, match="exact", similarity=1.0)
+            self._invalidate(key)
+
+        embedding = self._embed(normalized)
+        if embedding is None:
+            return None
+        self._pending_embeddings.set(key, embedding)
+
+        best_key, best_entry, best_score = None, None, 0.0
+        for candidate_key, candidate in self.memory.items():
+            if not candidate.get("embedding"):
+                continue
+            score = cosine_similarity(embedding, candidate["embedding"])
+            if score > best_score:
+                best_key, best_entry, best_score = candidate_key, candidate, score
+
+        if best_entry is None or best_score < self.similarity_threshold:
+            return None
+        if not self._is_current(best_entry):
+            self._invalidate(best_key)
+            return None
+
+        self.semantic_hits += 1
+        return dict(best_entry, match="semantic", similarity=round(best_score, 4))
+
+    def set(self, query: str, answer: str, route: str):
+        """
+        Store an answer together with the data versions of the route that produced it.
+        """
+        normalized = normalize_query(query)
+        key = self._key(normalized)
+        embedding = self._pending_embeddings.pop(key)
+        if embedding is None:
+            embedding = self._embed(normalized)
+
+        entry = {
+            "query": normalized,
+            "answer": answer,
+            "route": route,
+            "embedding": embedding,
+            "data_versions": self.versions.for_route(route),
+        }
+        self.memory.set(key, entry)
+        self.store.set(key, entry)
+
+    def lookup(self, state: AgentState):
+        """
+        Graph node: serve the final response from the cache when possible.
+        :param state: The state of the agent containing the user input and states to be updated.
+        :return: updated state for the agent.
+        """
+        entry = self.get(state['user_input'])
+        state['answer_cache_hit'] = entry is not None
+
+        if entry is not None:
+            state['supervisor_decision'] = entry["route"]
+            state['final_response'] = entry["answer"]
+            state['memory_chain'].append({
+                'answer_cache': {
+                    'match': entry["match"],
+                    'similarity': entry["similarity"],
+                    'cached_query': entry["query"],
+                }
+            })
+        return state
+
+    async def alookup(self, state: AgentState):
+        """
+        Async counterpart of lookup. The lookup reads SQLite, may embed the query and polls the postgres watermark,
+        so it runs in a worker thread to keep the event loop free.
+        """
+        return await asyncio.to_thread(self.lookup, state)
+
+    @staticmethod
+    def router(state: AgentState):
+        """Route to the end of the graph on a cache hit, otherwise on to the supervisor."""
+        return "cache_hit" if state.get('answer_cache_hit') else "cache_miss"
+
+    def save(self, state: AgentState):
+        """
+        Graph node: store the final response of a completed run.
+        Unknown routes, generated reports (which live on disk) and failed tool calls are not cached.
+        :param state: The state of the agent containing the final response.
+        :return: updated state for the agent.
+        """
+        route = state.get('supervisor_decision') or ""
+        response = state.get('final_response')
+        pg_response = state.get('postgres_agent_response')
+        failed = isinstance(pg_response, dict) and pg_response.get("status") == "error"
+
+        if response and not failed and "unknown" not in route and "report" not in route:
+            try:
+                self.set(state['user_input'], response, route)
+            except Exception as e:
+                print(f"Could not store answer in cache: {e}")
+        return state
+
+    async def asave(self, state: AgentState):
+        """
+        Async counterpart of save, in a worker thread for the same reasons as alookup.
+        """
+        return await asyncio.to_thread(self.save, state)
+
+    def stats(self) -> Dict[str, Any]:
+        stats = self.memory.stats()
+        stats.update({
+            "persisted_entries": len(self.store),
+            "semantic_hits": self.semantic_hits,
+            "invalidations": self.invalidations,
+        })
+        return stats
+
+
+_ANSWER_CACHE = None
+_ANSWER_CACHE_LOCK = threading.Lock()
+
+
+def get_answer_cache() -> AnswerCache:
+    """
+    Return the process-wide answer cache, so every compiled graph (and Streamlit session) shares one cache.
+    """
+    global _ANSWER_CACHE
+    with _ANSWER_CACHE_LOCK:
+        if _ANSWER_CACHE is None:
+            _ANSWER_CACHE = AnswerCache()
+        return _ANSWER_CACHE
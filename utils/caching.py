@@ -0,0 +1,170 @@
+"""
+Shared cache building blocks: an in-memory LRU/TTL tier and a SQLite persistence tier.
+The answer, SQL and result caches are built on top of these.
+"""
+
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+import threading
+import sqlite3
+import json
+import time
+import os
+
+
+class LRUTTLCache:
+    def __init__(self, max_entries: int = 1000, ttl_seconds: Optional[float] = None):
+        """
+        A thread-safe, size-bounded LRU cache with optional time-to-live.
+        :param max_entries: the maximum number of entries held before the least recently used one is evicted.
+        :param ttl_seconds: the age after which an entry is treated as expired. None disables expiry.
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._data: "OrderedDict[Any, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def _expired(self, created_at: float) -> bool:
+        return self.ttl_seconds is not None and (time.time() - created_at) > self.ttl_seconds
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return default
+            created_at, value = item
+            if self._expired(created_at):
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, created_at: Optional[float] = None):
+        with self._lock:
+            self._data[key] = (created_at or time.time(), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def pop(self, key, default=None):
+        with self._lock:
+            item = self._data.pop(key, None)
+            return default if item is None else item[1]
+
+    def items(self) -> List[Tuple[Any, Any]]:
+        """
+        Return a snapshot of the live (non-expired) entries without touching their recency.
+        """
+        with self._lock:
+            return [(k, v) for k, (created_at, v) in self._data.items() if not self._expired(created_at)]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._data),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+class SQLiteCacheTier:
+    def __init__(self, path: str, table: str):
+        """
+        A small key/value persistence tier backed by a local SQLite file, so cache entries survive restarts.
+        Values are stored as JSON.
+        :param path: the SQLite file path. Parent directories are created if missing.
+        :param table: the table to keep the entries in.
+        """
+        self.path = path
+        self.table = table
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {table} ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL, last_access REAL NOT NULL)"
+            )
+            self._conn.commit()
+
+    def get(self, key: str) -> Optional[Tuple[float, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT created_at, value FROM {self.table} WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute(f"UPDATE {self.table} SET last_access = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+        return row[0], json.loads(row[1])
+
+    def set(self, key: str, value: Any, created_at: Optional[float] = None):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, created_at, last_access) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value, default=str), created_at or now, now)
+            )
+            self._conn.commit()
+
+    def delete(self, key: str):
+        with self._lock:
+            self._conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+            self._conn.commit()
+
+    def load_recent(self, limit: int) -> List[Tuple[str, float, Any]]:
+        """
+        Return the most recently used entries, oldest first, for warming an in-memory tier.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT key, created_at, value FROM {self.table} ORDER BY last_access DESC LIMIT ?", (limit,)
+            ).fetchall()
+        return [(key, created_at, json.loads(value)) for key, created_at, value in reversed(rows)]
+
+    def prune(self, max_entries: int, ttl_seconds: Optional[float] = None):
+        """
+        Drop expired entries and keep at most max_entries of the most recently used ones.
+        """
+        with self._lock:
+            if ttl_seconds is not None:
+                self._conn.execute(f"DELETE FROM {self.table} WHERE created_at < ?", (time.time() - ttl_seconds,))
+            self._conn.execute(
+                f"DELETE FROM {self.table} WHERE key NOT IN "
+                f"(SELECT key FROM {self.table} ORDER BY last_access DESC LIMIT ?)",
+                (max_entries,)
+            )
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute(f"DELETE FROM {self.table}")
+            self._conn.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
@@ -0,0 +1,127 @@
+"""
+Columnar transport of query results into pandas.
+The result is streamed with COPY (query) TO STDOUT as CSV and parsed column-wise by pyarrow's CSV reader (or pandas'
+C parser when pyarrow is not installed), typed from the postgres column types, so no per-row Python tuples are built.
+Low-cardinality text columns (Status, Issue Type, ...) are dictionary encoded into pandas categoricals.
+"""
+
+from typing import Any, Dict, List
+from config import Config
+from utils.query_guard import strip_statement
+import io
+
+
+# COPY's CSV: NULL as \N keeps NULLs apart from empty strings (which are quoted).
+COPY_OPTIONS = "FORMAT csv, NULL '\\N'"
+NULL_TOKEN = "\\N"
+
+# postgres type oids -> column kinds.
+TYPE_KINDS = {
+    16: "bool",
+    20: "int", 21: "int", 23: "int", 26: "int",
+    700: "float", 701: "float", 1700: "float",
+    1082: "date",
+    1114: "timestamp",
+    1184: "timestamptz",
+}
+
+
+def copy_statement(query: str) -> str:
+    return f"COPY (\n{strip_statement(query)}\n) TO STDOUT WITH ({COPY_OPTIONS})"
+
+
+def column_kinds(description) -> List[str]:
+    """
+    The kind ("int", "float", "bool", "date", "timestamp", "timestamptz" or "text") of every result column.
+    """
+    return [TYPE_KINDS.get(column.type_code, "text") for column in description]
+
+
+def categorize_frame(df, params: Dict[str, Any] = None):
+    """
+    Convert low-cardinality text columns to categoricals in place.
+    :param params: the frame config, defaults to Config.postgres_frame_params.
+    """
+    import pandas as pd
+
+    params = params or Config.postgres_frame_params
+    for column in df.columns:
+        if not (df[column].dtype == object or pd.api.types.is_string_dtype(df[column].dtype)):
+            continue
+        unique = df[column].nunique(dropna=True)
+        if unique <= params["categorical_max_unique"] and unique <= params["categorical_max_ratio"] * len(df):
+            df[column] = df[column].astype("category")
+    return df
+
+
+def _arrow_frame(data: bytes, columns: List[str], kinds: List[str], params: Dict[str, Any]):
+    import pandas as pd
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.csv as pacsv
+
+    arrow_types = {"bool": pa.bool_(), "int": pa.int64(), "float": pa.float64(), "date": pa.date32(),
+                   "timestamp": pa.timestamp("us")}
+    table = pacsv.read_csv(
+        pa.BufferReader(data),
+        read_options=pacsv.ReadOptions(column_names=columns, use_threads=True),
+        parse_options=pacsv.ParseOptions(newlines_in_values=True),
+        convert_options=pacsv.ConvertOptions(
+            column_types={c: arrow_types.get(k, pa.string()) for c, k in zip(columns, kinds)},
+            null_values=[NULL_TOKEN], strings_can_be_null=True, quoted_strings_can_be_null=False,
+            true_values=["t"], false_values=["f"],
+        ),
+    )
+    for i, (column, kind) in enumerate(zip(columns, kinds)):
+        if kind != "text":
+            continue
+        values = table.column(i)
+        unique = pc.count_distinct(values).as_py()
+        if unique <= params["categorical_max_unique"] and unique <= params["categorical_max_ratio"] * len(values):
+            table = table.set_column(i, column, pc.dictionary_encode(values))
+    # nullable integers and booleans, like the pandas engine (rather than float64 and object when there are NULLs).
+    return table.to_pandas(types_mapper={pa.int64(): pd.Int64Dtype(), pa.bool_(): pd.BooleanDtype()}.get)
+
+
+def _pandas_frame(data: bytes, columns: List[str], kinds: List[str], params: Dict[str, Any]):
+    import pandas as pd
+
+    dtypes = {"bool": "boolean", "int": "Int64", "float": "float64", "text": object, "timestamptz": object}
+    df = pd.read_csv(
+        io.BytesIO(data), header=None, names=columns, na_values=[NULL_TOKEN], keep_default_na=False,
+        true_values=["t"], false_values=["f"],
+        dtype={c: dtypes[k] for c, k in zip(columns, kinds) if k in dtypes},
+        parse_dates=[c for c, k in zip(columns, kinds) if k in ("date", "timestamp")],
+    )
+    return categorize_frame(df, params)
+
+
+def read_frame(data: bytes, columns: List[str], kinds: List[str], params: Dict[str, Any] = None):
+    """
+    Build a DataFrame from COPY CSV output.
+    :param data: the COPY output.
+    :param columns: the result column names.
+    :param kinds: their column_kinds.
+    :param params: the frame config, defaults to Config.postgres_frame_params.
+    """
+    import pandas as pd
+
+    params = params or Config.postgres_frame_params
+    if not data:
+        return pd.DataFrame(columns=columns)
+    engine = params["engine"]
+    if engine in ("auto", "pyarrow"):
+        try:
+            df = _arrow_frame(data, columns, kinds, params)
+        except ImportError:
+            if engine == "pyarrow":
+                raise
+            df = _pandas_frame(data, columns, kinds, params)
+    else:
+        df = _pandas_frame(data, columns, kinds, params)
+
+    for column, kind in zip(columns, kinds):
+        if kind == "timestamptz":
+            df[column] = pd.to_datetime(df[column], utc=True)
+    return df
+
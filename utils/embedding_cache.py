@@ -0,0 +1,408 @@
+"""
+Two-tier embedding cache shared by everything that embeds text (vector search, ingestion, the semantic caches).
+Embeddings are keyed by the model id and the normalized text. The memory tier is an LRU; the disk tier keeps the
+vectors in a memory-mapped float32 array per model, one row per slot, with a SQLite index from key to slot, so a
+restart or another process finds them without a call to the embedding service.
+"""
+
+from typing import Any, Dict, List, Optional, Tuple
+from langchain_core.embeddings import Embeddings
+from config import Config
+from utils.caching import LRUTTLCache
+import numpy as np
+import unicodedata
+import threading
+import asyncio
+import hashlib
+import sqlite3
+import time
+import os
+import re
+
+
+EMBEDDING_MODEL_ID = "ibm/slate-125m-english-rtrvr"
+# disk tier reads are written back to last_access at most this often (or once this many are pending).
+ACCESS_FLUSH_SECONDS = 30
+ACCESS_FLUSH_ENTRIES = 1024
+# keys per SQLite IN (...) lookup.
+SQLITE_BATCH = 500
+
+
+def normalize_embedding_text(text: str) -> str:
+    """
+    Unicode (NFKC) and whitespace normalization; case and punctuation are kept, as the models see them.
+    """
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFKC", text or "")).strip()
+
+
+def embedding_key(model_id: str, text: str) -> str:
+    return hashlib.sha256(f"{model_id}\0{normalize_embedding_text(text)}".encode("utf-8")).hexdigest()
+
+
+class MemmapEmbeddingTier:
+    def __init__(self, directory: str, model_id: str, max_entries: int):
+        """
+        Disk tier for one model: a (max_entries, dimension) float32 memmap and a SQLite key -> slot index.
+        When full, the least recently used slot is reused. Each slot also records the digest of its key in a
+        (max_entries, 32) memmap, which readers check around the vector read, so a slot that another process reused
+        (or a tier another process reset) reads as a miss rather than another key's vector.
+        :param directory: where the <model>.f32, <model>.keys and <model>.sqlite3 files are kept.
+        :param model_id: the embedding model id.
+        :param max_entries: the number of slots.
+        """
+        os.makedirs(directory, exist_ok=True)
+        name = re.sub(r"[^A-Za-z0-9_.-]+", "_", model_id)
+        self.array_path = os.path.join(directory, f"{name}.f32")
+        self.keys_path = os.path.join(directory, f"{name}.keys")
+        self.max_entries = max_entries
+        self.dimension: Optional[int] = None
+        self._array = None
+        self._keys = None
+        self._accessed: Dict[str, float] = {}
+        self._accesses_flushed_at = time.time()
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(os.path.join(directory, f"{name}.sqlite3"), check_same_thread=False)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                "key TEXT PRIMARY KEY, slot INTEGER NOT NULL UNIQUE, last_access REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS embeddings_last_access ON embeddings (last_access)")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+            self._conn.commit()
+            row = self._conn.execute("SELECT value FROM meta WHERE name = 'dimension'").fetchone()
+            slots = self._conn.execute("SELECT value FROM meta WHERE name = 'max_entries'").fetchone()
+            if (row and slots and slots[0] == max_entries
+                    and os.path.exists(self.array_path) and os.path.exists(self.keys_path)):
+                self._open(row[0])
+            else:
+                # a new or resized tier starts empty; a process still mapping the old files keeps its (unlinked)
+                # copies, and its slots fail the key check here.
+                self._conn.execute("DELETE FROM embeddings")
+                self._conn.commit()
+                for path in (self.array_path, self.keys_path):
+                    if os.path.exists(path):
+                        os.remove(path)
+
+    def _open(self, dimension: int):
+        mode = "r+" if os.path.exists(self.array_path) and os.path.exists(self.keys_path) else "w+"
+        self._array = np.memmap(self.array_path, dtype=np.float32, mode=mode, shape=(self.max_entries, dimension))
+        self._keys = np.memmap(self.keys_path, dtype=np.uint8, mode=mode, shape=(self.max_entries, 32))
+        self.dimension = dimension
+
+    @staticmethod
+    def _digest(key: str) -> np.ndarray:
+        return np.frombuffer(bytes.fromhex(key), dtype=np.uint8)
+
+    def _ready(self) -> bool:
+        if self._array is None:
+            # another process may have created the files since.
+            row = self._conn.execute("SELECT value FROM meta WHERE name = 'dimension'").fetchone()
+            slots = self._conn.execute("SELECT value FROM meta WHERE name = 'max_entries'").fetchone()
+            if not (row and slots and slots[0] == self.max_entries
+                    and os.path.exists(self.array_path) and os.path.exists(self.keys_path)):
+                return False
+            self._open(row[0])
+        return True
+
+    def _flush_accesses(self, force: bool = False):
+        # last_access only orders evictions, so reads record it in memory and write it in batches.
+        if not self._accessed or not (force or len(self._accessed) >= ACCESS_FLUSH_ENTRIES
+                                      or time.time() - self._accesses_flushed_at >= ACCESS_FLUSH_SECONDS):
+            return
+        self._conn.executemany("UPDATE embeddings SET last_access = ? WHERE key = ?",
+                               [(at, key) for key, at in self._accessed.items()])
+        self._conn.commit()
+        self._accessed.clear()
+        self._accesses_flushed_at = time.time()
+
+    def get_many(self, keys: List[str]) -> List[Optional[np.ndarray]]:
+        """
+        The vectors of the given keys (None for the ones not stored), with one index lookup per batch.
+        """
+        with self._lock:
+            if not keys or not self._ready():
+                return [None] * len(keys)
+            slots: Dict[str, int] = {}
+            unique = list(dict.fromkeys(keys))
+            for i in range(0, len(unique), SQLITE_BATCH):
+                chunk = unique[i:i + SQLITE_BATCH]
+                slots.update(self._conn.execute(
+                    f"SELECT key, slot FROM embeddings WHERE key IN ({', '.join('?' * len(chunk))})", chunk
+                ).fetchall())
+
+            found: Dict[str, np.ndarray] = {}
+            now = time.time()
+            for key, slot in slots.items():
+                if not 0 <= slot < self.max_entries:
+                    continue
+                # writers clear the slot's key before overwriting the vector and write the new key after it, so the
+                # key matching before and after the read means the vector was not rewritten in between.
+                digest = self._digest(key)
+                if not np.array_equal(self._keys[slot], digest):
+                    continue
+                vector = np.array(self._array[slot])
+                if np.array_equal(self._keys[slot], digest):
+                    found[key] = vector
+                    self._accessed[key] = now
+            self._flush_accesses()
+            return [found.get(key) for key in keys]
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        return self.get_many([key])[0]
+
+    def set_many(self, items: List[Tuple[str, np.ndarray]]):
+        """
+        Store vectors in one write transaction and one flush of the memmap.
+        """
+        items = list(dict(items).items())[-self.max_entries:]
+        if not items:
+            return
+        with self._lock:
+            if self._array is None and not self._ready():
+                dimension = len(items[0][1])
+                self._open(dimension)
+                self._conn.executemany("INSERT OR REPLACE INTO meta (name, value) VALUES (?, ?)",
+                                       [("dimension", dimension), ("max_entries", self.max_entries)])
+                self._conn.commit()
+            items = [(key, vector) for key, vector in items if len(vector) == self.dimension]
+            if not items:
+                return
+            self._flush_accesses(force=True)
+            # the slot allocation is serialized across processes by the write transaction.
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                keys = [key for key, _ in items]
+                slots: Dict[str, int] = {}
+                for i in range(0, len(keys), SQLITE_BATCH):
+                    chunk = keys[i:i + SQLITE_BATCH]
+                    slots.update(self._conn.execute(
+                        f"SELECT key, slot FROM embeddings WHERE key IN ({', '.join('?' * len(chunk))})", chunk
+                    ).fetchall())
+                new = [key for key in keys if key not in slots]
+                if new:
+                    count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+                    free = list(range(count, min(count + len(new), self.max_entries)))
+                    evicted = []
+                    if len(free) < len(new):
+                        # the least recently used slots, other than the ones of this batch.
+                        batch = set(slots.values())
+                        evicted = [slot for (slot,) in self._conn.execute(
+                            "SELECT slot FROM embeddings ORDER BY last_access LIMIT ?", (len(new) - len(free) + len(batch),)
+                        ) if slot not in batch][:len(new) - len(free)]
+                        self._conn.executemany("DELETE FROM embeddings WHERE slot = ?", [(slot,) for slot in evicted])
+                    slots.update(zip(new, free + evicted))
+
+                # the cleared keys reach the disk before the vectors and the vectors before the new keys, so a crash
+                # mid-batch leaves slots that read as misses; the flushes are per batch, not per vector.
+                targets = [slots[key] for key in keys]
+                self._keys[targets] = 0
+                self._keys.flush()
+                self._array[targets] = np.stack([vector for _, vector in items])
+                self._array.flush()
+                self._keys[targets] = np.stack([self._digest(key) for key in keys])
+                self._keys.flush()
+                now = time.time()
+                self._conn.executemany("INSERT OR REPLACE INTO embeddings (key, slot, last_access) VALUES (?, ?, ?)",
+                                       [(key, slots[key], now) for key in keys])
+                self._conn.commit()
+            except Exception:
+                self._conn.rollback()
+                raise
+
+    def set(self, key: str, vector: np.ndarray):
+        self.set_many([(key, vector)])
+
+    def __len__(self):
+        with self._lock:
+            self._flush_accesses(force=True)
+            return self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+
+class EmbeddingCache:
+    def __init__(self, params: Dict[str, Any] = None):
+        """
+        In-memory LRU tier over per-model memmap disk tiers.
+        :param params: the cache config, defaults to Config.embedding_cache_params.
+        """
+        self.params = params or Config.embedding_cache_params
+        self.memory = LRUTTLCache(max_entries=self.params["memory_max_entries"])
+        self._tiers: Dict[str, MemmapEmbeddingTier] = {}
+        self._lock = threading.Lock()
+        self.disk_hits = 0
+        self.misses = 0
+        self.disk_errors = 0
+
+    def _tier(self, model_id: str) -> Optional[MemmapEmbeddingTier]:
+        if not self.params["directory"]:
+            return None
+        with self._lock:
+            tier = self._tiers.get(model_id)
+            if tier is None:
+                tier = MemmapEmbeddingTier(self.params["directory"], model_id, self.params["disk_max_entries"])
+                self._tiers[model_id] = tier
+            return tier
+
+    def get_many(self, model_id: str, texts: List[str]) -> List[Optional[List[float]]]:
+        """
+        The cached embeddings of the given texts (None for the ones not cached), reading the memory misses from the
+        disk tier in one batch.
+        """
+        keys = [embedding_key(model_id, text) for text in texts]
+        arrays = [self.memory.get(key) for key in keys]
+        pending = [i for i, array in enumerate(arrays) if array is None]
+        if pending:
+            found = [None] * len(pending)
+            try:
+                tier = self._tier(model_id)
+                if tier is not None:
+                    found = tier.get_many([keys[i] for i in pending])
+            except Exception as e:
+                self.disk_errors += 1
+                print(f"Embedding cache disk tier failed: {e}")
+            for i, array in zip(pending, found):
+                if array is None:
+                    self.misses += 1
+                    continue
+                self.disk_hits += 1
+                self.memory.set(keys[i], array)
+                arrays[i] = array
+        return [array.tolist() if array is not None else None for array in arrays]
+
+    def get(self, model_id: str, text: str) -> Optional[List[float]]:
+        return self.get_many(model_id, [text])[0]
+
+    def set_many(self, model_id: str, texts: List[str], vectors: List[List[float]]) -> List[List[float]]:
+        """
+        Store embeddings, writing them to the disk tier in one transaction.
+        :return: the stored (float32) vectors, so hits and misses return the same values.
+        """
+        items = [(embedding_key(model_id, text), np.asarray(vector, dtype=np.float32))
+                 for text, vector in zip(texts, vectors)]
+        for key, array in items:
+            self.memory.set(key, array)
+        try:
+            tier = self._tier(model_id)
+            if tier is not None:
+                tier.set_many(items)
+        except Exception as e:
+            self.disk_errors += 1
+            print(f"Embedding cache disk tier failed: {e}")
+        return [array.tolist() for _, array in items]
+
+    def set(self, model_id: str, text: str, vector: List[float]) -> List[float]:
+        return self.set_many(model_id, [text], [vector])[0]
+
+    def stats(self) -> Dict[str, Any]:
+        stats = self.memory.stats()
+        # a memory miss that the disk tier answered is a hit of the cache as a whole.
+        stats.update({
+            "memory_hits": stats["hits"],
+            "disk_hits": self.disk_hits,
+            "hits": stats["hits"] + self.disk_hits,
+            "misses": self.misses,
+            "disk_errors": self.disk_errors,
+            "disk_entries": {model_id: len(tier) for model_id, tier in self._tiers.items()},
+        })
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+        return stats
+
+
+class CachedEmbeddings(Embeddings):
+    def __init__(self, embeddings: Embeddings, model_id: str, cache: EmbeddingCache = None):
+        """
+        Embeddings wrapper answering repeated texts from the shared embedding cache.
+        :param embeddings: the underlying embeddings.
+        :param model_id: the id the cached vectors are keyed by.
+        :param cache: the cache, defaults to the process-wide one.
+        """
+        self.embeddings = embeddings
+        self.model_id = model_id
+        self.cache = cache or get_embedding_cache()
+
+    def embed_query(self, text: str) -> List[float]:
+        vector = self.cache.get(self.model_id, text)
+        if vector is None:
+            vector = self.cache.set(self.model_id, text, self.embeddings.embed_query(text))
+        return vector
+
+    def _missing(self, texts: List[str], vectors: List[Optional[List[float]]]) -> Dict[str, List[int]]:
+        # the positions of every text still to embed, by key, so repeats within a batch are embedded once.
+        missing: Dict[str, List[int]] = {}
+        for i, vector in enumerate(vectors):
+            if vector is None:
+                missing.setdefault(embedding_key(self.model_id, texts[i]), []).append(i)
+        return missing
+
+    def _fill(self, vectors: List[Optional[List[float]]], missing: Dict[str, List[int]], stored: List[List[float]]):
+        for positions, vector in zip(missing.values(), stored):
+            for i in positions:
+                vectors[i] = vector
+        return vectors
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        vectors = self.cache.get_many(self.model_id, texts)
+        missing = self._missing(texts, vectors)
+        if missing:
+            unique = [texts[positions[0]] for positions in missing.values()]
+            stored = self.cache.set_many(self.model_id, unique, self.embeddings.embed_documents(unique))
+            self._fill(vectors, missing, stored)
+        return vectors
+
+    async def aembed_query(self, text: str) -> List[float]:
+        # the disk tier is a blocking SQLite/memmap read.
+        vector = await asyncio.to_thread(self.cache.get, self.model_id, text)
+        if vector is None:
+            embedded = await self.embeddings.aembed_query(text)
+            vector = await asyncio.to_thread(self.cache.set, self.model_id, text, embedded)
+        return vector
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        vectors = await asyncio.to_thread(self.cache.get_many, self.model_id, texts)
+        missing = self._missing(texts, vectors)
+        if missing:
+            unique = [texts[positions[0]] for positions in missing.values()]
+            embedded = await self.embeddings.aembed_documents(unique)
+            stored = await asyncio.to_thread(self.cache.set_many, self.model_id, unique, embedded)
+            self._fill(vectors, missing, stored)
+        return vectors
+
+
+def get_embedding_model(model_id: str = EMBEDDING_MODEL_ID) -> Embeddings:
+    """
+    Return the embedding model behind the shared embedding cache: watsonx, or the offline HashingEmbeddings when the
+    "fake" embedding backend is selected (Config.offline_backend_params or EMBEDDING_BACKEND=fake).
+    """
+    from utils.offline_models import FAKE_BACKEND, embedding_backend, get_hashing_embeddings
+    if embedding_backend() == FAKE_BACKEND:
+        model = get_hashing_embeddings()
+        model_id = f"offline/hashing-{model.dimension}"
+    else:
+        from langchain_ibm.embeddings import WatsonxEmbeddings
+        model = WatsonxEmbeddings(
+            model_id=model_id,
+            url=os.environ['WATSONX_URL'],
+            project_id=os.environ["WATSONX_PROJECT_ID"],
+            apikey=os.environ['WATSONX_APIKEY']
+        )
+    if not Config.embedding_cache_params["enabled"]:
+        return model
+    return CachedEmbeddings(model, model_id)
+
+
+_EMBEDDING_CACHE = None
+_EMBEDDING_CACHE_LOCK = threading.Lock()
+
+
+def get_embedding_cache() -> EmbeddingCache:
+    """
+    Return the process-wide embedding cache.
+    """
+    global _EMBEDDING_CACHE
+    with _EMBEDDING_CACHE_LOCK:
+        if _EMBEDDING_CACHE is None:
+            _EMBEDDING_CACHE = EmbeddingCache()
+        return _EMBEDDING_CACHE
@@ -1,24 +1,164 @@
 from config import Config
-from typing import Dict
+from typing import Dict, Any, Tuple
 from langchain_ibm import ChatWatsonx
+from ibm_watsonx_ai import APIClient, Credentials
+from utils.instrumentation import LLM_USAGE_CALLBACK
+from utils.offline_models import FAKE_BACKEND, get_fake_llm, llm_backend
+import threading
+import base64
+import json
+import time
 import os
 
+
+class LLMRegistry:
+    """
+    Process-wide registry of chat model clients.
+    Models are memoized by (model_id, params) and every model pointing at the same watsonx endpoint shares
+    a single APIClient, so the IAM token exchange/refresh and the keep-alive HTTP session happen once per endpoint
+    instead of once per agent.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._models: Dict[Tuple, ChatWatsonx] = {}
+        self._clients: Dict[Tuple, APIClient] = {}
+        self._endpoint_stats: Dict[Tuple, Dict[str, Any]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _endpoint_key() -> Tuple[str, str, str]:
+        return (
+            os.environ["WATSONX_URL"],
+            os.environ["WATSONX_PROJECT_ID"],
+            os.environ["WATSONX_APIKEY"],
+        )
+
+    @staticmethod
+    def _model_key(model_id: str, model_params: Dict[str, Any], endpoint: Tuple) -> Tuple:
+        # params are plain dicts in Config, so a sorted json dump is a stable hashable key.
+        return (model_id, json.dumps(model_params, sort_keys=True, default=str), endpoint)
+
+    def _get_client(self, endpoint: Tuple) -> APIClient:
+        """
+        Return the shared APIClient for an endpoint, creating it (and its IAM token) on first use.
+        Must be called with the registry lock held.
+        """
+        client = self._clients.get(endpoint)
+        if client is None:
+            url, project_id, apikey = endpoint
+            start = time.perf_counter()
+            client = APIClient(
+                credentials=Credentials(url=url, api_key=apikey),
+                project_id=project_id
+            )
+            self._clients[endpoint] = client
+            self._endpoint_stats[endpoint] = {
+                "url": url,
+                "created_at": time.time(),
+                "client_setup_seconds": round(time.perf_counter() - start, 4),
+                "models": [],
+            }
+        return client
+
+    def get(self, config: Dict) -> ChatWatsonx:
+        """
+        Return a (possibly shared) chat model for the given agent config.
+        :param config: the agent config dict holding 'model_id' and 'model_parameters'.
+        :return: the ChatWatsonx instance.
+        """
+        model_id = config['model_id']
+        model_params = config['model_parameters']
+        offline = llm_backend() == FAKE_BACKEND
+        endpoint = (FAKE_BACKEND,) if offline else self._endpoint_key()
+        key = self._model_key(model_id, model_params, endpoint)
+
+        with self._lock:
+            llm = self._models.get(key)
+            if llm is not None:
+                self.hits += 1
+                return llm
+
+            self.misses += 1
+            if offline:
+                llm = get_fake_llm(config)
+                llm.callbacks = [LLM_USAGE_CALLBACK]
+                self._models[key] = llm
+                return llm
+
+            client = self._get_client(endpoint)
+            llm = ChatWatsonx(
+                model_id=model_id,
+                watsonx_client=client,
+                params=model_params,
+                callbacks=[LLM_USAGE_CALLBACK]
+            )
+            self._models[key] = llm
+            self._endpoint_stats[endpoint]["models"].append(model_id)
+            return llm
+
+    @staticmethod
+    def _token_stats(client: APIClient) -> Dict[str, Any]:
+        """
+        Decode the expiry of the client's current IAM bearer token (without verifying it).
+        """
+        token = getattr(client, "token", None)
+        if not token or not isinstance(token, str) or token.count(".") != 2:
+            return {"token_present": False}
+        try:
+            payload = token.split(".")[1]
+            payload += "=" * (-len(payload) % 4)
+            claims = json.loads(base64.urlsafe_b64decode(payload))
+            expires_at = claims.get("exp")
+            return {
+                "token_present": True,
+                "token_expires_at": expires_at,
+                "token_seconds_remaining": round(expires_at - time.time(), 1) if expires_at else None,
+            }
+        except Exception:
+            return {"token_present": True}
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Report memoization, connection pool and token stats for the registry.
+        """
+        with self._lock:
+            endpoints = []
+            for endpoint, client in self._clients.items():
+                endpoint_stats = dict(self._endpoint_stats[endpoint])
+                endpoint_stats["models"] = list(endpoint_stats["models"])
+                endpoint_stats["shared_by_models"] = len(endpoint_stats["models"])
+                endpoint_stats.update(self._token_stats(client))
+                endpoints.append(endpoint_stats)
+
+            return {
+                "models": len(self._models),
+                "clients": len(self._clients),
+                "hits": self.hits,
+                "misses": self.misses,
+                "endpoints": endpoints,
+            }
+
+    def clear(self):
+        """
+        Drop every cached model and client, e.g. after rotating credentials.
+        """
+        with self._lock:
+            self._models.clear()
+            self._clients.clear()
+            self._endpoint_stats.clear()
+
+
+LLM_REGISTRY = LLMRegistry()
+
+
 def get_llm(config: Dict):
     """
     Handles the configuration parameters for instantiating the Watsonx Model.
-    :param param_name: The name of the parameter to be handled.
-    :return: The configuration parameters for the agent.
+    Models are served from the process-wide LLM_REGISTRY, so agents asking for the same model and parameters share a client.
+    With the "fake" llm backend (Config.offline_backend_params or LLM_BACKEND=fake) an offline FakeChatModel is returned instead.
+    :param config: The agent config holding the model_id and model_parameters.
+    :return: The chat model for the agent.
     """
-    model_id = config['model_id']
-    model_params = config['model_parameters']
-    
-    # instantiate the model with the parameters.
-    llm = ChatWatsonx(
-        model_id=model_id,
-        url=os.environ["WATSONX_URL"],
-        apikey=os.environ["WATSONX_APIKEY"],
-        project_id=os.environ["WATSONX_PROJECT_ID"],
-        params=model_params
-    )
-
-    return llm
\ No newline at end of file
+    return LLM_REGISTRY.get(config)
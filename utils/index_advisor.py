@@ -0,0 +1,519 @@
+"""
+Workload-driven index advisor.
+Read queries executed through PostgresConnector.run_query / run_guarded_query are appended to a workload log. The
+advisor groups the log by pglast fingerprint, extracts the predicates, group keys and sort keys of every query
+(columns and DATE_TRUNC / lower expressions), derives candidate btree indexes from them and checks each candidate with
+EXPLAIN: as a hypothetical index when the hypopg extension is installed, or optionally by building it inside a
+rolled-back transaction. Candidates are ranked by the planner cost they save across the workload.
+"""
+
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from config import Config
+from utils.result_cache import _positional_placeholders, analyze_query
+from utils.schema_catalog import get_schema_catalog, quote_identifier
+from pglast.parser import parse_sql_json
+import threading
+import hashlib
+import json
+import time
+import os
+import re
+
+
+EQUALITY_OPERATORS = {"="}
+RANGE_OPERATORS = {"<", ">", "<=", ">="}
+# functions whose expression indexes are worth proposing: (name, position of the column argument).
+EXPRESSION_FUNCTIONS = {"date_trunc": 1, "lower": 0, "upper": 0}
+
+# (sql expression, descending)
+IndexKey = Tuple[str, bool]
+
+
+class WorkloadLog:
+    def __init__(self, params: Dict[str, Any] = None):
+        """
+        Append-only JSONL log of executed read queries.
+        :param params: the advisor config, defaults to Config.index_advisor_params.
+        """
+        self.params = params or Config.index_advisor_params
+        self.path = self.params["workload_path"]
+        self._lock = threading.Lock()
+        self.recorded = 0
+
+    def record(self, query: str, params: Any = None, seconds: float = 0.0, rows: int = 0):
+        if not self.params["enabled"] or not self.path:
+            return
+        line = json.dumps({"query": query, "params": params, "seconds": round(seconds, 6), "rows": rows,
+                           "ts": time.time()}, default=str)
+        try:
+            with self._lock:
+                directory = os.path.dirname(self.path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                if os.path.exists(self.path) and os.path.getsize(self.path) > self.params["max_log_bytes"]:
+                    # keep one previous generation.
+                    os.replace(self.path, self.path + ".1")
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(line + "\n")
+                self.recorded += 1
+        except OSError as e:
+            print(f"Could not record the query workload: {e}")
+
+    def entries(self, path: Optional[str] = None) -> Iterable[Dict[str, Any]]:
+        paths = [path] if path else [self.path + ".1", self.path]
+        for p in paths:
+            if not p or not os.path.exists(p):
+                continue
+            with open(p, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        continue
+
+    def grouped(self, path: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        The logged queries grouped by fingerprint: a sample query and params, executions and total seconds.
+        """
+        groups: Dict[str, Dict[str, Any]] = {}
+        for entry in self.entries(path):
+            analysis = analyze_query(entry.get("query"), has_params=bool(entry.get("params")))
+            if analysis is None or analysis["statements"] != ["SelectStmt"]:
+                continue
+            group = groups.setdefault(analysis["fingerprint"], {
+                "fingerprint": analysis["fingerprint"], "query": entry["query"], "params": entry.get("params"),
+                "executions": 0, "seconds": 0.0,
+            })
+            group["executions"] += 1
+            group["seconds"] += float(entry.get("seconds") or 0.0)
+        return sorted(groups.values(), key=lambda g: g["seconds"], reverse=True)
+
+
+def _string(node: Dict[str, Any]) -> Optional[str]:
+    value = node.get("String") or {}
+    return value.get("sval", value.get("str"))
+
+
+def _const_string(node: Dict[str, Any]) -> Optional[str]:
+    value = (node.get("A_Const") or {}).get("sval")
+    return value.get("sval", value.get("str")) if isinstance(value, dict) else None
+
+
+def _const_int(node: Dict[str, Any]) -> Optional[int]:
+    value = (node.get("A_Const") or {}).get("ival")
+    return value.get("ival", 0) if isinstance(value, dict) else None
+
+
+def _is_value(node: Any) -> bool:
+    # constants, parameters and functions of them (now(), casts): the side of a predicate an index can seek to.
+    if not isinstance(node, dict):
+        return False
+    if "A_Const" in node or "ParamRef" in node:
+        return True
+    if "TypeCast" in node:
+        return _is_value(node["TypeCast"].get("arg"))
+    if "FuncCall" in node:
+        return all(_is_value(arg) for arg in node["FuncCall"].get("args", []))
+    if "SQLValueFunction" in node:
+        return True
+    return False
+
+
+class _SelectKeys:
+    def __init__(self, select: Dict[str, Any], tables: Dict[str, Dict[str, Any]]):
+        """
+        The indexable keys of one SELECT: {table: {"equality": [...], "range": [...], "group": [...], "sort": [...]}}.
+        """
+        self.tables = tables
+        self.aliases: Dict[str, str] = {}
+        self.join_quals: List[Any] = []
+        for item in select.get("fromClause", []):
+            self._from(item)
+        self.targets = select.get("targetList", [])
+        self.keys: Dict[str, Dict[str, List[IndexKey]]] = {}
+
+        quals = [select.get("whereClause")] + self.join_quals
+        for qual in quals:
+            self._predicates(qual)
+        for node in select.get("groupClause", []):
+            key = self._key(self._target(node))
+            if key:
+                self._add(key[0], "group", (key[1], False))
+        for node in select.get("sortClause", []):
+            sort = node.get("SortBy", {})
+            key = self._key(self._target(sort.get("node", {})))
+            if key:
+                self._add(key[0], "sort", (key[1], sort.get("sortby_dir") == "SORTBY_DESC"))
+
+    def _from(self, item: Dict[str, Any]):
+        if "RangeVar" in item:
+            rv = item["RangeVar"]
+            if rv.get("relname") in self.tables:
+                self.aliases[(rv.get("alias") or {}).get("aliasname") or rv["relname"]] = rv["relname"]
+        elif "JoinExpr" in item:
+            join = item["JoinExpr"]
+            self._from(join.get("larg", {}))
+            self._from(join.get("rarg", {}))
+            if join.get("quals"):
+                self.join_quals.append(join["quals"])
+
+    def _target(self, node: Dict[str, Any]) -> Dict[str, Any]:
+        # GROUP BY 2 / ORDER BY alias refer to the select list.
+        position = _const_int(node)
+        if position is not None and 0 < position <= len(self.targets):
+            return self.targets[position - 1]["ResTarget"]["val"]
+        fields = (node.get("ColumnRef") or {}).get("fields", [])
+        if len(fields) == 1:
+            name = _string(fields[0])
+            for target in self.targets:
+                if target["ResTarget"].get("name") == name:
+                    return target["ResTarget"]["val"]
+        return node
+
+    def _column(self, node: Dict[str, Any]) -> Optional[Tuple[str, str]]:
+        fields = [_string(f) for f in (node.get("ColumnRef") or {}).get("fields", [])]
+        if not fields or None in fields:
+            return None
+        if len(fields) >= 2:
+            table = self.aliases.get(fields[-2])
+            candidates = [table] if table else []
+        else:
+            candidates = [t for t in set(self.aliases.values())
+                          if any(c == fields[-1] for c, _ in self.tables[t]["columns"])]
+        if len(candidates) != 1 or not any(c == fields[-1] for c, _ in self.tables[candidates[0]]["columns"]):
+            return None
+        return candidates[0], fields[-1]
+
+    def _key(self, node: Dict[str, Any]) -> Optional[Tuple[str, str]]:
+        """
+        (table, indexable sql expression) of a column or a supported function of one.
+        """
+        if "ColumnRef" in node:
+            column = self._column(node)
+            return (column[0], quote_identifier(column[1])) if column else None
+        call = node.get("FuncCall")
+        if not call:
+            return None
+        name = _string(call.get("funcname", [{}])[-1])
+        args = call.get("args", [])
+        if name not in EXPRESSION_FUNCTIONS or len(args) <= EXPRESSION_FUNCTIONS[name]:
+            return None
+        column = self._column(args[EXPRESSION_FUNCTIONS[name]])
+        if column is None:
+            return None
+        if name == "date_trunc":
+            unit = _const_string(args[0])
+            types = dict(self.tables[column[0]]["columns"])
+            # only date_trunc of a plain timestamp is immutable, and so indexable (a date resolves to the timestamptz
+            # overload).
+            if unit is None or types.get(column[1]) not in ("timestamp without time zone", "timestamp"):
+                return None
+            return column[0], f"date_trunc('{unit.lower()}', {quote_identifier(column[1])})"
+        return column[0], f"{name}({quote_identifier(column[1])})"
+
+    def _add(self, table: str, kind: str, key: IndexKey):
+        keys = self.keys.setdefault(table, {"equality": [], "range": [], "group": [], "sort": []})[kind]
+        if key not in keys:
+            keys.append(key)
+
+    def _predicates(self, node: Any):
+        if not isinstance(node, dict):
+            return
+        if "BoolExpr" in node:
+            # only conjunctions narrow every row an index scan has to visit.
+            if node["BoolExpr"].get("boolop") == "AND_EXPR":
+                for arg in node["BoolExpr"].get("args", []):
+                    self._predicates(arg)
+            return
+        if "NullTest" in node:
+            key = self._key(node["NullTest"].get("arg", {}))
+            if key:
+                self._add(key[0], "equality", (key[1], False))
+            return
+        expr = node.get("A_Expr")
+        if not expr:
+            return
+        kind = expr.get("kind")
+        op = _string((expr.get("name") or [{}])[-1])
+        lexpr, rexpr = expr.get("lexpr", {}), expr.get("rexpr", {})
+        if kind == "AEXPR_IN" and op == "=":
+            key, category = self._key(lexpr), "equality"
+        elif kind == "AEXPR_BETWEEN":
+            key, category = self._key(lexpr), "range"
+        elif kind == "AEXPR_OP" and op in EQUALITY_OPERATORS | RANGE_OPERATORS:
+            category = "equality" if op in EQUALITY_OPERATORS else "range"
+            if _is_value(rexpr):
+                key = self._key(lexpr)
+            elif _is_value(lexpr):
+                key = self._key(rexpr)
+            else:
+                # join keys: both sides may be worth an index.
+                for side in (lexpr, rexpr):
+                    side_key = self._key(side)
+                    if side_key and category == "equality":
+                        self._add(side_key[0], "equality", (side_key[1], False))
+                return
+        else:
+            return
+        if key:
+            self._add(key[0], category, (key[1], False))
+
+
+def _selects(node: Any) -> Iterable[Dict[str, Any]]:
+    # every SELECT of a statement, including subqueries, CTEs and set operation branches.
+    if isinstance(node, dict):
+        for name, value in node.items():
+            if name == "SelectStmt" and isinstance(value, dict):
+                yield value
+            yield from _selects(value)
+    elif isinstance(node, list):
+        for value in node:
+            yield from _selects(value)
+
+
+def extract_keys(query: str, tables: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, List[IndexKey]]]:
+    """
+    The predicate (equality / range), group and sort keys of a query per table.
+    :param tables: the schema catalog tables the keys are resolved against.
+    """
+    stmts = json.loads(parse_sql_json(_positional_placeholders(query))).get("stmts", [])
+    merged: Dict[str, Dict[str, List[IndexKey]]] = {}
+    for select in _selects(stmts):
+        for table, kinds in _SelectKeys(select, tables).keys.items():
+            target = merged.setdefault(table, {"equality": [], "range": [], "group": [], "sort": []})
+            for kind, keys in kinds.items():
+                target[kind] += [key for key in keys if key not in target[kind]]
+    return merged
+
+
+def canonical_keys(keys: Tuple[IndexKey, ...]) -> Tuple[IndexKey, ...]:
+    """
+    A btree is scanned backwards as well as forwards, so an index and the one with every direction reversed are
+    interchangeable: keep the form whose first key is ascending ("Created" DESC -> "Created").
+    """
+    if keys and keys[0][1]:
+        return tuple((expr, not desc) for expr, desc in keys)
+    return keys
+
+
+def candidate_indexes(keys: Dict[str, List[IndexKey]], max_columns: int) -> List[Tuple[IndexKey, ...]]:
+    """
+    Candidate key lists for one table of one query: equality keys first, then one range key, or the group/sort keys
+    the equality keys leave in order; plus single-key indexes. Each in its canonical_keys form.
+    """
+    equality, ranges, group, sort = keys["equality"], keys["range"], keys["group"], keys["sort"]
+    candidates = []
+    for tail in ([], ranges[:1], group, sort):
+        combined = list(dict.fromkeys(equality + [key for key in tail if key not in equality]))
+        if combined:
+            candidates.append(tuple(combined[:max_columns]))
+    candidates += [(key,) for key in equality + ranges + group[:1] + sort[:1]]
+    return list(dict.fromkeys(canonical_keys(candidate) for candidate in candidates))
+
+
+def index_name(table: str, keys: Tuple[IndexKey, ...]) -> str:
+    words = "_".join(re.sub(r"[^a-z0-9]+", "_", expr.lower()).strip("_") + ("_desc" if desc else "") for expr, desc in keys)
+    name = f"{table}_{words}_idx"
+    if len(name) > 63:
+        name = f"{name[:50]}_{hashlib.md5(name.encode('utf-8')).hexdigest()[:8]}_idx"
+    return name
+
+
+def index_statement(table: str, keys: Tuple[IndexKey, ...]) -> str:
+    # expressions (anything but a plain column) need their own parentheses.
+    columns = ", ".join(
+        (expr if expr.startswith('"') or expr.isidentifier() else f"({expr})") + (" DESC" if desc else "")
+        for expr, desc in keys
+    )
+    return (
+        f"CREATE INDEX {quote_identifier(index_name(table, keys))} ON {quote_identifier(table)} ({columns})"
+    )
+
+
+def _existing(indexdef: str) -> str:
+    # the normalized key list of a pg_indexes indexdef.
+    match = re.search(r"USING \w+ \((.*)\)", indexdef)
+    return re.sub(r"[\s()]", "", match.group(1).replace("::text", "")).lower() if match else ""
+
+
+class IndexAdvisor:
+    def __init__(self, params: Dict[str, Any] = None, log: WorkloadLog = None):
+        """
+        Ranks candidate indexes by the planner cost they save over the logged workload.
+        :param params: the advisor config, defaults to Config.index_advisor_params.
+        :param log: the workload log, defaults to the process-wide one.
+        """
+        self.params = params or Config.index_advisor_params
+        self.log = log or get_workload_log()
+
+    def candidates(self, workload: List[Dict[str, Any]]) -> Dict[Tuple[str, Tuple[IndexKey, ...]], List[int]]:
+        """
+        {(table, keys): indexes of the workload queries it was derived from}, minus the ones an existing index covers.
+        """
+        tables = get_schema_catalog().get_tables()
+        if self.params["tables"]:
+            tables = {t: meta for t, meta in tables.items() if t in self.params["tables"]}
+        candidates: Dict[Tuple[str, Tuple[IndexKey, ...]], List[int]] = {}
+        for i, entry in enumerate(workload):
+            try:
+                keys = extract_keys(entry["query"], tables)
+            except Exception:
+                continue
+            entry["tables"] = set(keys)
+            for table, table_keys in keys.items():
+                existing = [_existing(d) for d in tables[table].get("indexes", [])]
+                for candidate in candidate_indexes(table_keys, self.params["max_index_columns"]):
+                    # an existing index in either scan direction covers the candidate.
+                    reversed_candidate = tuple((expr, not desc) for expr, desc in candidate)
+                    normalized = [re.sub(r"[\s()]", "", ",".join(
+                        expr + (" desc" if desc else "") for expr, desc in keys
+                    )).lower() for keys in (candidate, reversed_candidate)]
+                    if any((e + ",").startswith(n + ",") for e in existing for n in normalized):
+                        continue
+                    candidates.setdefault((table, candidate), []).append(i)
+        return candidates
+
+    @staticmethod
+    def _cost(conn, entry: Dict[str, Any]) -> Optional[Tuple[float, str]]:
+        from utils.query_guard import EXPLAIN_PREFIX, plan_estimates, strip_statement
+        try:
+            # a savepoint inside the candidate's transaction, so a failing query only skips itself.
+            with conn.transaction():
+                plan = conn.execute(EXPLAIN_PREFIX + strip_statement(entry["query"]), entry.get("params") or None).fetchone()[0]
+            return plan_estimates(plan)["total_cost"], json.dumps(plan)
+        except Exception:
+            return None
+
+    def recommend(self, workload_path: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Evaluate the candidates of the logged workload.
+        :param workload_path: a workload log to read instead of the configured one.
+        :return: recommendations ranked by estimated gain (planner cost saved, weighted by executions), each with the
+            CREATE INDEX statement, the cost before/after and the queries that use the index. Without hypopg (and
+            without trial builds) the gains are None and candidates are ranked by the time of their queries.
+        """
+        import psycopg
+        from connectors.db_connector import pooled_connection
+
+        workload = self.log.grouped(workload_path)
+        candidates = self.candidates(workload)
+        if not candidates:
+            return []
+
+        recommendations = []
+        with pooled_connection(statement_timeout_ms=self.params["statement_timeout_ms"]) as conn:
+            hypopg = self.params["use_hypopg"] and conn.execute(
+                "SELECT 1 FROM pg_extension WHERE extname = 'hypopg'"
+            ).fetchone() is not None
+            method = "hypopg" if hypopg else ("trial_build" if self.params["trial_builds"] else None)
+
+            baseline = {}
+            if method:
+                for i in {i for queries in candidates.values() for i in queries}:
+                    cost = self._cost(conn, workload[i])
+                    if cost is not None:
+                        baseline[i] = cost[0]
+
+            for (table, keys), derived_from in candidates.items():
+                statement = index_statement(table, keys)
+                affected = [i for i, entry in enumerate(workload) if table in entry.get("tables", ()) and i in baseline]
+                before = sum(baseline[i] * workload[i]["executions"] for i in affected)
+                after, used_by = None, []
+                if method:
+                    # hypothetical indexes live in the session, the trial builds in a transaction that is rolled back.
+                    try:
+                        with conn.transaction(force_rollback=True):
+                            if hypopg:
+                                name = conn.execute("SELECT indexname FROM hypopg_create_index(%s)", (statement,)).fetchone()[0]
+                            else:
+                                conn.execute(statement)
+                                name = index_name(table, keys)
+                            after = 0.0
+                            for i in affected:
+                                cost = self._cost(conn, workload[i])
+                                new_cost, plan = cost if cost else (baseline[i], "")
+                                after += min(new_cost, baseline[i]) * workload[i]["executions"]
+                                if name in plan:
+                                    used_by.append(i)
+                    except psycopg.Error as e:
+                        print(f"Could not evaluate {statement}: {e}")
+                        continue
+                    finally:
+                        if hypopg:
+                            conn.execute("SELECT hypopg_reset()")
+                    if not used_by:
+                        continue
+
+                gain = before - after if after is not None else None
+                recommendations.append({
+                    "statement": statement,
+                    "table": table,
+                    "keys": [expr + (" DESC" if desc else "") for expr, desc in keys],
+                    "expression": any(not (expr.startswith('"') or expr.isidentifier()) for expr, _ in keys),
+                    "method": method,
+                    "cost_before": round(before, 2) if method else None,
+                    "cost_after": round(after, 2) if after is not None else None,
+                    "gain": round(gain, 2) if gain is not None else None,
+                    "gain_pct": round(100.0 * gain / before, 1) if gain is not None and before else None,
+                    "queries": [workload[i]["query"] for i in (used_by or derived_from)],
+                    "executions": sum(workload[i]["executions"] for i in (used_by or derived_from)),
+                    "query_seconds": round(sum(workload[i]["seconds"] for i in (used_by or derived_from)), 3),
+                })
+
+        if any(r["gain"] is not None for r in recommendations):
+            recommendations = [r for r in recommendations if (r["gain_pct"] or 0.0) >= self.params["min_gain_pct"]]
+            recommendations.sort(key=lambda r: r["gain"], reverse=True)
+        else:
+            recommendations.sort(key=lambda r: (r["query_seconds"], r["executions"]), reverse=True)
+        return self._drop_covered(recommendations)
+
+    @staticmethod
+    def _drop_covered(recommendations: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        # a recommendation only serving queries a higher-ranked one already serves would be a second, interchangeable
+        # index for them.
+        covered, kept = set(), []
+        for recommendation in recommendations:
+            queries = set(recommendation["queries"])
+            if queries <= covered:
+                continue
+            covered |= queries
+            kept.append(recommendation)
+        return kept
+
+    def apply(self, recommendations: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Build the recommended indexes with CREATE INDEX CONCURRENTLY (writes keep going while they build).
+        :return: {"statement", "status", "seconds" or "error"} per recommendation.
+        """
+        from connectors.db_connector import pooled_connection
+
+        results = []
+        for recommendation in recommendations:
+            statement = recommendation["statement"].replace("CREATE INDEX ", "CREATE INDEX CONCURRENTLY IF NOT EXISTS ", 1)
+            start = time.perf_counter()
+            try:
+                # pooled connections are in autocommit, which CONCURRENTLY requires.
+                with pooled_connection(statement_timeout_ms=self.params["build_timeout_ms"]) as conn:
+                    conn.execute(statement)
+                results.append({"statement": statement, "status": "ok",
+                                "seconds": round(time.perf_counter() - start, 3)})
+            except Exception as e:
+                results.append({"statement": statement, "status": "error", "error": str(e)})
+        if any(r["status"] == "ok" for r in results):
+            get_schema_catalog().refresh(force=True)
+        return results
+
+
+_WORKLOAD_LOG = None
+_WORKLOAD_LOG_LOCK = threading.Lock()
+
+
+def get_workload_log() -> WorkloadLog:
+    """
+    Return the process-wide workload log.
+    """
+    global _WORKLOAD_LOG
+    with _WORKLOAD_LOG_LOCK:
+        if _WORKLOAD_LOG is None:
+            _WORKLOAD_LOG = WorkloadLog()
+        return _WORKLOAD_LOG
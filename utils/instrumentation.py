@@ -0,0 +1,276 @@
+"""
+Per-node latency, token and I/O instrumentation for the LangGraph pipeline.
+Every graph node is wrapped to record its wall time, tagged by request id. LLM token usage (through a LangChain
+callback) and Postgres/Milvus I/O (reported by the connectors) are attributed to the node running at the time.
+Events go to a JSONL sink and are aggregated into Prometheus metrics served over HTTP.
+"""
+
+from typing import Any, Callable, Dict, List, Optional
+from collections import defaultdict, deque
+from contextvars import ContextVar
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from langchain_core.callbacks import BaseCallbackHandler
+from config import Config
+import functools
+import threading
+import inspect
+import bisect
+import uuid
+import json
+import time
+import os
+
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# the node currently running in this thread / task, with the llm calls and i/o it has made so far.
+_current_node: ContextVar[Optional[Dict[str, Any]]] = ContextVar("instrumentation_current_node", default=None)
+
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Instrumentation:
+    def __init__(self, params: Dict[str, Any] = None):
+        """
+        Collects node, llm and i/o measurements.
+        :param params: the config, defaults to Config.instrumentation_params.
+        """
+        self.params = params or Config.instrumentation_params
+        self.enabled = self.params["enabled"]
+        self.jsonl_path = self.params["jsonl_path"]
+
+        self._lock = threading.Lock()
+        self._histograms: Dict[tuple, Histogram] = defaultdict(Histogram)
+        self._counters: Dict[tuple, float] = defaultdict(float)
+        self.recent_events = deque(maxlen=self.params["recent_events"])
+        self._server = None
+
+    # ----- recording -----
+    def record_llm(self, model_id: str, prompt_tokens: int, completion_tokens: int, seconds: float):
+        """
+        Record one llm call against the running node.
+        """
+        call = {
+            "model_id": model_id,
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "seconds": round(seconds, 4),
+        }
+        current = _current_node.get()
+        if current is not None:
+            current["llm"].append(call)
+
+        with self._lock:
+            self._counters[("llm_calls_total", (("model_id", model_id),))] += 1
+            self._counters[("llm_tokens_total", (("model_id", model_id), ("type", "prompt")))] += prompt_tokens or 0
+            self._counters[("llm_tokens_total", (("model_id", model_id), ("type", "completion")))] += completion_tokens or 0
+            self._histograms[("llm_call_seconds", (("model_id", model_id),))].observe(seconds)
+
+    def record_io(self, kind: str, seconds: float, **fields):
+        """
+        Record a Postgres query (kind="postgres", rows=...) or Milvus search (kind="milvus", hits=...)
+        against the running node.
+        """
+        event = {"kind": kind, "seconds": round(seconds, 4), **fields}
+        current = _current_node.get()
+        if current is not None:
+            current["io"].append(event)
+
+        with self._lock:
+            self._histograms[(f"{kind}_seconds", ())].observe(seconds)
+            for name, value in fields.items():
+                if isinstance(value, (int, float)):
+                    self._counters[(f"{kind}_{name}_total", ())] += value
+
+    def _emit(self, event: Dict[str, Any]):
+        with self._lock:
+            self.recent_events.append(event)
+            self._histograms[("node_latency_seconds", (("node", event["node"]),))].observe(event["wall_seconds"])
+            if event["status"] == "error":
+                self._counters[("node_errors_total", (("node", event["node"]),))] += 1
+
+            if self.jsonl_path:
+                directory = os.path.dirname(self.jsonl_path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                with open(self.jsonl_path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(event, default=str) + "\n")
+
+    # ----- node wrapping -----
+    def _start(self, name: str, state: Dict[str, Any]):
+        if not state.get('request_id'):
+            state['request_id'] = uuid.uuid4().hex
+        current = {"request_id": state['request_id'], "node": name, "llm": [], "io": []}
+        return current, _current_node.set(current), time.perf_counter()
+
+    def _finish(self, current: Dict[str, Any], token, start: float, status: str):
+        _current_node.reset(token)
+        self._emit({
+            "ts": time.time(),
+            "request_id": current["request_id"],
+            "node": current["node"],
+            "wall_seconds": round(time.perf_counter() - start, 4),
+            "status": status,
+            "llm": current["llm"],
+            "io": current["io"],
+        })
+
+    def wrap_node(self, name: str, fn: Callable) -> Callable:
+        """
+        Wrap a graph node (sync or async) so every run is timed and its llm/io usage attributed to it.
+        """
+        if not self.enabled:
+            return fn
+
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(state, *args, **kwargs):
+                current, token, start = self._start(name, state)
+                status = "error"
+                try:
+                    result = await fn(state, *args, **kwargs)
+                    status = "ok"
+                    return result
+                finally:
+                    self._finish(current, token, start, status)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(state, *args, **kwargs):
+            current, token, start = self._start(name, state)
+            status = "error"
+            try:
+                result = fn(state, *args, **kwargs)
+                status = "ok"
+                return result
+            finally:
+                self._finish(current, token, start, status)
+        return wrapper
+
+    def events_for(self, request_id: str) -> List[Dict[str, Any]]:
+        """
+        Return the recent node events of a request.
+        """
+        with self._lock:
+            return [event for event in self.recent_events if event["request_id"] == request_id]
+
+    # ----- prometheus -----
+    @staticmethod
+    def _labels(labels: tuple, extra: str = "") -> str:
+        parts = [f'{key}="{value}"' for key, value in labels]
+        if extra:
+            parts.append(extra)
+        return "{" + ",".join(parts) + "}" if parts else ""
+
+    def prometheus_text(self) -> str:
+        """
+        Render the aggregated metrics in the Prometheus text exposition format.
+        """
+        lines = []
+        with self._lock:
+            for name in sorted({name for name, _ in self._counters}):
+                lines.append(f"# TYPE agent_{name} counter")
+                for (metric, labels), value in self._counters.items():
+                    if metric == name:
+                        lines.append(f"agent_{name}{self._labels(labels)} {value}")
+
+            for name in sorted({name for name, _ in self._histograms}):
+                lines.append(f"# TYPE agent_{name} histogram")
+                for (metric, labels), histogram in self._histograms.items():
+                    if metric != name:
+                        continue
+                    cumulative = 0
+                    for bound, count in zip(list(histogram.buckets) + ["+Inf"], histogram.counts):
+                        cumulative += count
+                        bucket_labels = self._labels(labels, 'le="%s"' % bound)
+                        lines.append(f"agent_{name}_bucket{bucket_labels} {cumulative}")
+                    lines.append(f"agent_{name}_sum{self._labels(labels)} {histogram.sum}")
+                    lines.append(f"agent_{name}_count{self._labels(labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def start_http_server(self, port: Optional[int] = None):
+        """
+        Serve the Prometheus metrics on /metrics from a daemon thread. Calling it again is a no-op.
+        """
+        port = port or self.params["prometheus_port"]
+        if self._server is not None or not port:
+            return self._server
+
+        instrumentation = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.rstrip("/") not in ("", "/metrics"):
+                    self.send_response(404)
+                    self.end_headers()
+                    return
+                body = instrumentation.prometheus_text().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        try:
+            self._server = ThreadingHTTPServer(("0.0.0.0", port), MetricsHandler)
+        except OSError as e:
+            print(f"Could not start the metrics endpoint on port {port}: {e}")
+            return None
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        print(f"Serving Prometheus metrics on :{port}/metrics")
+        return self._server
+
+
+class LLMUsageCallback(BaseCallbackHandler):
+    """
+    LangChain callback that reports token usage and latency of every chat model call to the instrumentation.
+    """
+
+    def __init__(self, instrumentation: Instrumentation):
+        self.instrumentation = instrumentation
+        self._starts: Dict[Any, tuple] = {}
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, metadata=None, **kwargs):
+        model_id = (metadata or {}).get("ls_model_name") or (serialized or {}).get("kwargs", {}).get("model_id", "unknown")
+        self._starts[run_id] = (model_id, time.perf_counter())
+
+    def on_llm_start(self, serialized, prompts, *, run_id, metadata=None, **kwargs):
+        self.on_chat_model_start(serialized, prompts, run_id=run_id, metadata=metadata)
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        model_id, start = self._starts.pop(run_id, ("unknown", time.perf_counter()))
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        prompt_tokens = usage.get("prompt_tokens") or usage.get("input_token_count")
+        completion_tokens = usage.get("completion_tokens") or usage.get("generated_token_count")
+
+        if prompt_tokens is None:
+            # streamed responses report usage on the aggregated message instead of llm_output.
+            try:
+                usage_metadata = response.generations[0][0].message.usage_metadata or {}
+                prompt_tokens = usage_metadata.get("input_tokens")
+                completion_tokens = usage_metadata.get("output_tokens")
+            except (AttributeError, IndexError):
+                pass
+
+        self.instrumentation.record_llm(model_id, prompt_tokens or 0, completion_tokens or 0, time.perf_counter() - start)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._starts.pop(run_id, None)
+
+
+INSTRUMENTATION = Instrumentation()
+LLM_USAGE_CALLBACK = LLMUsageCallback(INSTRUMENTATION)
@@ -0,0 +1,229 @@
+"""
+Local, in-process intent classifier used by the supervisor to route confident queries without an LLM call.
+It combines keyword rules with TF-IDF centroids trained from labeled routing examples and the routing query log.
+"""
+
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from collections import Counter, defaultdict
+from config import Config
+from prompt_reference.supervisor_prompt import SupervisorPrompts
+import threading
+import json
+import math
+import re
+import os
+
+
+ROUTES = ("postgres_agent", "vector_db_agent", "report_generator_agent", "hybrid_agent")
+
+# strong lexical cues for each route, weighted by how reliable they are on their own.
+# hybrid_agent has no cues of its own, it is learned from its examples.
+ROUTE_KEYWORDS = {
+    "postgres_agent": {
+        "how many": 1.0, "count": 0.8, "tickets": 0.8, "ticket": 0.8, "jira": 0.6, "issues": 0.5,
+        "assignee": 0.8, "assigned": 0.8, "status": 0.5, "resolved": 0.6, "open": 0.4, "created": 0.5,
+        "records": 0.7, "table": 0.7, "latest": 0.4, "last week": 0.6, "last month": 0.6, "release date": 0.6,
+    },
+    "vector_db_agent": {
+        "support": 0.6, "supports": 0.8, "supported": 0.8, "compatible": 0.8, "certified": 0.8, "tested": 0.6,
+        "version of": 0.7, "jdk": 0.6, "openjdk": 0.6, "java": 0.4, "documentation": 0.8, "confluence": 1.0,
+        "support matrix": 1.0, "fcc": 0.6, "platform": 0.5, "deployment": 0.4, "deploy": 0.4,
+    },
+    "report_generator_agent": {
+        "report": 1.0, "chart": 1.0, "dashboard": 1.0, "graph": 0.6, "plot": 0.8, "visualize": 0.9,
+        "inflow": 0.9, "inflows": 0.9, "outflow": 0.9, "outflows": 0.9, "trend": 0.7, "pie": 0.8, "bar chart": 1.0,
+        "summarize": 0.4, "breakdown": 0.6,
+    },
+}
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lowercased word unigrams and bigrams. Version numbers such as 6.1.4 are kept as single tokens.
+    """
+    words = re.findall(r"[a-z0-9]+(?:\.[a-z0-9]+)*", (text or "").lower())
+    return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+
+def decision_to_route(decision: str) -> Optional[str]:
+    """
+    Map a free-text supervisor decision onto a route label, mirroring SupervisorAgent.router.
+    """
+    decision = (decision or "").lower()
+    if "hybrid" in decision or ("vector_db" in decision and "postgres" in decision):
+        return "hybrid_agent"
+    if "vector_db" in decision:
+        return "vector_db_agent"
+    if "postgres" in decision:
+        return "postgres_agent"
+    if "report" in decision:
+        return "report_generator_agent"
+    return None
+
+
+class IntentRouter:
+    def __init__(self, params: Dict[str, Any] = None, examples: Iterable[Tuple[str, str]] = None):
+        """
+        Keyword + TF-IDF centroid classifier over the supervisor routes.
+        :param params: the router config, defaults to Config.intent_router_params.
+        :param examples: labeled (query, route) seed examples, defaults to SupervisorPrompts.routing_examples.
+        """
+        self.params = params or Config.intent_router_params
+        self.confidence_threshold = self.params["confidence_threshold"]
+        self.min_score = self.params["min_score"]
+
+        self._lock = threading.Lock()
+        self.examples: List[Tuple[str, str]] = list(examples or SupervisorPrompts.routing_examples)
+        self.examples.extend(self._load_query_log())
+        self._untrained = 0
+
+        self.idf: Dict[str, float] = {}
+        self.centroids: Dict[str, Dict[str, float]] = {}
+        self.train()
+
+        self.fast_path = 0
+        self.llm_fallback = 0
+        self.fast_path_by_route: Counter = Counter()
+
+    def _load_query_log(self) -> List[Tuple[str, str]]:
+        """
+        Read labeled queries from the routing query log (one {"user_input": ..., "route": ...} JSON object per line).
+        """
+        path = self.params["query_log_path"]
+        examples = []
+        if not path or not os.path.exists(path):
+            return examples
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                route = decision_to_route(record.get("route", ""))
+                if record.get("user_input") and route:
+                    examples.append((record["user_input"], route))
+        return examples
+
+    def _vectorize(self, text: str) -> Dict[str, float]:
+        counts = Counter(tokenize(text))
+        vector = {
+            token: (1 + math.log(count)) * self.idf[token]
+            for token, count in counts.items() if token in self.idf
+        }
+        norm = math.sqrt(sum(v * v for v in vector.values()))
+        return {token: v / norm for token, v in vector.items()} if norm else {}
+
+    def train(self):
+        """
+        (Re)compute the IDF weights and the normalized per-route centroids from the labeled examples.
+        """
+        with self._lock:
+            documents = [(set(tokenize(query)), route) for query, route in self.examples]
+            document_frequency = Counter(token for tokens, _ in documents for token in tokens)
+            n_docs = len(documents)
+            self.idf = {token: math.log((1 + n_docs) / (1 + df)) + 1 for token, df in document_frequency.items()}
+
+            sums: Dict[str, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+            for query, route in self.examples:
+                for token, weight in self._vectorize(query).items():
+                    sums[route][token] += weight
+
+            centroids = {}
+            for route, vector in sums.items():
+                norm = math.sqrt(sum(v * v for v in vector.values()))
+                centroids[route] = {token: v / norm for token, v in vector.items()} if norm else {}
+            self.centroids = centroids
+            self._untrained = 0
+
+    @staticmethod
+    def _keyword_score(text: str, keywords: Dict[str, float]) -> float:
+        padded = f" {' '.join(re.findall(r'[a-z0-9.]+', text.lower()))} "
+        return min(1.0, sum(weight for keyword, weight in keywords.items() if f" {keyword} " in padded))
+
+    def scores(self, text: str) -> Dict[str, float]:
+        """
+        Score every route for a query as a blend of TF-IDF centroid similarity and keyword evidence.
+        """
+        vector = self._vectorize(text)
+        scores = {}
+        for route in self.centroids.keys() | ROUTE_KEYWORDS.keys():
+            centroid = self.centroids.get(route, {})
+            similarity = sum(weight * centroid.get(token, 0.0) for token, weight in vector.items())
+            keywords = self._keyword_score(text, ROUTE_KEYWORDS.get(route, {}))
+            scores[route] = round(0.6 * similarity + 0.4 * keywords, 4)
+        return scores
+
+    def predict(self, text: str) -> Dict[str, Any]:
+        """
+        Classify a query.
+        :return: a dict with the best 'route', its 'score', a 'confidence' (relative margin over the runner-up)
+            and 'fast_path', which is True when the route can be used without asking the supervisor LLM.
+        """
+        if not self.params["enabled"]:
+            return {"route": None, "score": 0.0, "confidence": 0.0, "fast_path": False}
+
+        ranked = sorted(self.scores(text).items(), key=lambda item: item[1], reverse=True)
+        (route, top), runner_up = ranked[0], (ranked[1][1] if len(ranked) > 1 else 0.0)
+        confidence = round((top - runner_up) / top, 4) if top > 0 else 0.0
+        fast_path = top >= self.min_score and confidence >= self.confidence_threshold
+        return {"route": route, "score": top, "confidence": confidence, "fast_path": fast_path}
+
+    def record(self, prediction: Dict[str, Any]):
+        """
+        Count whether a request was routed by the fast path or fell back to the LLM.
+        """
+        with self._lock:
+            if prediction["fast_path"]:
+                self.fast_path += 1
+                self.fast_path_by_route[prediction["route"]] += 1
+            else:
+                self.llm_fallback += 1
+
+    def add_example(self, text: str, decision: str):
+        """
+        Add an LLM-labeled query to the query log so the router learns from fallback decisions.
+        The centroids are retrained every `retrain_every` new examples.
+        """
+        route = decision_to_route(decision)
+        if route is None:
+            return
+
+        with self._lock:
+            self.examples.append((text, route))
+            self._untrained += 1
+            path = self.params["query_log_path"]
+            if path and self.params["log_llm_decisions"]:
+                directory = os.path.dirname(path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                with open(path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps({"user_input": text, "route": route}) + "\n")
+            retrain = self._untrained >= self.params["retrain_every"]
+
+        if retrain:
+            self.train()
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.fast_path + self.llm_fallback
+        return {
+            "fast_path": self.fast_path,
+            "llm_fallback": self.llm_fallback,
+            "fast_path_rate": round(self.fast_path / total, 4) if total else 0.0,
+            "fast_path_by_route": dict(self.fast_path_by_route),
+            "training_examples": len(self.examples),
+        }
+
+
+_INTENT_ROUTER = None
+_INTENT_ROUTER_LOCK = threading.Lock()
+
+
+def get_intent_router() -> IntentRouter:
+    """
+    Return the process-wide intent router.
+    """
+    global _INTENT_ROUTER
+    with _INTENT_ROUTER_LOCK:
+        if _INTENT_ROUTER is None:
+            _INTENT_ROUTER = IntentRouter()
+        return _INTENT_ROUTER
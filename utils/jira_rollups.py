@@ -0,0 +1,399 @@
+"""
+Pre-aggregated inflow/outflow rollups of jira_data for the report sidebar.
+Ticket counts are kept per week, month and quarter of "Created" across the report dimensions (Issue Type, Status,
+Assignee, Priority, Resolution). They are refreshed incrementally from the "Updated" watermark and from the keys the
+loader merged (whose "Updated" can be older than the watermark): each changed ticket's previous contribution (kept in a
+per-ticket snapshot table) is subtracted and its new one added, so a refresh costs in proportion to the changed tickets
+and a report reads a few rollup rows instead of scanning the ticket history.
+The rollups count one row per "Key", so reports are only rewritten onto them while "Key" is unique and not NULL in the
+source table (see prepare_source).
+The loader builds the tables; until it has, reports read the source table. The report path only folds in changes, and
+looks for deleted tickets when the source table's delete counter (or its file, after a TRUNCATE) moved.
+"""
+
+from typing import Any, Dict, List, Optional
+from config import Config
+from utils.schema_catalog import quote_identifier
+import threading
+import time
+
+
+GRAINS = ("week", "month", "quarter")
+# the sidebar's "Aggregate by" labels.
+AGGREGATE_BY_GRAINS = {"Week": "week", "Month": "month", "3 Months": "quarter"}
+# rollup cells store NULL dimensions and periods as these sentinels, so they can be part of the unique key.
+NULL_DIMENSION = ""
+NULL_PERIOD = "-infinity"
+
+
+class JiraRollups:
+    def __init__(self, params: Dict[str, Any] = None):
+        """
+        Maintains the rollup tables and rewrites eligible report queries onto them.
+        :param params: the rollup config, defaults to Config.jira_rollup_params.
+        """
+        self.params = params or Config.jira_rollup_params
+        self.source = self.params["source_table"]
+        self.prefix = self.params["table_prefix"]
+
+        self._lock = threading.Lock()
+        self._refreshed_at = 0.0
+        self._dimensions: Optional[List[str]] = None
+        # whether "Key" is unique and never NULL in the source table (None until the first refresh checks it).
+        self._unique_key: Optional[bool] = None
+        # whether the loader has built the tables (None until the report path checks it).
+        self._built: Optional[bool] = None
+
+        self.refreshes = 0
+        self.refreshed_tickets = 0
+        self.rewrites = 0
+        self.fallbacks = 0
+
+    # ----- names -----
+    def table(self, name: str):
+        from psycopg import sql
+        return sql.Identifier(f"{self.prefix}_{name}")
+
+    def dimensions(self) -> List[str]:
+        """
+        The configured dimensions that exist in the source table.
+        """
+        from utils.schema_catalog import get_schema_catalog
+        columns = {name for name, _ in get_schema_catalog().get_tables().get(self.source, {}).get("columns", [])}
+        return [dimension for dimension in self.params["dimensions"] if dimension in columns]
+
+    # ----- maintenance -----
+    def prepare_source(self) -> Dict[str, bool]:
+        """
+        Explicit setup of the source table, run by the loader rather than on the report path: the "Updated" index the
+        incremental refreshes range-scan, and a unique index on "Key" (skipped when the table has duplicate keys, in
+        which case reports keep reading the source table).
+        :return: whether each index exists.
+        """
+        from psycopg import sql
+        from connectors.db_connector import pooled_connection
+
+        source = sql.Identifier(self.source)
+        indexes = {
+            "updated": sql.SQL('CREATE INDEX IF NOT EXISTS {} ON {} ("Updated")').format(
+                sql.Identifier(f"{self.source}_updated_idx"), source
+            ),
+            "unique_key": sql.SQL('CREATE UNIQUE INDEX IF NOT EXISTS {} ON {} ("Key")').format(
+                sql.Identifier(f"{self.source}_key_uidx"), source
+            ),
+        }
+        result = {}
+        with pooled_connection() as conn:
+            for name, statement in indexes.items():
+                try:
+                    with conn.transaction():
+                        conn.execute("SELECT set_config('statement_timeout', '0', true)")
+                        conn.execute(statement)
+                    result[name] = True
+                except Exception as e:
+                    print(f"Could not create the {name} index on {self.source}: {e}")
+                    result[name] = False
+        return result
+
+    def _key_is_unique(self, conn) -> bool:
+        # a unique index on "Key" alone and no NULL keys: then one snapshot row per key is one source row.
+        from psycopg import sql
+        indexed = conn.execute(
+            "SELECT EXISTS (SELECT 1 FROM pg_index i JOIN pg_attribute a "
+            "ON a.attrelid = i.indrelid AND a.attnum = i.indkey[0] "
+            "WHERE i.indrelid = to_regclass(%s) AND i.indisunique AND i.indnkeyatts = 1 "
+            "AND i.indpred IS NULL AND i.indexprs IS NULL AND a.attname = 'Key')",
+            (quote_identifier(self.source),)
+        ).fetchone()[0]
+        if not indexed:
+            return False
+        return not conn.execute(sql.SQL('SELECT EXISTS (SELECT 1 FROM {} WHERE "Key" IS NULL)').format(
+            sql.Identifier(self.source)
+        )).fetchone()[0]
+
+    def _ensure_tables(self, conn, dimensions: List[str]) -> Optional[Any]:
+        """
+        Create the rollup, snapshot and state tables, rebuilding them when the dimensions changed.
+        :return: the current watermark (None when everything has to be (re)aggregated).
+        """
+        from psycopg import sql
+        state, snapshot = self.table("state"), self.table("tickets")
+        dims = [sql.Identifier(d) for d in dimensions]
+        dim_columns = sql.SQL("").join(sql.SQL(", {} text NOT NULL DEFAULT ''").format(d) for d in dims)
+
+        conn.execute(sql.SQL(
+            "CREATE TABLE IF NOT EXISTS {} (name text PRIMARY KEY, watermark timestamp, dimensions text, "
+            "refreshed_at timestamptz, deletes_seen text)"
+        ).format(state))
+        conn.execute(sql.SQL("ALTER TABLE {} ADD COLUMN IF NOT EXISTS deletes_seen text").format(state))
+        row = conn.execute(sql.SQL("SELECT watermark, dimensions FROM {} WHERE name = %s").format(state),
+                           (self.source,)).fetchone()
+        if row is not None and row[1] != ",".join(dimensions):
+            print(f"Rollup dimensions changed to {dimensions}, rebuilding the {self.prefix} tables.")
+            for name in ("tickets",) + GRAINS:
+                conn.execute(sql.SQL("DROP TABLE IF EXISTS {}").format(self.table(name)))
+            row = None
+
+        conn.execute(sql.SQL(
+            'CREATE TABLE IF NOT EXISTS {} ("Key" text PRIMARY KEY, "Created" timestamp, "Updated" timestamp{})'
+        ).format(snapshot, dim_columns))
+        for grain in GRAINS:
+            conn.execute(sql.SQL(
+                "CREATE TABLE IF NOT EXISTS {} (period timestamp NOT NULL{}, ticket_count bigint NOT NULL)"
+            ).format(self.table(grain), dim_columns))
+            conn.execute(sql.SQL("CREATE UNIQUE INDEX IF NOT EXISTS {} ON {} ({})").format(
+                sql.Identifier(f"{self.prefix}_{grain}_cell"), self.table(grain),
+                sql.SQL(", ").join([sql.Identifier("period")] + dims)
+            ))
+        return row[0] if row else None
+
+    def _built_state(self, conn, dimensions: List[str]) -> Optional[tuple]:
+        """
+        The watermark and delete marker of tables the loader built for these dimensions, without creating anything.
+        :return: None when the tables are missing, were built for other dimensions or hold no tickets yet.
+        """
+        from psycopg import sql
+        if conn.execute("SELECT to_regclass(%s)", (quote_identifier(f"{self.prefix}_state"),)).fetchone()[0] is None:
+            return None
+        # read through to_jsonb so a state table from before the deletes_seen column reads as not built.
+        row = conn.execute(sql.SQL(
+            "SELECT watermark, dimensions, to_jsonb(s) ? 'deletes_seen', to_jsonb(s) ->> 'deletes_seen' "
+            "FROM {} s WHERE name = %s"
+        ).format(self.table("state")), (self.source,)).fetchone()
+        if row is None or row[0] is None or row[1] != ",".join(dimensions) or not row[2]:
+            return None
+        return row[0], row[3]
+
+    def _deletes_marker(self, conn) -> Optional[str]:
+        # the source table's delete counter and file node: a DELETE moves the first, a TRUNCATE the second.
+        return conn.execute(
+            "SELECT coalesce(s.n_tup_del, 0)::text || ':' || pg_relation_filenode(c.oid)::text FROM pg_class c "
+            "LEFT JOIN pg_stat_user_tables s ON s.relid = c.oid WHERE c.oid = to_regclass(%s)",
+            (quote_identifier(self.source),)
+        ).fetchone()[0]
+
+    def refresh(self, detect_deletes: bool = False, keys: Optional[List[str]] = None,
+                build: bool = True) -> Optional[Dict[str, Any]]:
+        """
+        Fold the tickets updated since the watermark into the rollups.
+        :param keys: tickets to fold in regardless of their "Updated", e.g. the keys a load merged.
+        :param detect_deletes: also remove tickets that disappeared from the source table (an anti-join over all
+            keys). Without it, deleted tickets are still looked for when the source table's delete marker moved.
+        :param build: create (or rebuild) the tables when they are missing or their dimensions changed, as the loader
+            does. Without it (the report path) nothing is created and tables the loader has not built are left alone.
+        :return: the number of changed and removed tickets, the new watermark and the seconds taken, or None when
+            the tables are not built and build is off.
+        """
+        from psycopg import sql
+        from connectors.db_connector import pooled_connection
+        from utils.result_cache import get_result_cache
+
+        start = time.perf_counter()
+        dimensions = self.dimensions()
+        dims = [sql.Identifier(d) for d in dimensions]
+        snapshot, source = self.table("tickets"), sql.Identifier(self.source)
+        changes, changed_keys = sql.Identifier(f"{self.prefix}_changes"), sql.Identifier(f"{self.prefix}_changed_keys")
+
+        def dim_list(alias: str = None):
+            return sql.SQL("").join(
+                sql.SQL(", {}").format(sql.Identifier(alias, d) if alias else sql.Identifier(d)) for d in dimensions
+            )
+
+        with self._lock, pooled_connection() as conn, conn.transaction():
+            conn.execute("SELECT set_config('statement_timeout', '0', true)")
+            # one refresh at a time across processes.
+            conn.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", (self.prefix,))
+            # read before the anti-join, so deletes committed while it runs move the marker for the next refresh.
+            deletes_marker = self._deletes_marker(conn)
+            if build:
+                watermark = self._ensure_tables(conn, dimensions)
+                deletes_seen = None
+            else:
+                state = self._built_state(conn, dimensions)
+                if state is None:
+                    self._built = False
+                    self._refreshed_at = time.time()
+                    return None
+                watermark, deletes_seen = state
+            detect_deletes = detect_deletes or watermark is None or deletes_seen != deletes_marker
+
+            # the latest version of every ticket updated at or after the watermark or passed in explicitly
+            # (re-folding a ticket is a no-op).
+            if watermark is None:
+                since = sql.SQL("")
+            elif keys:
+                since = sql.SQL(' WHERE "Updated" >= {} OR "Key"::text = ANY({}::text[])').format(
+                    sql.Literal(watermark), sql.Literal(list(keys))
+                )
+            else:
+                since = sql.SQL(' WHERE "Updated" >= {}').format(sql.Literal(watermark))
+            conn.execute(sql.SQL(
+                'CREATE TEMP TABLE {changes} ON COMMIT DROP AS SELECT DISTINCT ON ("Key") "Key"::text AS "Key", '
+                '"Created"::timestamp AS "Created", "Updated"::timestamp AS "Updated"{dims} FROM {source}{since} '
+                'ORDER BY "Key", "Updated" DESC NULLS LAST'
+            ).format(
+                changes=changes, source=source, since=since,
+                dims=sql.SQL("").join(
+                    sql.SQL(", coalesce({d}::text, '') AS {d}").format(d=d) for d in dims
+                ),
+            ))
+            conn.execute(sql.SQL('DELETE FROM {} WHERE "Key" IS NULL').format(changes))
+            conn.execute(sql.SQL('CREATE TEMP TABLE {} ON COMMIT DROP AS SELECT "Key" FROM {}').format(
+                changed_keys, changes
+            ))
+            removed = 0
+            if detect_deletes:
+                removed = conn.execute(sql.SQL(
+                    'INSERT INTO {keys} SELECT s."Key" FROM {snapshot} s '
+                    'WHERE NOT EXISTS (SELECT 1 FROM {source} t WHERE t."Key"::text = s."Key")'
+                ).format(keys=changed_keys, snapshot=snapshot, source=source)).rowcount
+            changed = conn.execute(sql.SQL("SELECT count(*) FROM {}").format(changes)).fetchone()[0]
+
+            if changed or removed:
+                for grain in GRAINS:
+                    rollup = self.table(grain)
+                    conn.execute(sql.SQL(
+                        "INSERT INTO {rollup} (period{dims}, ticket_count) "
+                        "SELECT coalesce(date_trunc({grain}, d.\"Created\"), {null_period}){d_dims}, sum(d.delta) FROM ("
+                        "  SELECT s.\"Created\"{s_dims}, -1 AS delta FROM {snapshot} s "
+                        "  WHERE s.\"Key\" IN (SELECT \"Key\" FROM {keys})"
+                        "  UNION ALL SELECT c.\"Created\"{c_dims}, 1 FROM {changes} c"
+                        ") d GROUP BY 1{d_dims} HAVING sum(d.delta) <> 0 "
+                        "ON CONFLICT (period{dims}) DO UPDATE SET ticket_count = {rollup}.ticket_count + EXCLUDED.ticket_count"
+                    ).format(
+                        rollup=rollup, grain=sql.Literal(grain), null_period=sql.Literal(NULL_PERIOD),
+                        dims=dim_list(), d_dims=dim_list("d"), s_dims=dim_list("s"), c_dims=dim_list("c"),
+                        snapshot=snapshot, keys=changed_keys, changes=changes,
+                    ))
+                    conn.execute(sql.SQL("DELETE FROM {} WHERE ticket_count = 0").format(rollup))
+
+                conn.execute(sql.SQL('DELETE FROM {} WHERE "Key" IN (SELECT "Key" FROM {})').format(
+                    snapshot, changed_keys
+                ))
+                conn.execute(sql.SQL(
+                    'INSERT INTO {snapshot} ("Key", "Created", "Updated"{dims}) '
+                    'SELECT "Key", "Created", "Updated"{dims} FROM {changes}'
+                ).format(snapshot=snapshot, changes=changes, dims=dim_list()))
+
+            new_watermark = conn.execute(sql.SQL(
+                'SELECT greatest({}::timestamp, (SELECT max("Updated") FROM {}))'
+            ).format(sql.Literal(watermark), changes)).fetchone()[0]
+            conn.execute(sql.SQL(
+                "INSERT INTO {} (name, watermark, dimensions, refreshed_at, deletes_seen) "
+                "VALUES (%s, %s, %s, now(), %s) "
+                "ON CONFLICT (name) DO UPDATE SET watermark = EXCLUDED.watermark, "
+                "dimensions = EXCLUDED.dimensions, refreshed_at = EXCLUDED.refreshed_at, "
+                "deletes_seen = EXCLUDED.deletes_seen"
+            ).format(self.table("state")), (self.source, new_watermark, ",".join(dimensions), deletes_marker))
+
+            self._unique_key = self._key_is_unique(conn)
+            self._built = True
+            self._dimensions = dimensions
+            self._refreshed_at = time.time()
+            self.refreshes += 1
+            self.refreshed_tickets += changed
+
+        if changed or removed:
+            get_result_cache().invalidate_tables([f"{self.prefix}_{grain}" for grain in GRAINS])
+        return {
+            "changed": changed,
+            "removed": removed,
+            "watermark": new_watermark,
+            "unique_key": self._unique_key,
+            "seconds": round(time.perf_counter() - start, 3),
+        }
+
+    def refresh_if_stale(self) -> bool:
+        """
+        Refresh at most once per refresh interval, without building the tables (the loader does).
+        :return: whether the rollups can be used.
+        """
+        if not self.params["enabled"]:
+            return False
+        if time.time() - self._refreshed_at < self.params["refresh_seconds"] and self._built is not None:
+            return self._built
+        try:
+            result = self.refresh(build=False)
+            if result and (result["changed"] or result["removed"]):
+                print(f"Refreshed the jira rollups: {result}")
+            return result is not None
+        except Exception as e:
+            print(f"Could not refresh the jira rollups, reports read {self.source}: {e}")
+            return False
+
+    # ----- report queries -----
+    def rollup_query(self, columns: List[str], grain: str) -> str:
+        """
+        The report query over a rollup table, with the same columns as raw_report_query.
+        """
+        select_list = [f"NULLIF({quote_identifier(c)}, '{NULL_DIMENSION}') AS {quote_identifier(c)}" for c in columns]
+        select_list.append(f"NULLIF(period, '{NULL_PERIOD}') AS period")
+        group_by_list = [quote_identifier(c) for c in columns] + ["period"]
+        return (
+            f"SELECT {', '.join(select_list)}, SUM(ticket_count)::bigint as agg_value "
+            f"FROM {quote_identifier(f'{self.prefix}_{grain}')} GROUP BY {', '.join(group_by_list)}"
+        )
+
+    def eligible(self, columns: List[str], grain: Optional[str], agg: str) -> bool:
+        """
+        Whether the rollups can answer a report: COUNT at a rollup grain over maintained dimensions only, with "Key"
+        unique in the source table (COUNT(*) counts rows, the rollups count keys).
+        """
+        dimensions = self._dimensions if self._dimensions is not None else self.params["dimensions"]
+        return (agg == "COUNT" and grain in GRAINS and all(c in dimensions for c in columns)
+                and self._unique_key is not False)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "refreshes": self.refreshes,
+            "refreshed_tickets": self.refreshed_tickets,
+            "rewrites": self.rewrites,
+            "fallbacks": self.fallbacks,
+        }
+
+
+def raw_report_query(columns: List[str], grain: Optional[str], agg: str = "COUNT", source: str = "jira_data") -> str:
+    """
+    The report query over the raw ticket table, as the sidebar has always built it.
+    """
+    time_group = f"DATE_TRUNC('{grain}', \"Created\")" if grain in GRAINS else "\"Created\""
+    group_by_list = [f'"{column}"' for column in columns] + [time_group]
+    select_list = [f'"{column}"' for column in columns] + [f"{time_group} as period"]
+
+    agg_col = columns[0] if columns else "Created"
+    agg_expr = "COUNT(*)" if agg == "COUNT" else f"{agg}(\"{agg_col}\")"
+    return f"SELECT {', '.join(select_list)}, {agg_expr} as agg_value FROM {source} GROUP BY {', '.join(group_by_list)}"
+
+
+def build_report_query(columns: List[str], grain: Optional[str], agg: str = "COUNT") -> str:
+    """
+    Build the inflow/outflow report query: the aggregate per selected columns and "Created" period.
+    COUNT reports over the rollup dimensions at week/month/quarter grain read the rollup tables, anything else (or
+    rollups that cannot be refreshed) the raw table.
+    :param columns: the jira_data columns to group by.
+    :param grain: "week", "month" or "quarter" (see AGGREGATE_BY_GRAINS), anything else groups by the raw timestamp.
+    :param agg: the aggregate function.
+    """
+    rollups = get_jira_rollups()
+    # eligibility is checked again after the refresh, which resolves the dimensions present in the source table and
+    # whether "Key" is unique.
+    if rollups.eligible(columns, grain, agg) and rollups.refresh_if_stale() and rollups.eligible(columns, grain, agg):
+        rollups.rewrites += 1
+        return rollups.rollup_query(columns, grain)
+    rollups.fallbacks += 1
+    return raw_report_query(columns, grain, agg, source=rollups.source)
+
+
+_JIRA_ROLLUPS = None
+_JIRA_ROLLUPS_LOCK = threading.Lock()
+
+
+def get_jira_rollups() -> JiraRollups:
+    """
+    Return the process-wide jira rollups.
+    """
+    global _JIRA_ROLLUPS
+    with _JIRA_ROLLUPS_LOCK:
+        if _JIRA_ROLLUPS is None:
+            _JIRA_ROLLUPS = JiraRollups()
+        return _JIRA_ROLLUPS
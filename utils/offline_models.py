@@ -0,0 +1,231 @@
+"""
+Offline, deterministic stand-ins for the watsonx chat and embedding models.
+They let the whole supervisor graph run without network access for benchmarking and regression testing, and are
+selected through Config.offline_backend_params or the LLM_BACKEND / EMBEDDING_BACKEND environment variables.
+"""
+
+from typing import Any, Dict, Iterator, AsyncIterator, List, Optional, Sequence, Tuple
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage, HumanMessage, SystemMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+from config import Config
+from utils.state_projection import count_tokens
+import asyncio
+import hashlib
+import math
+import time
+import os
+import re
+
+
+FAKE_BACKEND = "fake"
+WATSONX_BACKEND = "watsonx"
+
+
+def llm_backend() -> str:
+    return os.environ.get("LLM_BACKEND", Config.offline_backend_params["llm_backend"]).lower()
+
+
+def embedding_backend() -> str:
+    return os.environ.get("EMBEDDING_BACKEND", Config.offline_backend_params["embedding_backend"]).lower()
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Rule-based chat model with configurable latency and completion length.
+    - with tools bound it calls the first tool, which is how the agents pick their next node;
+    - the supervisor routing prompt is answered with the best route of the local intent router;
+    - the sql generation prompt is answered with a fixed query;
+    - anything else is answered from the scripted responses, or with a deterministic echo of the user input.
+    """
+
+    model_id: str = "offline/fake-chat"
+    latency_seconds: float = 0.05
+    seconds_per_token: float = 0.0
+    completion_tokens: Optional[int] = None
+    scripted_responses: List[Tuple[str, str]] = []
+    sql_response: str = Config.offline_backend_params["fake_llm"]["sql_response"]
+
+    @property
+    def _llm_type(self) -> str:
+        return "offline-fake-chat"
+
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        return {"model_id": self.model_id}
+
+    def _get_ls_params(self, stop: Optional[List[str]] = None, **kwargs):
+        params = super()._get_ls_params(stop=stop, **kwargs)
+        params["ls_model_name"] = self.model_id
+        return params
+
+    def bind_tools(self, tools: Sequence[Any], **kwargs):
+        return self.bind(tools=[convert_to_openai_tool(t) for t in tools], **kwargs)
+
+    # ----- rules -----
+    @staticmethod
+    def _split(messages: List[BaseMessage]) -> Tuple[str, str]:
+        system = next((m.content for m in messages if isinstance(m, SystemMessage)), "")
+        human = next((m.content for m in reversed(messages) if isinstance(m, HumanMessage)), "")
+        return str(system), str(human)
+
+    @staticmethod
+    def _route(user_input: str) -> str:
+        from utils.intent_router import get_intent_router
+        ranked = sorted(get_intent_router().scores(user_input).items(), key=lambda item: item[1], reverse=True)
+        return ranked[0][0] if ranked and ranked[0][1] > 0 else "unknown"
+
+    def _reply(self, messages: List[BaseMessage], tools: Optional[List[Dict]] = None) -> AIMessage:
+        system, human = self._split(messages)
+
+        if tools:
+            name = tools[0]["function"]["name"]
+            return AIMessage(content="", tool_calls=[{"name": name, "args": {}, "id": f"call_{name}"}])
+
+        if system.startswith("You are a Supervisor Agent"):
+            return AIMessage(content=self._route(human))
+        if "PostgreSQL query generator" in system:
+            return AIMessage(content=self.sql_response)
+
+        for pattern, response in self.scripted_responses:
+            if re.search(pattern, human, flags=re.IGNORECASE):
+                return AIMessage(content=response)
+
+        content = f"Offline answer to: {human}"
+        if self.completion_tokens:
+            # pad (or cut) the answer to the configured completion length.
+            words = content.split()
+            while count_tokens(" ".join(words)) < self.completion_tokens:
+                words.append("lorem")
+            content = " ".join(words)
+            while count_tokens(content) > self.completion_tokens and " " in content:
+                content = content.rsplit(" ", 1)[0]
+        return AIMessage(content=content)
+
+    def _usage(self, messages: List[BaseMessage], content: str) -> Dict[str, int]:
+        prompt_tokens = sum(count_tokens(str(m.content)) for m in messages)
+        completion_tokens = count_tokens(content)
+        return {
+            "input_tokens": prompt_tokens,
+            "output_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        }
+
+    def _delay(self, content: str) -> float:
+        return self.latency_seconds + self.seconds_per_token * count_tokens(content)
+
+    def _result(self, messages: List[BaseMessage], message: AIMessage) -> ChatResult:
+        usage = self._usage(messages, message.content)
+        message.usage_metadata = usage
+        return ChatResult(
+            generations=[ChatGeneration(message=message)],
+            llm_output={
+                "model_name": self.model_id,
+                "token_usage": {"prompt_tokens": usage["input_tokens"], "completion_tokens": usage["output_tokens"]},
+            },
+        )
+
+    # ----- generation -----
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> ChatResult:
+        message = self._reply(messages, kwargs.get("tools"))
+        time.sleep(self._delay(message.content))
+        return self._result(messages, message)
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager: Optional[AsyncCallbackManagerForLLMRun] = None, **kwargs: Any) -> ChatResult:
+        message = self._reply(messages, kwargs.get("tools"))
+        await asyncio.sleep(self._delay(message.content))
+        return self._result(messages, message)
+
+    def _chunks(self, messages: List[BaseMessage], content: str) -> Iterator[ChatGenerationChunk]:
+        pieces = re.findall(r"\S+\s*|\s+", content) or [""]
+        for i, piece in enumerate(pieces):
+            chunk = AIMessageChunk(content=piece)
+            if i == len(pieces) - 1:
+                chunk.usage_metadata = self._usage(messages, content)
+            yield ChatGenerationChunk(message=chunk)
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        content = self._reply(messages).content
+        time.sleep(self.latency_seconds)
+        for chunk in self._chunks(messages, content):
+            time.sleep(self.seconds_per_token)
+            if run_manager:
+                run_manager.on_llm_new_token(chunk.message.content, chunk=chunk)
+            yield chunk
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                       run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+                       **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        content = self._reply(messages).content
+        await asyncio.sleep(self.latency_seconds)
+        for chunk in self._chunks(messages, content):
+            await asyncio.sleep(self.seconds_per_token)
+            if run_manager:
+                await run_manager.on_llm_new_token(chunk.message.content, chunk=chunk)
+            yield chunk
+
+
+class HashingEmbeddings(Embeddings):
+    def __init__(self, dimension: int = 768):
+        """
+        Deterministic feature-hashing embedder, with the same dimension as ibm/slate-125m-english-rtrvr.
+        Word unigrams, bigrams and character trigrams are hashed into signed buckets and the vector is L2 normalized,
+        so texts sharing vocabulary land close together.
+        :param dimension: the embedding dimension.
+        """
+        self.dimension = dimension
+
+    @staticmethod
+    def _features(text: str) -> List[str]:
+        words = re.findall(r"[a-z0-9]+(?:\.[a-z0-9]+)*", (text or "").lower())
+        features = [f"w:{w}" for w in words]
+        features += [f"b:{a} {b}" for a, b in zip(words, words[1:])]
+        for w in words:
+            padded = f"#{w}#"
+            features += [f"c:{padded[i:i + 3]}" for i in range(len(padded) - 2)]
+        return features
+
+    def embed_query(self, text: str) -> List[float]:
+        vector = [0.0] * self.dimension
+        for feature in self._features(text):
+            digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+            bucket = int.from_bytes(digest[:4], "little") % self.dimension
+            weight = 0.5 if feature.startswith("c:") else 1.0
+            vector[bucket] += weight if digest[4] & 1 else -weight
+        norm = math.sqrt(sum(v * v for v in vector))
+        return [v / norm for v in vector] if norm else vector
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self.embed_query(text) for text in texts]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return self.embed_query(text)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embed_documents(texts)
+
+
+def get_fake_llm(config: Dict) -> FakeChatModel:
+    """
+    Build the offline chat model for an agent config.
+    :param config: the agent config dict, only its model_id is used (to label the metrics).
+    """
+    params = Config.offline_backend_params["fake_llm"]
+    return FakeChatModel(
+        model_id=f"offline/{config['model_id']}",
+        latency_seconds=params["latency_seconds"],
+        seconds_per_token=params["seconds_per_token"],
+        completion_tokens=params["completion_tokens"],
+        scripted_responses=[tuple(rule) for rule in params["scripted_responses"]],
+        sql_response=params["sql_response"],
+    )
+
+
+def get_hashing_embeddings() -> HashingEmbeddings:
+    return HashingEmbeddings(Config.offline_backend_params["embedding_dimension"])
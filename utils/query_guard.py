@@ -0,0 +1,143 @@
+"""
+Pre-execution guard for llm-generated SQL.
+Every query is planned with EXPLAIN (FORMAT JSON) before it runs. Plans estimated above the configured cost or row
+limits are either rewritten with a LIMIT (when that brings them under the limits) or rejected with a structured
+error the agent can act on, and the query itself runs in a read-only transaction with its own statement_timeout and
+work_mem.
+"""
+
+from typing import Any, Dict, Optional
+from config import Config
+import threading
+import re
+
+
+def strip_statement(query: str) -> str:
+    """
+    Trim whitespace and trailing semicolons, so a query can be wrapped or prefixed with EXPLAIN.
+    """
+    return re.sub(r"[\s;]+$", "", (query or "").strip())
+
+
+def limit_query(query: str, limit: int) -> str:
+    return f"SELECT * FROM (\n{strip_statement(query)}\n) AS guarded_query LIMIT {int(limit)}"
+
+
+EXPLAIN_PREFIX = "EXPLAIN (FORMAT JSON) "
+
+
+def plan_estimates(explain_output: Any) -> Dict[str, Any]:
+    """
+    The root node estimates of an EXPLAIN (FORMAT JSON) result.
+    """
+    plan = explain_output[0]["Plan"]
+    return {
+        "node_type": plan.get("Node Type"),
+        "total_cost": float(plan.get("Total Cost", 0.0)),
+        "plan_rows": int(plan.get("Plan Rows", 0)),
+    }
+
+
+class QueryGuard:
+    def __init__(self, params: Dict[str, Any] = None):
+        """
+        Decides from the planner estimates whether a query may run, may run with a LIMIT, or is rejected.
+        :param params: the guard config, defaults to Config.query_guard_params.
+        """
+        self.params = params or Config.query_guard_params
+        self._lock = threading.Lock()
+        self.checked = 0
+        self.rewritten = 0
+        self.rejected = 0
+
+    def violation(self, estimates: Dict[str, Any]) -> Optional[str]:
+        """
+        The limit a plan exceeds, or None.
+        """
+        if estimates["total_cost"] > self.params["max_total_cost"]:
+            return "max_total_cost"
+        if estimates["plan_rows"] > self.params["max_plan_rows"]:
+            return "max_plan_rows"
+        return None
+
+    def transaction_setup(self):
+        """
+        The (statement, params) pairs opening a guarded transaction: read-only, with transaction-local
+        statement_timeout and work_mem.
+        """
+        statements = [("SET TRANSACTION READ ONLY", None)] if self.params["read_only"] else []
+        for name, value in (("statement_timeout", self.params["statement_timeout_ms"]),
+                            ("work_mem", self.params["work_mem"])):
+            statements.append(("SELECT set_config(%s, %s, true)", (name, str(value))))
+        return statements
+
+    def decide(self, query: str, estimates: Dict[str, Any], rewritten: bool = False):
+        """
+        Decide what to do with a planned query.
+        :param query: the query that was planned.
+        :param estimates: its plan_estimates.
+        :param rewritten: whether the query already is the LIMIT rewrite of the original.
+        :return: ("run", query), ("rewrite", the query with a LIMIT, to be planned again) or ("reject", error dict).
+        """
+        reason = self.violation(estimates)
+        if reason is None:
+            self.record("rewritten" if rewritten else "ok")
+            return "run", query
+        if not rewritten and self.params["rewrite_with_limit"]:
+            return "rewrite", limit_query(query, self.params["limit_rows"])
+        self.record("rejected")
+        return "reject", self.rejection(query, estimates, reason)
+
+    def rejection(self, query: str, estimates: Dict[str, Any], reason: str) -> Dict[str, Any]:
+        """
+        The structured error returned to the agent in place of a result.
+        """
+        return {
+            "status": "error",
+            "error_type": "query_guard",
+            "error": (
+                f"Query rejected before execution: the planner estimates {estimates['plan_rows']} rows at cost "
+                f"{estimates['total_cost']:.0f}, above the {reason} limit."
+            ),
+            "reason": reason,
+            "estimates": estimates,
+            "limits": {"max_total_cost": self.params["max_total_cost"], "max_plan_rows": self.params["max_plan_rows"]},
+            "hint": "Add filters or aggregate (GROUP BY / COUNT) instead of returning raw rows, and avoid cross joins.",
+            "query": query,
+        }
+
+    def write_rejection(self, query: str) -> Dict[str, Any]:
+        self.record("rejected")
+        return {
+            "status": "error",
+            "error_type": "query_guard",
+            "error": "Query rejected: only read queries (SELECT / WITH) can run in the read-only agent transaction.",
+            "reason": "read_only",
+            "query": query,
+        }
+
+    def record(self, outcome: str):
+        with self._lock:
+            self.checked += 1
+            if outcome == "rewritten":
+                self.rewritten += 1
+            elif outcome == "rejected":
+                self.rejected += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {"checked": self.checked, "rewritten": self.rewritten, "rejected": self.rejected}
+
+
+_QUERY_GUARD = None
+_QUERY_GUARD_LOCK = threading.Lock()
+
+
+def get_query_guard() -> QueryGuard:
+    """
+    Return the process-wide query guard.
+    """
+    global _QUERY_GUARD
+    with _QUERY_GUARD_LOCK:
+        if _QUERY_GUARD is None:
+            _QUERY_GUARD = QueryGuard()
+        return _QUERY_GUARD
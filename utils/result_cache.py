@@ -0,0 +1,234 @@
+"""
+Cache of Postgres read query results.
+Queries are keyed by their pglast parse-tree fingerprint together with their literal values, output column names
+(which the fingerprint leaves out) and bound parameters, so whitespace, keyword case and comments do not matter. Entries are dropped per table when a write touching that table
+goes through the connector, or when the table's modification counters in pg_stat_user_tables change (writes made by
+other processes), on top of the LRU/TTL bounds.
+"""
+
+from typing import Any, Dict, FrozenSet, Optional, Set, Tuple
+from config import Config
+from utils.caching import LRUTTLCache
+from pglast.parser import fingerprint, parse_sql_json, scan
+import threading
+import hashlib
+import json
+import time
+import re
+
+
+# functions whose result changes between executions, so their queries are never cached.
+VOLATILE_FUNCTIONS = {
+    "now", "random", "clock_timestamp", "statement_timestamp", "transaction_timestamp", "timeofday",
+    "nextval", "currval", "setval", "gen_random_uuid", "uuid_generate_v4", "pg_sleep",
+}
+LITERAL_TOKENS = {"SCONST", "ICONST", "FCONST", "BCONST", "XCONST", "USCONST"}
+
+COUNTERS_QUERY = """
+SELECT relname, n_tup_ins + n_tup_upd + n_tup_del
+FROM pg_stat_user_tables
+WHERE schemaname = %s
+"""
+
+CacheKey = Tuple[str, FrozenSet[str]]
+
+
+def _positional_placeholders(query: str) -> str:
+    # psycopg placeholders are not SQL; $n parameters parse (and fingerprint) the same way. Only for queries executed
+    # with parameters: without them psycopg sends the text as it is, %% included.
+    counter = iter(range(1, 10_000))
+    query = re.sub(r"%\(\w+\)s|%s", lambda _: f"${next(counter)}", query)
+    return query.replace("%%", "%")
+
+
+def _walk(node: Any, found: Dict[str, Set[str]]):
+    if isinstance(node, dict):
+        for name, value in node.items():
+            # RangeVar nodes are unwrapped where the field can only hold one (the target of INSERT/UPDATE/DELETE).
+            if name in ("RangeVar", "relation") and isinstance(value, dict) and value.get("relname"):
+                found["tables"].add(value["relname"])
+            elif name == "CommonTableExpr" and isinstance(value, dict) and value.get("ctename"):
+                found["ctes"].add(value["ctename"])
+            elif name == "ResTarget" and isinstance(value, dict) and value.get("name"):
+                # output column names (SELECT count(*) AS n) are not part of the fingerprint.
+                found["names"].append(value["name"])
+            elif name == "alias" and isinstance(value, dict) and value.get("colnames"):
+                found["names"].append([(c.get("String") or {}).get("sval", (c.get("String") or {}).get("str"))
+                                       for c in value["colnames"]])
+            elif name == "SQLValueFunction":
+                found["volatile"].add("sql_value_function")
+            elif name in ("intoClause", "lockingClause"):
+                # SELECT ... INTO creates a table and FOR UPDATE takes locks: both must run every time.
+                found["volatile"].add(name)
+            elif name == "FuncCall" and isinstance(value, dict):
+                for part in value.get("funcname", []):
+                    function = (part.get("String") or {}).get("sval") or (part.get("String") or {}).get("str")
+                    if function in VOLATILE_FUNCTIONS:
+                        found["volatile"].add(function)
+            _walk(value, found)
+    elif isinstance(node, list):
+        for value in node:
+            _walk(value, found)
+
+
+def analyze_query(query: str, has_params: bool = True) -> Optional[Dict[str, Any]]:
+    """
+    Parse a query with pglast.
+    :param has_params: whether the query is executed with parameters (its %s / %% are psycopg placeholders).
+    :return: {"fingerprint", "literals", "names", "tables", "statements", "volatile"}, or None when it does not parse.
+    """
+    try:
+        text = _positional_placeholders(str(query)) if has_params else str(query)
+        stmts = json.loads(parse_sql_json(text)).get("stmts", [])
+        found = {"tables": set(), "ctes": set(), "volatile": set(), "names": []}
+        _walk(stmts, found)
+        literals = [text[token.start:token.end + 1] for token in scan(text) if token.name in LITERAL_TOKENS]
+        return {
+            "fingerprint": fingerprint(text),
+            "literals": literals,
+            "names": found["names"],
+            "tables": found["tables"] - found["ctes"],
+            "statements": [next(iter(stmt["stmt"])) for stmt in stmts],
+            "volatile": found["volatile"],
+        }
+    except Exception:
+        return None
+
+
+class QueryResultCache:
+    def __init__(self, params: Dict[str, Any] = None):
+        """
+        Read query result cache with per-table invalidation.
+        :param params: the cache config, defaults to Config.result_cache_params.
+        """
+        self.params = params or Config.result_cache_params
+        self.memory = LRUTTLCache(max_entries=self.params["max_entries"], ttl_seconds=self.params["ttl_seconds"])
+
+        self._lock = threading.Lock()
+        self._keys_by_table: Dict[str, Set[str]] = {}
+        self._counters: Optional[Dict[str, int]] = None
+        self._polled_at = 0.0
+
+        self.uncacheable = 0
+        self.invalidations = 0
+        self.counter_polls = 0
+
+    def key(self, query: str, params: Any = None, variant: Any = None) -> Optional[CacheKey]:
+        """
+        The cache key of a read query, or None when it cannot be cached (parse error, volatile functions,
+        several statements).
+        :param query: the sql text.
+        :param params: the bound parameters.
+        :param variant: anything else the result depends on, e.g. the calling method and its row cap.
+        """
+        if not self.params["enabled"] or not isinstance(query, str):
+            return None
+        # the connector executes read queries with `params or None`.
+        analysis = analyze_query(query, has_params=bool(params))
+        if analysis is None or analysis["volatile"] or analysis["statements"] != ["SelectStmt"]:
+            self.uncacheable += 1
+            return None
+        material = json.dumps([analysis["fingerprint"], analysis["literals"], analysis["names"], params, variant],
+                              default=str)
+        return hashlib.sha256(material.encode("utf-8")).hexdigest(), frozenset(analysis["tables"])
+
+    # ----- invalidation -----
+    def invalidate_tables(self, tables):
+        with self._lock:
+            for table in tables:
+                for key in self._keys_by_table.pop(table, set()):
+                    if self.memory.pop(key) is not None:
+                        self.invalidations += 1
+
+    def invalidate_all(self):
+        with self._lock:
+            self.invalidations += len(self.memory)
+            self.memory.clear()
+            self._keys_by_table.clear()
+
+    def note_write(self, query: str):
+        """
+        Drop the results of every table a write statement (or DDL) touches; everything when it does not parse.
+        """
+        if not self.params["enabled"]:
+            return
+        analysis = analyze_query(query) if isinstance(query, str) else None
+        if analysis is None or not analysis["tables"]:
+            self.invalidate_all()
+        else:
+            self.invalidate_tables(analysis["tables"])
+
+    def _read_counters(self) -> Dict[str, int]:
+        from connectors.db_connector import pooled_connection
+        with pooled_connection() as conn, conn.cursor() as cur:
+            cur.execute(COUNTERS_QUERY, (Config.schema_catalog_params["schema"],))
+            return {table: int(count or 0) for table, count in cur.fetchall()}
+
+    def poll_counters(self, force: bool = False):
+        """
+        Compare the per-table modification counters with the last poll (at most once per poll interval) and
+        invalidate the tables that changed.
+        """
+        if not force and time.time() - self._polled_at < self.params["counter_poll_seconds"]:
+            return
+        self._polled_at = time.time()
+        try:
+            counters = self._read_counters()
+            self.counter_polls += 1
+        except Exception as e:
+            print(f"Could not poll the table modification counters: {e}")
+            return
+        if self._counters is not None:
+            changed = [table for table, count in counters.items() if self._counters.get(table) != count]
+            if changed:
+                self.invalidate_tables(changed)
+        self._counters = counters
+
+    # ----- access -----
+    def get(self, key: Optional[CacheKey]) -> Optional[Any]:
+        if key is None:
+            return None
+        self.poll_counters()
+        return self.memory.get(key[0])
+
+    def set(self, key: Optional[CacheKey], value: Any, rows: int = 0):
+        """
+        Store a result, unless it has more rows than max_cached_rows.
+        """
+        if key is None or rows > self.params["max_cached_rows"]:
+            return
+        digest, tables = key
+        with self._lock:
+            self.memory.set(digest, value)
+            for table in tables:
+                keys = self._keys_by_table.setdefault(table, set())
+                keys.add(digest)
+                if len(keys) > 2 * self.params["max_entries"]:
+                    # forget the keys the LRU already evicted.
+                    live = {key for key, _ in self.memory.items()}
+                    self._keys_by_table[table] = keys & live
+
+    def stats(self) -> Dict[str, Any]:
+        stats = self.memory.stats()
+        stats.update({
+            "uncacheable": self.uncacheable,
+            "invalidations": self.invalidations,
+            "counter_polls": self.counter_polls,
+            "tables": len(self._keys_by_table),
+        })
+        return stats
+
+
+_RESULT_CACHE = None
+_RESULT_CACHE_LOCK = threading.Lock()
+
+
+def get_result_cache() -> QueryResultCache:
+    """
+    Return the process-wide query result cache.
+    """
+    global _RESULT_CACHE
+    with _RESULT_CACHE_LOCK:
+        if _RESULT_CACHE is None:
+            _RESULT_CACHE = QueryResultCache()
+        return _RESULT_CACHE
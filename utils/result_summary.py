@@ -0,0 +1,180 @@
+"""
+Compact summaries of SQL results before they enter the AgentState.
+Large result sets are replaced by their row count, column types, the first rows, per-column statistics and the most
+frequent categorical values, computed column-wise with pandas. The full rows are kept out-of-band in a ResultStore and
+referenced by handle, so charts and exports can still read them without the rows ever being serialized into a prompt.
+"""
+
+from typing import Any, Dict, List, Optional
+from decimal import Decimal
+from config import Config
+from utils.caching import LRUTTLCache
+import pandas as pd
+import threading
+import uuid
+
+
+class ResultStore:
+    def __init__(self, max_entries: int = 100, ttl_seconds: Optional[float] = None):
+        """
+        In-memory, size-bounded store of full query results, addressed by opaque handles.
+        :param max_entries: the number of result sets kept before the least recently used one is evicted.
+        :param ttl_seconds: the age after which a result set is dropped. None disables expiry.
+        """
+        self.memory = LRUTTLCache(max_entries=max_entries, ttl_seconds=ttl_seconds)
+
+    def put(self, rows: List[Dict[str, Any]], query: Optional[str] = None) -> str:
+        """
+        Store a result set and return its handle.
+        """
+        handle = f"result:{uuid.uuid4().hex[:16]}"
+        self.memory.set(handle, {"query": query, "rows": rows})
+        return handle
+
+    def get(self, handle: str) -> Optional[List[Dict[str, Any]]]:
+        """
+        The full rows of a handle, or None once they were evicted.
+        """
+        entry = self.memory.get(handle)
+        return entry["rows"] if entry else None
+
+    def dataframe(self, handle: str) -> Optional[pd.DataFrame]:
+        rows = self.get(handle)
+        return pd.DataFrame.from_records(rows) if rows is not None else None
+
+    def stats(self) -> Dict[str, Any]:
+        return self.memory.stats()
+
+
+def _to_python(value: Any) -> Any:
+    # numpy scalars and timestamps are not JSON serializable.
+    if value is None or (isinstance(value, float) and value != value):
+        return None
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    if hasattr(value, "item"):
+        value = value.item()
+    if isinstance(value, float):
+        return round(value, 4)
+    return value
+
+
+def _numeric_decimals(frame: pd.DataFrame) -> pd.DataFrame:
+    """
+    postgres numeric columns arrive as Decimal objects; convert them so they get numeric statistics.
+    """
+    for column in frame.columns[frame.dtypes == object]:
+        sample = frame[column].dropna()
+        if not sample.empty and isinstance(sample.iloc[0], Decimal):
+            frame[column] = pd.to_numeric(frame[column], errors="coerce")
+    return frame
+
+
+def describe_frame(frame: pd.DataFrame, top_k: int = 5, max_value_length: int = 60) -> Dict[str, Any]:
+    """
+    Per-column statistics of a result frame.
+    :return: {"columns": {name: dtype}, "nulls": {...}, "stats": {numeric and datetime min/max/mean/std},
+        "top_values": {categorical column: {value: count}}}
+    """
+    frame = _numeric_decimals(frame)
+    nulls = frame.isna().sum()
+
+    numeric = frame.select_dtypes(include="number", exclude="bool")
+    stats: Dict[str, Dict[str, Any]] = {}
+    if not numeric.empty:
+        aggregated = numeric.agg(["min", "max", "mean", "std"])
+        for column in numeric.columns:
+            stats[column] = {name: _to_python(value) for name, value in aggregated[column].items()}
+
+    datetimes = frame.select_dtypes(include=["datetime", "datetimetz"])
+    if not datetimes.empty:
+        low, high = datetimes.min(), datetimes.max()
+        for column in datetimes.columns:
+            stats[column] = {"min": _to_python(low[column]), "max": _to_python(high[column])}
+
+    top_values: Dict[str, Dict[str, int]] = {}
+    for column in frame.columns.difference(list(stats), sort=False):
+        values = frame[column].dropna()
+        if values.empty:
+            continue
+        counts = values.astype(str).value_counts()
+        # all-distinct columns (ids, free text) have no informative top values.
+        if counts.iloc[0] <= 1:
+            continue
+        top_values[column] = {
+            value[:max_value_length]: int(count) for value, count in counts.head(top_k).items()
+        }
+
+    return {
+        "columns": {column: str(dtype) for column, dtype in frame.dtypes.items()},
+        "nulls": {column: int(count) for column, count in nulls.items() if count},
+        "stats": stats,
+        "top_values": top_values,
+    }
+
+
+def summarize_result(response: Any, query: Optional[str] = None, params: Dict[str, Any] = None) -> Any:
+    """
+    Replace the rows of a large run_query response by a compact summary, storing the full rows in the ResultStore.
+    Small results, errors and write statements are returned unchanged.
+    :param response: the run_query response.
+    :param query: the sql that produced it, kept with the stored rows.
+    :param params: the summary config, defaults to Config.result_summary_params.
+    :return: the response, or {"status", "type", "summarized", "result_handle", "row_count", "truncated", "columns",
+        "head", "nulls", "stats", "top_values"}.
+    """
+    params = params or Config.result_summary_params
+    if not params["enabled"] or not isinstance(response, dict) or response.get("status") != "ok":
+        return response
+    rows = response.get("data")
+    if not isinstance(rows, list) or len(rows) <= params["inline_rows"] or not isinstance(rows[0], dict):
+        return response
+
+    handle = get_result_store().put(rows, query)
+    try:
+        description = describe_frame(
+            pd.DataFrame.from_records(rows), top_k=params["top_k"], max_value_length=params["max_value_length"]
+        )
+    except Exception as e:
+        print(f"Could not summarize the query result: {e}")
+        description = {"columns": {column: None for column in rows[0]}}
+
+    columns = list(description["columns"])
+    summary = {
+        "status": "ok",
+        "type": response.get("type", "select"),
+        "summarized": True,
+        "result_handle": handle,
+        "row_count": response.get("row_count", len(rows)),
+        "truncated": response.get("truncated", False),
+        "head": [[row.get(column) for column in columns] for row in rows[:params["head_rows"]]],
+    }
+    summary.update(description)
+    return summary
+
+
+def result_rows(response: Any) -> Optional[List[Dict[str, Any]]]:
+    """
+    The full rows behind a run_query response, whether it was summarized or not.
+    """
+    if not isinstance(response, dict):
+        return None
+    if response.get("result_handle"):
+        return get_result_store().get(response["result_handle"])
+    return response.get("data")
+
+
+_RESULT_STORE = None
+_RESULT_STORE_LOCK = threading.Lock()
+
+
+def get_result_store() -> ResultStore:
+    """
+    Return the process-wide result store.
+    """
+    global _RESULT_STORE
+    with _RESULT_STORE_LOCK:
+        if _RESULT_STORE is None:
+            params = Config.result_summary_params
+            _RESULT_STORE = ResultStore(max_entries=params["store_max_entries"], ttl_seconds=params["store_ttl_seconds"])
+        return _RESULT_STORE
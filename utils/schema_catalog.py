@@ -0,0 +1,204 @@
+"""
+Cached live schema catalog for the SQL generator prompt and the schema tools.
+The table/column/type/index metadata is introspected once, kept in memory (and in a local snapshot so restarts skip the
+introspection), and only refreshed when a cheap checksum of the system catalog, polled on an interval, changes.
+"""
+
+from typing import Any, Dict, List, Optional
+from config import Config
+from prompt_reference.postgres_agent_prompts import sql_schema_fallback
+import threading
+import hashlib
+import json
+import time
+import os
+
+
+# one round trip summarising every column, type and index of the schema; changes with any DDL that matters to prompts.
+# (%% escapes the format() placeholders from psycopg's own parameters.)
+CHECKSUM_QUERY = """
+SELECT md5(
+    coalesce((
+        SELECT string_agg(format('%%s.%%s:%%s', c.relname, a.attname, format_type(a.atttypid, a.atttypmod)), ','
+                          ORDER BY c.relname, a.attnum)
+        FROM pg_attribute a
+        JOIN pg_class c ON c.oid = a.attrelid
+        JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE n.nspname = %(schema)s AND c.relkind IN ('r', 'v', 'm', 'p') AND a.attnum > 0 AND NOT a.attisdropped
+    ), '') || '|' ||
+    coalesce((
+        SELECT string_agg(indexdef, ',' ORDER BY indexname) FROM pg_indexes WHERE schemaname = %(schema)s
+    ), '')
+)
+"""
+
+COLUMNS_QUERY = """
+SELECT table_name, column_name, data_type
+FROM information_schema.columns
+WHERE table_schema = %(schema)s
+ORDER BY table_name, ordinal_position
+"""
+
+INDEXES_QUERY = """
+SELECT tablename, indexname, indexdef
+FROM pg_indexes
+WHERE schemaname = %(schema)s
+ORDER BY tablename, indexname
+"""
+
+
+def quote_identifier(identifier: str) -> str:
+    """
+    Quote an identifier the way postgres needs it: plain lowercase names as they are, anything else in double quotes.
+    """
+    if identifier.isidentifier() and identifier == identifier.lower():
+        return identifier
+    return '"' + identifier.replace('"', '""') + '"'
+
+
+class SchemaCatalog:
+    def __init__(self, params: Dict[str, Any] = None):
+        """
+        Introspects the database schema once and serves it from memory until the catalog checksum changes.
+        :param params: the catalog config, defaults to Config.schema_catalog_params.
+        """
+        self.params = params or Config.schema_catalog_params
+        self.schema = self.params["schema"]
+        self.poll_seconds = self.params["poll_seconds"]
+
+        self._lock = threading.Lock()
+        self.tables: Dict[str, Dict[str, Any]] = {}
+        self.checksum: Optional[str] = None
+        self._checked_at = 0.0
+        self._rendered: Optional[str] = None
+
+        self.introspections = 0
+        self.checksum_polls = 0
+        self._load_snapshot()
+
+    # ----- snapshot -----
+    def _load_snapshot(self):
+        path = self.params["snapshot_path"]
+        if not path or not os.path.exists(path):
+            return
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                snapshot = json.load(f)
+            if snapshot.get("schema") == self.schema:
+                self.tables = snapshot["tables"]
+                self.checksum = snapshot["checksum"]
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Could not load the schema catalog snapshot: {e}")
+
+    def _save_snapshot(self):
+        path = self.params["snapshot_path"]
+        if not path:
+            return
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"schema": self.schema, "checksum": self.checksum, "tables": self.tables}, f)
+
+    # ----- introspection -----
+    def _query(self, query: str):
+        from connectors.db_connector import pooled_connection
+        with pooled_connection() as conn, conn.cursor() as cur:
+            cur.execute(query, {"schema": self.schema})
+            return cur.fetchall()
+
+    def _introspect(self, checksum: str):
+        tables: Dict[str, Dict[str, Any]] = {}
+        for table, column, data_type in self._query(COLUMNS_QUERY):
+            tables.setdefault(table, {"columns": [], "indexes": []})["columns"].append([column, data_type])
+        if self.params["include_indexes"]:
+            for table, _, index_def in self._query(INDEXES_QUERY):
+                if table in tables:
+                    tables[table]["indexes"].append(index_def)
+
+        self.tables = tables
+        self.checksum = checksum
+        self._rendered = None
+        self.introspections += 1
+        self._save_snapshot()
+
+    def refresh(self, force: bool = False):
+        """
+        Poll the catalog checksum (at most once per poll interval unless forced) and re-introspect if it changed.
+        Errors leave the current (or fallback) schema in place.
+        """
+        with self._lock:
+            if not force and time.time() - self._checked_at < self.poll_seconds:
+                return
+            try:
+                checksum = self._query(CHECKSUM_QUERY)[0][0]
+                self.checksum_polls += 1
+                if force or checksum != self.checksum or not self.tables:
+                    self._introspect(checksum)
+            except Exception as e:
+                print(f"Could not refresh the schema catalog: {e}")
+            self._checked_at = time.time()
+
+    # ----- access -----
+    def get_tables(self) -> Dict[str, Dict[str, Any]]:
+        """
+        The cached {table: {"columns": [[name, type], ...], "indexes": [indexdef, ...]}} metadata.
+        """
+        self.refresh()
+        return self.tables
+
+    def fingerprint(self) -> str:
+        """
+        A short id of the current schema, used to key caches of schema-dependent results (e.g. generated SQL).
+        """
+        self.refresh()
+        return (self.checksum or hashlib.md5(sql_schema_fallback.encode("utf-8")).hexdigest())[:16]
+
+    def render(self, tables: Optional[List[str]] = None) -> str:
+        """
+        Render the schema context for the SQL prompt, falling back to the static schema when the database
+        could not be introspected.
+        :param tables: only render these tables, defaults to all of them.
+        """
+        self.refresh()
+        if not self.tables:
+            return sql_schema_fallback
+
+        if tables is None and self._rendered is not None:
+            return self._rendered
+
+        lines = []
+        for table, meta in self.tables.items():
+            if tables is not None and table not in tables:
+                continue
+            columns = ", ".join(f"{quote_identifier(name)} {data_type}" for name, data_type in meta["columns"])
+            lines.append(f"Table {quote_identifier(table)}: {columns}")
+            for index_def in meta.get("indexes", []):
+                lines.append(f"  {index_def}")
+        rendered = "\n".join(lines)
+        if tables is None:
+            self._rendered = rendered
+        return rendered
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "tables": len(self.tables),
+            "checksum": self.checksum,
+            "introspections": self.introspections,
+            "checksum_polls": self.checksum_polls,
+        }
+
+
+_SCHEMA_CATALOG = None
+_SCHEMA_CATALOG_LOCK = threading.Lock()
+
+
+def get_schema_catalog() -> SchemaCatalog:
+    """
+    Return the process-wide schema catalog.
+    """
+    global _SCHEMA_CATALOG
+    with _SCHEMA_CATALOG_LOCK:
+        if _SCHEMA_CATALOG is None:
+            _SCHEMA_CATALOG = SchemaCatalog()
+        return _SCHEMA_CATALOG
@@ -0,0 +1,178 @@
+"""
+Question-aware schema pruning for the SQL generator prompt.
+Tables are scored against the user question by lexical matches on table names, column names and sampled categorical
+values, blended with embedding similarity of cached table descriptions, and only the top-N tables are put in the prompt,
+so the prompt stays roughly the same size as the database grows.
+"""
+
+from typing import Any, Callable, Dict, List, Optional, Set
+from config import Config
+from utils.answer_cache import normalize_query, cosine_similarity
+from utils.schema_catalog import SchemaCatalog, get_schema_catalog
+import threading
+import re
+
+
+TEXT_TYPES = ("text", "character varying", "character", "name", "USER-DEFINED")
+
+
+def identifier_tokens(identifier: str) -> Set[str]:
+    """
+    Split an identifier such as "Issue Type", resolution_date or createDate into lowercase word tokens.
+    """
+    spaced = re.sub(r"([a-z])([A-Z])", r"\1 \2", identifier or "")
+    return {_stem(token) for token in re.findall(r"[a-z0-9]+", spaced.lower())}
+
+
+def _stem(token: str) -> str:
+    # crude plural folding, enough to match "tickets"/"ticket" or "statuses"/"status".
+    if len(token) > 4 and token.endswith("es") and token[:-2].endswith(("s", "x", "ch", "sh")):
+        return token[:-2]
+    if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+        return token[:-1]
+    return token
+
+
+class SchemaLinker:
+    def __init__(self, catalog: SchemaCatalog = None, params: Dict[str, Any] = None,
+                 embed_fn: Optional[Callable[[str], List[float]]] = None):
+        """
+        Scores the catalog tables against a question and picks the ones to include in the SQL prompt.
+        :param catalog: the schema catalog, defaults to the process-wide one.
+        :param params: the linking config, defaults to Config.schema_linking_params.
+        :param embed_fn: a function turning text into an embedding, defaults to the slate embedding model when
+            use_embeddings is set.
+        """
+        self.catalog = catalog or get_schema_catalog()
+        self.params = params or Config.schema_linking_params
+        self._embed_fn = embed_fn
+
+        self._lock = threading.Lock()
+        # per catalog checksum: sampled categorical values and table description embeddings.
+        self._checksum: Optional[str] = None
+        self._sample_values: Dict[str, Dict[str, Set[str]]] = {}
+        self._table_embeddings: Dict[str, Optional[List[float]]] = {}
+
+    def _embed(self, text: str) -> Optional[List[float]]:
+        if not self.params["use_embeddings"]:
+            return None
+        try:
+            if self._embed_fn is None:
+                from milvus_utils import get_embedding_model
+                self._embed_fn = get_embedding_model().embed_query
+            return list(self._embed_fn(text))
+        except Exception as e:
+            print(f"Schema linking embedding failed, using lexical matches only: {e}")
+            return None
+
+    def _sample(self, table: str, columns: List[List[str]]) -> Dict[str, Set[str]]:
+        """
+        Read a few rows of a table and keep the short, low-cardinality text values (statuses, types, names...).
+        """
+        text_columns = [name for name, data_type in columns if data_type in TEXT_TYPES]
+        if not text_columns or self.params["sample_rows"] <= 0:
+            return {}
+
+        from connectors.db_connector import pooled_connection
+        from psycopg import sql
+        query = sql.SQL("SELECT {} FROM {} LIMIT %s").format(
+            sql.SQL(", ").join(map(sql.Identifier, text_columns)), sql.Identifier(table)
+        )
+        try:
+            with pooled_connection() as conn, conn.cursor() as cur:
+                cur.execute(query, (self.params["sample_rows"],))
+                rows = cur.fetchall()
+        except Exception as e:
+            print(f"Could not sample values of {table}: {e}")
+            return {}
+
+        values = {}
+        for i, column in enumerate(text_columns):
+            distinct = {str(row[i]) for row in rows if row[i] is not None}
+            distinct = {v for v in distinct if 0 < len(v) <= self.params["max_value_length"]}
+            if 0 < len(distinct) <= self.params["max_values_per_column"]:
+                values[column] = {normalize_query(v) for v in distinct}
+        return values
+
+    def _prepare(self, tables: Dict[str, Dict[str, Any]]):
+        """
+        (Re)build the sampled values and table embeddings whenever the catalog checksum changes.
+        """
+        with self._lock:
+            if self._checksum == self.catalog.checksum and self._table_embeddings.keys() == tables.keys():
+                return
+            sample_values, table_embeddings = {}, {}
+            for table, meta in tables.items():
+                sample_values[table] = self._sample(table, meta["columns"])
+                description = f"table {table} with columns " + ", ".join(name for name, _ in meta["columns"])
+                table_embeddings[table] = self._embed(description)
+            self._sample_values = sample_values
+            self._table_embeddings = table_embeddings
+            self._checksum = self.catalog.checksum
+
+    def score(self, question: str) -> Dict[str, float]:
+        """
+        Score every table for a question, in [0, 1].
+        """
+        tables = self.catalog.get_tables()
+        if not tables:
+            return {}
+        self._prepare(tables)
+
+        normalized = normalize_query(question)
+        question_tokens = {_stem(token) for token in normalized.split()}
+        padded = f" {normalized} "
+        question_embedding = self._embed(normalized) if self.params["use_embeddings"] else None
+
+        scores = {}
+        for table, meta in tables.items():
+            lexical = 2.0 * len(identifier_tokens(table) & question_tokens)
+            for name, _ in meta["columns"]:
+                lexical += 1.0 * len(identifier_tokens(name) & question_tokens)
+            for values in self._sample_values.get(table, {}).values():
+                lexical += 1.5 * sum(1 for value in values if f" {value} " in padded)
+            lexical = min(1.0, lexical / self.params["lexical_saturation"])
+
+            similarity = 0.0
+            table_embedding = self._table_embeddings.get(table)
+            if question_embedding and table_embedding:
+                similarity = max(0.0, cosine_similarity(question_embedding, table_embedding))
+
+            weight = self.params["embedding_weight"] if question_embedding else 0.0
+            scores[table] = round((1 - weight) * lexical + weight * similarity, 4)
+        return scores
+
+    def link(self, question: str) -> Optional[List[str]]:
+        """
+        Pick the tables to show the SQL generator for a question.
+        :return: the top-N tables, the configured default tables when nothing matches, or None (all tables) when
+            linking is disabled or the database has no more tables than top-N.
+        """
+        if not self.params["enabled"]:
+            return None
+        scores = self.score(question)
+        if len(scores) <= self.params["top_n"]:
+            return None
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        # tables far behind the best match are left out even if there is room for them.
+        cutoff = max(self.params["min_score"], self.params["relative_cutoff"] * ranked[0][1])
+        selected = [table for table, value in ranked[:self.params["top_n"]] if value >= cutoff]
+        if not selected:
+            selected = [table for table in self.params["default_tables"] if table in scores] or [ranked[0][0]]
+        return selected
+
+
+_SCHEMA_LINKER = None
+_SCHEMA_LINKER_LOCK = threading.Lock()
+
+
+def get_schema_linker() -> SchemaLinker:
+    """
+    Return the process-wide schema linker.
+    """
+    global _SCHEMA_LINKER
+    with _SCHEMA_LINKER_LOCK:
+        if _SCHEMA_LINKER is None:
+            _SCHEMA_LINKER = SchemaLinker()
+        return _SCHEMA_LINKER
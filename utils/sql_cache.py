@@ -0,0 +1,196 @@
+"""
+Cache of generated SQL for the natural-language-to-SQL step.
+Entries are keyed by the normalized question and a fingerprint of the schema the generator was shown, with an optional
+embedding-similarity lookup for paraphrases. Only SQL that passed pglast validation and executed successfully is served.
+"""
+
+from typing import Any, Callable, Dict, List, Optional
+from config import Config
+from utils.answer_cache import normalize_query, cosine_similarity
+from utils.caching import LRUTTLCache, SQLiteCacheTier
+from pglast import parse_sql
+import threading
+import hashlib
+import time
+import re
+
+
+def _default_fingerprint() -> str:
+    from utils.schema_catalog import get_schema_catalog
+    return get_schema_catalog().fingerprint()
+
+
+def extract_statement(sql: str) -> str:
+    """
+    Pull the SQL statement out of an llm response, mirroring PostGresAgent.validate_sql_query.
+    """
+    match = re.search(r"(SELECT|WITH|UPDATE|INSERT).*?;", sql or "", flags=re.IGNORECASE | re.DOTALL)
+    return match.group(0) if match else (sql or "").strip()
+
+
+def is_valid_sql(sql: str) -> bool:
+    try:
+        parse_sql(extract_statement(sql))
+        return True
+    except Exception:
+        return False
+
+
+class SQLGenerationCache:
+    def __init__(self, params: Dict[str, Any] = None, embed_fn: Optional[Callable[[str], List[float]]] = None,
+                 fingerprint_fn: Optional[Callable[[], str]] = None):
+        """
+        Generated SQL cache with an in-memory LRU/TTL tier and a SQLite persistence tier.
+        :param params: the cache config, defaults to Config.sql_cache_params.
+        :param embed_fn: a function turning text into an embedding, defaults to the slate embedding model when
+            use_embeddings is set.
+        :param fingerprint_fn: returns the fingerprint of the current schema context, defaults to the schema
+            catalog's fingerprint.
+        """
+        self.params = params or Config.sql_cache_params
+        self.similarity_threshold = self.params["similarity_threshold"]
+        self.ttl_seconds = self.params["ttl_seconds"]
+
+        self.memory = LRUTTLCache(max_entries=self.params["max_entries"], ttl_seconds=self.ttl_seconds)
+        self.store = SQLiteCacheTier(self.params["sqlite_path"], table="generated_sql")
+        self.store.prune(self.params["max_persisted_entries"], self.ttl_seconds)
+        for key, created_at, entry in self.store.load_recent(self.params["max_entries"]):
+            self.memory.set(key, entry, created_at=created_at)
+
+        self._embed_fn = embed_fn
+        self._fingerprint_fn = fingerprint_fn or _default_fingerprint
+        self.semantic_hits = 0
+        self.rejected = 0
+
+    @staticmethod
+    def _key(normalized_question: str, fingerprint: str) -> str:
+        return hashlib.sha256(f"{fingerprint}|{normalized_question}".encode("utf-8")).hexdigest()
+
+    def _embed(self, text: str) -> Optional[List[float]]:
+        if not self.params["use_embeddings"]:
+            return None
+        try:
+            if self._embed_fn is None:
+                from milvus_utils import get_embedding_model
+                self._embed_fn = get_embedding_model().embed_query
+            return list(self._embed_fn(text))
+        except Exception as e:
+            print(f"SQL cache embedding failed, falling back to exact matches: {e}")
+            return None
+
+    def _load(self, key: str) -> Optional[Dict[str, Any]]:
+        entry = self.memory.get(key)
+        if entry is None:
+            persisted = self.store.get(key)
+            if persisted is not None:
+                created_at, entry = persisted
+                if self.ttl_seconds is not None and time.time() - created_at > self.ttl_seconds:
+                    self.store.delete(key)
+                    return None
+                self.memory.set(key, entry, created_at=created_at)
+        return entry
+
+    def _save(self, key: str, entry: Dict[str, Any]):
+        self.memory.set(key, entry)
+        self.store.set(key, entry)
+
+    @staticmethod
+    def _servable(entry: Optional[Dict[str, Any]]) -> bool:
+        return bool(entry) and entry.get("validated") and entry.get("executed_ok") is True
+
+    def get(self, question: str) -> Optional[Dict[str, Any]]:
+        """
+        Look up known-good SQL for a question, first by exact normalized match and then by embedding similarity.
+        :return: the cache entry with a 'match' field, or None.
+        """
+        if not self.params["enabled"]:
+            return None
+        normalized = normalize_query(question)
+        fingerprint = self._fingerprint_fn()
+
+        entry = self._load(self._key(normalized, fingerprint))
+        if self._servable(entry):
+            return dict(entry, match="exact", similarity=1.0)
+
+        embedding = self._embed(normalized)
+        if embedding is None:
+            return None
+
+        best_entry, best_score = None, 0.0
+        for _, candidate in self.memory.items():
+            if candidate.get("schema_fingerprint") != fingerprint or not self._servable(candidate):
+                continue
+            if not candidate.get("embedding"):
+                continue
+            score = cosine_similarity(embedding, candidate["embedding"])
+            if score > best_score:
+                best_entry, best_score = candidate, score
+
+        if best_entry is None or best_score < self.similarity_threshold:
+            return None
+        self.semantic_hits += 1
+        return dict(best_entry, match="semantic", similarity=round(best_score, 4))
+
+    def record_generated(self, question: str, sql: str):
+        """
+        Store freshly generated SQL with its pglast validation result. It is not served until it executed successfully.
+        """
+        if not self.params["enabled"] or not sql:
+            return
+        normalized = normalize_query(question)
+        fingerprint = self._fingerprint_fn()
+        key = self._key(normalized, fingerprint)
+
+        existing = self._load(key)
+        if existing and existing.get("sql") == sql:
+            return
+        self._save(key, {
+            "question": normalized,
+            "sql": sql,
+            "schema_fingerprint": fingerprint,
+            "validated": is_valid_sql(sql),
+            "executed_ok": None,
+            "embedding": existing.get("embedding") if existing else self._embed(normalized),
+        })
+
+    def record_execution(self, question: str, sql: str, ok: bool):
+        """
+        Mark the cached SQL of a question as having executed successfully (servable) or failed (dropped).
+        """
+        if not self.params["enabled"]:
+            return
+        key = self._key(normalize_query(question), self._fingerprint_fn())
+        entry = self._load(key)
+        if entry is None or entry.get("sql") != sql:
+            return
+        if ok:
+            if entry.get("executed_ok") is not True:
+                self._save(key, dict(entry, executed_ok=True))
+        else:
+            self.memory.pop(key)
+            self.store.delete(key)
+            self.rejected += 1
+
+    def stats(self) -> Dict[str, Any]:
+        stats = self.memory.stats()
+        stats.update({
+            "persisted_entries": len(self.store),
+            "semantic_hits": self.semantic_hits,
+            "rejected": self.rejected,
+        })
+        return stats
+
+
+_SQL_CACHE = None
+_SQL_CACHE_LOCK = threading.Lock()
+
+
+def get_sql_cache() -> SQLGenerationCache:
+    """
+    Return the process-wide SQL generation cache, shared by the pg_generate_sql_query and rg_generate_sql_query nodes.
+    """
+    global _SQL_CACHE
+    with _SQL_CACHE_LOCK:
+        if _SQL_CACHE is None:
+            _SQL_CACHE = SQLGenerationCache()
+        return _SQL_CACHE
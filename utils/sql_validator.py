@@ -0,0 +1,264 @@
+"""
+Offline semantic validation of generated SQL against the cached schema catalog.
+The query is parsed with pglast and every relation and column reference is resolved against the catalog, without a
+round trip to the database. Mechanical mistakes (smart quotes, code fences, missing or wrong-case identifier quoting
+such as Created for "Created") are fixed locally; unknown tables and columns are reported with suggestions.
+"""
+
+from typing import Any, Dict, List, Optional, Set, Tuple
+from difflib import get_close_matches
+from utils.schema_catalog import SchemaCatalog, get_schema_catalog, quote_identifier
+from pglast.parser import parse_sql_json, scan
+import threading
+import json
+import re
+
+
+SMART_QUOTES = str.maketrans({"“": '"', "”": '"', "„": '"', "‘": "'", "’": "'", "‚": "'"})
+STRING_TOKENS = {"SCONST", "USCONST", "BCONST", "XCONST"}
+
+
+def normalize_sql_text(sql: str) -> str:
+    """
+    Replace typographic quotes and drop markdown code fences around llm-generated SQL.
+    """
+    text = (sql or "").translate(SMART_QUOTES).strip()
+    fenced = re.search(r"```(?:sql)?\s*(.*?)```", text, flags=re.IGNORECASE | re.DOTALL)
+    return fenced.group(1).strip() if fenced else text
+
+
+def _string(node: Dict[str, Any]) -> Optional[str]:
+    # pglast >= 5 (postgres 15) names the String field "sval", older versions "str".
+    value = node.get("String") or {}
+    return value.get("sval", value.get("str"))
+
+
+class _References:
+    def __init__(self):
+        self.relations: List[Tuple[str, Optional[str], int, Optional[str]]] = []
+        self.column_refs: List[Tuple[List[Optional[str]], int]] = []
+        self.ctes: Set[str] = set()
+        self.derived: Set[str] = set()
+        self.output_aliases: Set[str] = set()
+
+    def walk(self, node: Any):
+        if isinstance(node, list):
+            for value in node:
+                self.walk(value)
+            return
+        if not isinstance(node, dict):
+            return
+        for name, value in node.items():
+            if not isinstance(value, dict):
+                self.walk(value)
+                continue
+            alias = (value.get("alias") or {}).get("aliasname")
+            # RangeVar nodes are unwrapped where the field can only hold one (the target of INSERT/UPDATE/DELETE).
+            if name in ("RangeVar", "relation") and value.get("relname"):
+                self.relations.append(
+                    (value["relname"], alias, value.get("location", -1), value.get("schemaname"))
+                )
+            elif name == "ColumnRef":
+                fields = [None if "A_Star" in field else _string(field) for field in value.get("fields", [])]
+                self.column_refs.append((fields, value.get("location", -1)))
+            elif name == "CommonTableExpr" and value.get("ctename"):
+                self.ctes.add(value["ctename"])
+            elif name in ("RangeSubselect", "RangeFunction", "JoinExpr") and alias:
+                self.derived.add(alias)
+            elif name == "ResTarget" and value.get("name"):
+                self.output_aliases.add(value["name"])
+            self.walk(value)
+
+
+class SQLValidator:
+    def __init__(self, catalog: SchemaCatalog = None):
+        """
+        Resolves the tables and columns of a query against the schema catalog and fixes identifier quoting.
+        :param catalog: the schema catalog, defaults to the process-wide one.
+        """
+        self.catalog = catalog or get_schema_catalog()
+        self._lock = threading.Lock()
+        self.validated = 0
+        self.fixed = 0
+        self.rejected = 0
+
+    def _tables(self) -> Dict[str, Dict[str, Any]]:
+        # the in-memory catalog, only introspected when it was never loaded.
+        return self.catalog.tables or self.catalog.get_tables()
+
+    # ----- fixes on the token stream -----
+    @staticmethod
+    def _tokens(text: str):
+        return [(token.start, token.end + 1, token.name, text[token.start:token.end + 1]) for token in scan(text)]
+
+    def _quote_multiword(self, text: str, names: List[str], fixes: List[str]) -> str:
+        """
+        Quote unquoted multi-word identifiers (Issue Type -> "Issue Type"), which do not even parse as one name.
+        """
+        tokens = [t for t in self._tokens(text) if t[2] not in STRING_TOKENS]
+        replacements = []
+        for name in names:
+            words = name.split()
+            if len(words) < 2 or any(not word.isidentifier() for word in words):
+                continue
+            for i in range(len(tokens) - len(words) + 1):
+                window = tokens[i:i + len(words)]
+                if [t[3].lower() for t in window] != [word.lower() for word in words]:
+                    continue
+                gaps = [text[a[1]:b[0]] for a, b in zip(window, window[1:])]
+                if all(gap.strip() == "" for gap in gaps):
+                    replacements.append((window[0][0], window[-1][1], quote_identifier(name)))
+                    fixes.append(f"quoted {name!r}")
+        for start, end, value in sorted(set(replacements), reverse=True):
+            text = text[:start] + value + text[end:]
+        return text
+
+    # ----- resolution -----
+    @staticmethod
+    def _match(name: str, candidates) -> Tuple[Optional[str], List[str]]:
+        """
+        Resolve a parsed identifier: (exact or unique case-insensitive match, close-match suggestions).
+        """
+        if name in candidates:
+            return name, []
+        folded = [c for c in candidates if c.lower() == name.lower()]
+        if len(folded) == 1:
+            return folded[0], []
+        return None, get_close_matches(name, list(candidates), n=3, cutoff=0.6) or \
+            get_close_matches(name.lower(), [c.lower() for c in candidates], n=3, cutoff=0.6)
+
+    def _check(self, text: str, tables: Dict[str, Dict[str, Any]]):
+        """
+        :return: (token replacements, fix descriptions, errors)
+        """
+        refs = _References()
+        refs.walk(json.loads(parse_sql_json(text)).get("stmts", []))
+        tokens = self._tokens(text)
+        token_at = {start: i for i, (start, _, _, _) in enumerate(tokens)}
+        replacements, fixes, errors = [], [], []
+
+        def replace(location: int, hops: int, value: str, description: str):
+            i = token_at.get(location)
+            if i is None:
+                return
+            i += 2 * hops  # skip "qualifier", "."
+            if i < len(tokens) and tokens[i][3] != value:
+                replacements.append((tokens[i][0], tokens[i][1], value))
+                fixes.append(description)
+
+        aliases: Dict[str, str] = {}
+        # tables referred to by their (fixed) name, whose name also has to be fixed where it qualifies a column.
+        renamed: Dict[str, str] = {}
+        # relations outside the catalog's schema (information_schema, pg_catalog, other schemas): not checked.
+        opaque: Set[str] = set()
+        unresolved = False
+        for relname, alias, location, schemaname in refs.relations:
+            if relname in refs.ctes and not schemaname:
+                continue
+            if (schemaname and schemaname != self.catalog.schema) or (
+                    not schemaname and relname.startswith("pg_") and relname not in tables):
+                opaque.add(alias or relname)
+                unresolved = True
+                continue
+            table, suggestions = self._match(relname, tables)
+            if table is None:
+                errors.append(f"unknown table {relname!r}" + (f", did you mean {suggestions}?" if suggestions else ""))
+                unresolved = True
+                continue
+            if table != relname:
+                replace(location, int(bool(schemaname)), quote_identifier(table), f"quoted table {table!r}")
+                if not alias:
+                    renamed[relname] = table
+            aliases[alias or relname] = table
+            aliases.setdefault(table, table)
+
+        # unqualified columns can only be checked when every source of the query is a known table.
+        opaque_sources = bool(refs.ctes or refs.derived) or unresolved
+        all_columns = {name for table in set(aliases.values()) for name, _ in tables[table]["columns"]}
+
+        for fields, location in refs.column_refs:
+            column = fields[-1]
+            if column is None or (len(fields) == 1 and column in refs.output_aliases):
+                continue
+            if len(fields) == 1 and column in aliases and self._match(column, all_columns)[0] is None:
+                # a whole-row reference (json_agg(t)); a column of the same name would take precedence.
+                continue
+            if len(fields) >= 2:
+                qualifier = fields[-2]
+                if qualifier in refs.ctes or qualifier in refs.derived or qualifier in opaque:
+                    continue
+                if qualifier not in aliases:
+                    errors.append(f"unknown table or alias {qualifier!r} for column {column!r}")
+                    continue
+                candidates = {name for name, _ in tables[aliases[qualifier]]["columns"]}
+                if qualifier in renamed:
+                    replace(location, len(fields) - 2, quote_identifier(renamed[qualifier]),
+                            f"quoted table {renamed[qualifier]!r}")
+            else:
+                if opaque_sources or not aliases:
+                    continue
+                candidates = all_columns
+
+            match, suggestions = self._match(column, candidates)
+            if match is None:
+                errors.append(f"unknown column {column!r}" + (f", did you mean {suggestions}?" if suggestions else ""))
+            elif match != column:
+                replace(location, len(fields) - 1, quote_identifier(match), f"quoted column {match!r}")
+        return replacements, fixes, errors
+
+    def validate(self, sql: str) -> Dict[str, Any]:
+        """
+        Validate (and mechanically fix) a generated query without touching the database.
+        :param sql: the generated SQL.
+        :return: {"status": "ok" | "error", "valid": bool, "sql": the fixed query, "fixes": [...], "errors": [...],
+            "error": the errors as one message}.
+        """
+        fixes: List[str] = []
+        text = normalize_sql_text(sql)
+        if text != (sql or "").strip():
+            fixes.append("normalized quotes and code fences")
+
+        tables = self._tables()
+        errors: List[str] = []
+        try:
+            text = self._quote_multiword(text, [c for t in tables.values() for c, _ in t["columns"]], fixes)
+            if tables:
+                replacements, identifier_fixes, errors = self._check(text, tables)
+                for start, end, value in sorted(set(replacements), reverse=True):
+                    text = text[:start] + value + text[end:]
+                fixes += identifier_fixes
+            else:
+                json.loads(parse_sql_json(text))
+        except Exception as e:
+            errors = [f"syntax error: {e}"]
+
+        with self._lock:
+            self.validated += 1
+            self.fixed += bool(fixes)
+            self.rejected += bool(errors)
+        return {
+            "status": "error" if errors else "ok",
+            "valid": not errors,
+            "sql": text,
+            "fixes": fixes,
+            "errors": errors,
+            "error": "; ".join(errors) or None,
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        return {"validated": self.validated, "fixed": self.fixed, "rejected": self.rejected}
+
+
+_SQL_VALIDATOR = None
+_SQL_VALIDATOR_LOCK = threading.Lock()
+
+
+def get_sql_validator() -> SQLValidator:
+    """
+    Return the process-wide SQL validator.
+    """
+    global _SQL_VALIDATOR
+    with _SQL_VALIDATOR_LOCK:
+        if _SQL_VALIDATOR is None:
+            _SQL_VALIDATOR = SQLValidator()
+        return _SQL_VALIDATOR
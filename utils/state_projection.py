@@ -0,0 +1,181 @@
+"""
+Token-budgeted projection of the AgentState for prompt formatting.
+Instead of inserting the whole state repr (memory_chain duplicates, raw pymilvus SearchResult objects) into a prompt,
+each prompt gets only the fields it needs, rendered compactly and truncated to a per-prompt token budget.
+"""
+
+from typing import Any, Callable, Dict, List, Optional
+from config import Config
+import json
+
+
+def _load_token_counter() -> Callable[[str], int]:
+    try:
+        import tiktoken
+        encoding = tiktoken.get_encoding("cl100k_base")
+        return lambda text: len(encoding.encode(text, disallowed_special=()))
+    except Exception:
+        # rough fallback of ~4 characters per token.
+        return lambda text: (len(text) + 3) // 4
+
+
+count_tokens = _load_token_counter()
+
+
+def _hit_to_dict(hit: Any) -> Dict[str, Any]:
+    """
+    Reduce a Milvus hit (pymilvus Hit object or AsyncMilvusClient dict) to its text and distance.
+    """
+    if isinstance(hit, dict):
+        entity = hit.get("entity") or {}
+        return {"text": entity.get("text", hit.get("text")), "distance": round(float(hit.get("distance", 0.0)), 4)}
+    entity = getattr(hit, "entity", None)
+    text = entity.get("text") if entity is not None and hasattr(entity, "get") else None
+    return {"text": text, "distance": round(float(getattr(hit, "distance", 0.0)), 4)}
+
+
+def _simplify(value: Any) -> Any:
+    """
+    Convert state values into compact, JSON-friendly structures.
+    Search results become lists of {text, distance}; row dicts become {columns, rows}.
+    """
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+
+    if isinstance(value, dict):
+        data = value.get("data")
+        if isinstance(data, list) and data and isinstance(data[0], dict):
+            columns = list(data[0].keys())
+            simplified = {k: _simplify(v) for k, v in value.items() if k != "data"}
+            simplified["columns"] = columns
+            simplified["rows"] = [[row.get(c) for c in columns] for row in data]
+            return simplified
+        return {k: _simplify(v) for k, v in value.items()}
+
+    # pymilvus SearchResult / AsyncMilvusClient results: a list (per query vector) of lists of hits.
+    type_name = type(value).__name__
+    if type_name in ("SearchResult", "Hits", "HybridHits") or (
+        isinstance(value, list) and value and isinstance(value[0], list)
+        and value[0] and (isinstance(value[0][0], dict) and "distance" in value[0][0])
+    ):
+        hits = []
+        for query_hits in value:
+            hits.extend(_hit_to_dict(hit) for hit in query_hits)
+        return hits
+
+    if isinstance(value, (list, tuple)):
+        return [_simplify(v) for v in value]
+
+    return str(value)
+
+
+def _render(value: Any) -> str:
+    if isinstance(value, str):
+        return value
+    return json.dumps(value, default=str, ensure_ascii=False, separators=(",", ":"))
+
+
+def _truncate(value: Any, budget: int) -> str:
+    """
+    Render a value within a token budget. Lists (and row lists) keep their head items with a count of what was
+    dropped; strings are cut with a truncation marker.
+    """
+    rendered = _render(value)
+    if count_tokens(rendered) <= budget:
+        return rendered
+
+    items_key = None
+    if isinstance(value, dict) and isinstance(value.get("rows"), list):
+        items_key = "rows"
+    if isinstance(value, list) or items_key:
+        items = value[items_key] if items_key else value
+        low, high = 0, len(items)
+        best = None
+        # binary search for the largest head of the list that fits.
+        while low <= high:
+            mid = (low + high) // 2
+            head = items[:mid]
+            if items_key:
+                candidate = dict(value, rows=head, rows_omitted=len(items) - mid)
+            else:
+                candidate = head + ([f"... {len(items) - mid} more items"] if mid < len(items) else [])
+            candidate_rendered = _render(candidate)
+            if count_tokens(candidate_rendered) <= budget:
+                best = candidate_rendered
+                low = mid + 1
+            else:
+                high = mid - 1
+        if best is not None:
+            return best
+
+    # plain truncation, using the average characters per token of this value.
+    marker = " …[truncated]"
+    chars_per_token = max(1.0, len(rendered) / max(1, count_tokens(rendered)))
+    cut = max(0, int((budget - count_tokens(marker)) * chars_per_token))
+    while cut > 0 and count_tokens(rendered[:cut] + marker) > budget:
+        cut = int(cut * 0.9)
+    return rendered[:cut] + marker
+
+
+class StateProjector:
+    def __init__(self, profiles: Dict[str, Dict[str, Any]] = None, log_token_counts: Optional[bool] = None):
+        """
+        Projects the agent state onto the fields a prompt needs, within that prompt's token budget.
+        :param profiles: per-prompt {"fields": [...], "max_tokens": int} settings, defaults to
+            Config.state_projection_params["profiles"].
+        :param log_token_counts: print the token count of the full state and of the projection.
+        """
+        params = Config.state_projection_params
+        self.profiles = profiles or params["profiles"]
+        self.log_token_counts = params["log_token_counts"] if log_token_counts is None else log_token_counts
+
+    def project(self, state: Dict[str, Any], prompt_name: str) -> str:
+        """
+        Render the state fields used by a prompt.
+        :param state: the agent state.
+        :param prompt_name: the profile to use, e.g. "supervisor" or "supervisor_response".
+        :return: the compact state text to insert into the prompt.
+        """
+        profile = self.profiles[prompt_name]
+        budget = profile["max_tokens"]
+
+        # empty fields carry no information for the llm, so they are left out entirely.
+        fields = [
+            (name, _simplify(state.get(name))) for name in profile["fields"]
+            if state.get(name) not in (None, "", [], {})
+        ]
+
+        # water-filling: fields smaller than their fair share keep everything, larger ones share what is left.
+        sizes = {name: count_tokens(f"{name}: {_render(value)}") for name, value in fields}
+        remaining_budget, remaining = budget, sorted(fields, key=lambda item: sizes[item[0]])
+        rendered: Dict[str, str] = {}
+        while remaining:
+            share = remaining_budget // len(remaining)
+            name, value = remaining.pop(0)
+            label_tokens = count_tokens(f"{name}: ")
+            if sizes[name] <= share:
+                rendered[name] = _render(value)
+            else:
+                rendered[name] = _truncate(value, max(1, share - label_tokens))
+            remaining_budget -= count_tokens(f"{name}: {rendered[name]}")
+
+        projection = "\n".join(f"{name}: {rendered[name]}" for name, _ in fields)
+
+        if self.log_token_counts:
+            before = count_tokens(str(state))
+            after = count_tokens(projection)
+            print(f"State projection for {prompt_name}: {before} -> {after} tokens (budget {budget}).")
+        return projection
+
+
+_STATE_PROJECTOR = None
+
+
+def project_state(state: Dict[str, Any], prompt_name: str) -> str:
+    """
+    Project the state for a prompt using the shared StateProjector.
+    """
+    global _STATE_PROJECTOR
+    if _STATE_PROJECTOR is None:
+        _STATE_PROJECTOR = StateProjector()
+    return _STATE_PROJECTOR.project(state, prompt_name)